@@ -51,6 +51,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'main_app.middleware.ModeNotificationMiddleware',
+    'main_app.middleware.ModeEvaluationMiddleware',
+    'main_app.middleware.ModeTraceMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -143,3 +146,51 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication settings
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Mode evaluation runs in the run_mode_worker process; set to False to evaluate inline
+MODE_EVALUATION_ASYNC = os.getenv('MODE_EVALUATION_ASYNC', 'True') == 'True'
+
+# ModeHistory compaction (compact_mode_history): progress events older than
+# COMPACT_AFTER_DAYS are merged per day or week; progress rows older than
+# RETENTION_DAYS are deleted. Unlock and lock events are always kept.
+MODE_HISTORY_COMPACT_AFTER_DAYS = int(os.getenv('MODE_HISTORY_COMPACT_AFTER_DAYS', '30'))
+MODE_HISTORY_COMPACT_PERIOD = os.getenv('MODE_HISTORY_COMPACT_PERIOD', 'day')
+MODE_HISTORY_RETENTION_DAYS = int(os.getenv('MODE_HISTORY_RETENTION_DAYS', '365'))
+
+# Give new accounts OnboardingService.DEFAULT_CATEGORIES at registration
+PROVISION_DEFAULT_CATEGORIES = os.getenv('PROVISION_DEFAULT_CATEGORIES', 'False') == 'True'
+
+# Log per-method timing and query counts of ModeService calls for every request
+MODE_TRACING = os.getenv('MODE_TRACING', 'False') == 'True'
+
+# Shadow-run a candidate mode engine (ModeShadow.ENGINES, e.g. 'cohort') on this
+# fraction of evaluations and store the comparison as ModeShadowRun rows
+MODE_SHADOW_ENGINE = os.getenv('MODE_SHADOW_ENGINE', '')
+MODE_SHADOW_SAMPLE_RATE = float(os.getenv('MODE_SHADOW_SAMPLE_RATE', '0'))
+
+# Mode dashboard payloads are cached per user and mode (services/dashboard_cache.py).
+# Every web process must see the same entries, or a write only invalidates the worker
+# that handled it: the default is a table in the app database (created by
+# `manage.py createcachetable` in the release phase). A per-process LocMemCache is
+# bypassed unless DEBUG is on.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboards': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'dashboard_cache'),
+    },
+}
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '3600'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main_app': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
@@ -5,9 +5,11 @@ from .models import (
     BudgetItem, Income, ModeHistory, CriticalSpending,
     EssentialBill, SurvivalExpenseSchedule, CategorySpendingLimit,
     SavingsGoal, FreedomFundPlan, FreedomExpense, SavingsContribution,
-    StabilityRatioTarget
+    StabilityRatioTarget, LedgerMonthlyRollup, ModeEvaluationJob,
+    ModeNotification, LedgerState, Mode, ModeShadowRun
 )
 
+admin.site.register(Mode)
 admin.site.register(ModeUnlock)
 admin.site.register(Transaction)
 admin.site.register(Category)
@@ -25,5 +27,8 @@ admin.site.register(FreedomFundPlan)
 admin.site.register(FreedomExpense)
 admin.site.register(SavingsContribution)
 admin.site.register(StabilityRatioTarget)
-
-
+admin.site.register(LedgerMonthlyRollup)
+admin.site.register(ModeEvaluationJob)
+admin.site.register(ModeNotification)
+admin.site.register(LedgerState)
+admin.site.register(ModeShadowRun)
@@ -0,0 +1,131 @@
+import random
+import time
+from decimal import Decimal
+from itertools import accumulate
+from django.core.management.base import BaseCommand
+from main_app.services.money import to_cents
+
+
+class Command(BaseCommand):
+    help = "Compare Decimal and integer-cent arithmetic on the mode aggregation paths using a synthetic ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=500000, help='Synthetic transactions in the ledger')
+        parser.add_argument('--days', type=int, default=3650, help='Days the ledger spans')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        days = options['days']
+        ledger = [
+            (rng.randrange(days), rng.random() < 0.3, Decimal(rng.randint(1, 300000)).scaleb(-2))
+            for _ in range(options['transactions'])
+        ]
+        # Boundary conversion, paid once when the grouped rows are read
+        start = time.perf_counter()
+        cents_ledger = [(day, is_income, to_cents(amount)) for day, is_income, amount in ledger]
+        convert_ms = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(
+            f"{options['transactions']} transactions over {days} days "
+            f"(Decimal -> cents conversion: {convert_ms:.1f}ms)"
+        )
+        self.stdout.write(f"{'benchmark':<28}{'Decimal ms':>12}{'cents ms':>12}{'speedup':>10}")
+        for name, func in (
+            ('monthly buckets', self.fold_months),
+            ('daily prefix sums', self.prefix_sums),
+            ('as-of windows (365 days)', self.window_sums),
+            ('ratio rules', self.ratio_rules),
+        ):
+            decimal_ms, decimal_result = self.measure(func, ledger, Decimal('0'), options['repeat'])
+            cents_ms, cents_result = self.measure(func, cents_ledger, 0, options['repeat'])
+            if isinstance(decimal_result, Decimal):
+                decimal_result = to_cents(decimal_result)
+            if decimal_result != cents_result:
+                self.stderr.write(f"{name}: results differ ({decimal_result} vs {cents_result})")
+            self.stdout.write(f"{name:<28}{decimal_ms:>12.1f}{cents_ms:>12.1f}{decimal_ms / cents_ms:>9.1f}x")
+
+    @staticmethod
+    def measure(func, ledger, zero, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(ledger, zero)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    @staticmethod
+    def fold_months(ledger, zero):
+        """
+        Fold transactions into (month, side) buckets, as FinancialSnapshot does
+        """
+        months = {}
+        for day, is_income, amount in ledger:
+            bucket = months.setdefault(day // 30, [zero, zero])
+            bucket[0 if is_income else 1] += amount
+        return sum(income - expenses for income, expenses in months.values())
+
+    @staticmethod
+    def daily_series(ledger, zero):
+        size = max(day for day, _, _ in ledger) + 1
+        income, expenses = [zero] * size, [zero] * size
+        for day, is_income, amount in ledger:
+            if is_income:
+                income[day] += amount
+            else:
+                expenses[day] += amount
+        return income, expenses
+
+    @classmethod
+    def prefix_sums(cls, ledger, zero):
+        """
+        Daily series and prefix sums, as LedgerTimeline builds them
+        """
+        income, expenses = cls.daily_series(ledger, zero)
+        income_prefix = list(accumulate(income, initial=zero))
+        expenses_prefix = list(accumulate(expenses, initial=zero))
+        return income_prefix[-1] - expenses_prefix[-1]
+
+    @classmethod
+    def window_sums(cls, ledger, zero):
+        """
+        90/120/180 day window totals for each of the last 365 days
+        """
+        income, expenses = cls.daily_series(ledger, zero)
+        income_prefix = list(accumulate(income, initial=zero))
+        expenses_prefix = list(accumulate(expenses, initial=zero))
+        last = len(income)
+        net = zero
+        for end in range(max(0, last - 365), last + 1):
+            for window in (90, 120, 180):
+                first = max(0, end - window)
+                net += (income_prefix[end] - income_prefix[first]) - (expenses_prefix[end] - expenses_prefix[first])
+        return net
+
+    @staticmethod
+    def ratio_rules(ledger, zero):
+        """
+        Per-month threshold tests (lockdown, vacay, survival) over the ledger
+        """
+        months = {}
+        for day, is_income, amount in ledger:
+            bucket = months.setdefault(day // 30, [zero, zero])
+            bucket[0 if is_income else 1] += amount
+
+        hits = 0
+        for income, expenses in months.values():
+            if not income:
+                continue
+            if isinstance(income, int):
+                hits += expenses > income
+                hits += (income - expenses) * 100 >= income * 15
+                hits += expenses * 2 > income
+                hits += min(100, expenses * 100 // income)
+            else:
+                hits += expenses > income
+                hits += (income - expenses) / income >= Decimal('0.15')
+                hits += expenses / income > Decimal('0.5')
+                hits += min(100, int(expenses / income * 100))
+        return hits
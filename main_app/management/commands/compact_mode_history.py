@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from main_app.services.mode_history import ModeHistoryService
+
+
+class Command(BaseCommand):
+    help = "Merge old ModeHistory progress events into daily/weekly summaries and apply the retention policy"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=settings.MODE_HISTORY_COMPACT_AFTER_DAYS,
+                            help='Only compact progress events older than this many days')
+        parser.add_argument('--period', choices=ModeHistoryService.PERIODS,
+                            default=settings.MODE_HISTORY_COMPACT_PERIOD)
+        parser.add_argument('--retention-days', type=int, default=settings.MODE_HISTORY_RETENTION_DAYS,
+                            help='Delete progress events older than this many days (0 keeps them)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users compacted per transaction')
+
+    def handle(self, *args, **options):
+        if options['retention_days'] and options['retention_days'] <= options['older_than']:
+            raise CommandError("--retention-days must be greater than --older-than")
+
+        removed, written = ModeHistoryService.compact(
+            older_than_days=options['older_than'],
+            period=options['period'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(f"Compacted {removed} progress events into {written} {options['period']} summaries")
+
+        if options['retention_days']:
+            deleted = ModeHistoryService.purge(options['retention_days'])
+            self.stdout.write(f"Deleted {deleted} progress events older than {options['retention_days']} days")
+
+        self.stdout.write(self.style.SUCCESS("Mode history compaction finished"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from main_app.services.dashboard_cache import DashboardCache
+from main_app.services.mode_rules import ModeRuleRegistry
+
+
+class Command(BaseCommand):
+    help = "Show mode dashboard cache hits and misses per mode since the last reset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        if not DashboardCache.enabled():
+            self.stdout.write(self.style.WARNING("Dashboard caching is off: the backend is per-process LocMemCache and DEBUG is off"))
+        mode_keys = list(ModeRuleRegistry.keys())
+        total_hits = total_misses = 0
+        for mode_key, counts in DashboardCache.stats(mode_keys).items():
+            hits, misses = counts['hits'], counts['misses']
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(f"  {mode_key}: {hits} hits, {misses} misses ({self.hit_rate(hits, misses)})")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_hits} hits, {total_misses} misses ({self.hit_rate(total_hits, total_misses)})"
+        ))
+
+        if options['reset']:
+            DashboardCache.reset_stats(mode_keys)
+            self.stdout.write("Counters reset")
+
+    @staticmethod
+    def hit_rate(hits, misses):
+        return f"{hits / (hits + misses):.0%} hit rate" if hits + misses else "no views"
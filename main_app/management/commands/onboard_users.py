@@ -0,0 +1,74 @@
+from argparse import BooleanOptionalAction
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from main_app.services.onboarding import OnboardingService
+
+
+class Command(BaseCommand):
+    help = "Create accounts in bulk (or provision existing ones) with the standard mode rows and default categories"
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Accounts to create')
+        parser.add_argument('--count', type=int, default=0, help='Also create this many numbered accounts')
+        parser.add_argument('--prefix', default='user', help='Username prefix for --count accounts')
+        parser.add_argument('--password', help='Password for the new accounts (unusable if omitted)')
+        parser.add_argument('--email-domain', default='example.com')
+        parser.add_argument('--existing', action='store_true',
+                            help='Provision every existing account instead of creating new ones')
+        parser.add_argument('--categories', action=BooleanOptionalAction, default=None,
+                            help='Add default categories (defaults to PROVISION_DEFAULT_CATEGORIES)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        categories = options['categories']
+        if categories is None:
+            categories = settings.PROVISION_DEFAULT_CATEGORIES
+        batch_size = options['batch_size']
+
+        if options['existing']:
+            if options['usernames'] or options['count']:
+                raise CommandError("--existing cannot be combined with usernames or --count")
+            user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        else:
+            user_ids = self.create_users(options)
+
+        modes = created_categories = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch_modes, batch_categories = OnboardingService.provision(
+                user_ids[start:start + batch_size],
+                categories=categories,
+                batch_size=batch_size
+            )
+            modes += batch_modes
+            created_categories += batch_categories
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Provisioned {len(user_ids)} accounts: {modes} mode rows, {created_categories} categories"
+        ))
+
+    def create_users(self, options):
+        """
+        Insert the requested accounts with one bulk_create and return their ids
+        """
+        usernames = list(options['usernames'])
+        usernames += [f"{options['prefix']}{number}" for number in range(1, options['count'] + 1)]
+        if not usernames:
+            raise CommandError("Give usernames, --count or --existing")
+        if len(set(usernames)) != len(usernames):
+            raise CommandError("Duplicate usernames")
+
+        taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if taken:
+            raise CommandError(f"Username(s) already exist: {', '.join(sorted(taken))}")
+
+        # Hashing is slow; every account shares the one hash
+        password = make_password(options['password'])
+        with db_transaction.atomic():
+            User.objects.bulk_create([
+                User(username=username, email=f"{username}@{options['email_domain']}", password=password)
+                for username in usernames
+            ], batch_size=options['batch_size'])
+        return list(User.objects.filter(username__in=usernames).order_by('pk').values_list('pk', flat=True))
@@ -0,0 +1,58 @@
+import csv
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from main_app.services.mode_rules import ModeRuleRegistry
+from main_app.services.mode_service import ModeService
+from main_app.services.mode_tracing import ModeTrace
+
+
+class Command(BaseCommand):
+    help = "Profile the ModeService checks and dashboards for one user (time and SQL per method)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--mode', action='append', dest='modes', choices=self.mode_names(),
+                            help='Dashboard to profile (may be repeated; default all)')
+        parser.add_argument('--repeat', type=int, default=1, help='Run everything this many times')
+        parser.add_argument('--csv', action='store_true', help='Print CSV instead of a table')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user: {options['username']}")
+
+        # Dashboards and update_user_modes write rows; profile without keeping them
+        with db_transaction.atomic():
+            with ModeTrace() as trace:
+                for _ in range(options['repeat']):
+                    ModeService.check_all_modes(user)
+                    ModeService.update_user_modes(user, force=True)
+                    ModeService.get_user_mode_history(user)
+                    for mode_name in options['modes'] or self.mode_names():
+                        ModeService.get_mode_dashboard_data(user, mode_name, use_cache=False)
+            db_transaction.set_rollback(True)
+
+        rows = trace.summary()
+        if options['csv']:
+            writer = csv.writer(self.stdout)
+            writer.writerow(['name', 'calls', 'wall_ms', 'avg_ms', 'queries', 'sql_ms'])
+            for row in rows:
+                writer.writerow([
+                    row['name'], row['calls'], f"{row['wall_ms']:.2f}",
+                    f"{row['wall_ms'] / row['calls']:.2f}", row['queries'], f"{row['sql_ms']:.2f}"
+                ])
+            return
+
+        width = max([len(row['name']) for row in rows] + [4])
+        self.stdout.write(f"{'name':<{width}}  {'calls':>5}  {'wall ms':>9}  {'avg ms':>8}  {'queries':>7}  {'sql ms':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<{width}}  {row['calls']:>5}  {row['wall_ms']:>9.1f}  "
+                f"{row['wall_ms'] / row['calls']:>8.2f}  {row['queries']:>7}  {row['sql_ms']:>8.1f}"
+            )
+
+    @staticmethod
+    def mode_names():
+        return [rule.definition['name'] for rule in ModeRuleRegistry.rules()]
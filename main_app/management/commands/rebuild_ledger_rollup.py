@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main_app.services.ledger_rollup import LedgerRollupService
+
+
+class Command(BaseCommand):
+    help = "Recompute the LedgerMonthlyRollup table from the raw Transaction rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only rebuild the given username (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = list(User.objects.filter(username__in=options['usernames']))
+            missing = set(options['usernames']) - {user.username for user in users}
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+
+        written = LedgerRollupService.rebuild(users=users, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ledger rollup: {written} monthly buckets written"))
@@ -0,0 +1,161 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _init_worker():
+    # Workers are spawned, not forked, so they never share the parent's connection
+    import django
+    django.setup()
+
+
+def _recompute_chunk(user_ids, engine='scalar'):
+    from main_app.services.mode_service import ModeService
+
+    try:
+        if engine == 'vectorized':
+            return ModeService.update_modes_for_cohort(user_ids)
+        return ModeService.update_modes_for_users(user_ids)
+    except Exception as e:
+        # The batch queries failed, so nobody in the chunk was updated
+        return 0, [(user_id, repr(e)) for user_id in user_ids]
+
+
+class Command(BaseCommand):
+    help = "Re-evaluate every user's modes (e.g. after a rule change) using a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes; 1 runs everything in this process')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users evaluated per task')
+        parser.add_argument('--checkpoint', default='recompute_modes.checkpoint',
+                            help='File recording the last user id that is fully done')
+        parser.add_argument('--engine', choices=['scalar', 'vectorized'], default='scalar',
+                            help='vectorized evaluates each chunk with NumPy (CohortEvaluator)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Retry the failed users and continue after the id stored in the checkpoint')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--workers and --chunk-size must be at least 1")
+
+        start_after = 0
+        # Users that failed in the previous run and have not been retried yet
+        self.retry_pending = set()
+        if options['resume']:
+            try:
+                with open(options['checkpoint']) as f:
+                    checkpoint = json.load(f)
+            except FileNotFoundError:
+                raise CommandError(f"No checkpoint found at {options['checkpoint']}")
+            start_after = checkpoint['last_user_id']
+            self.retry_pending = set(checkpoint['failed'])
+            self.stdout.write(
+                f"Resuming after user id {start_after}, retrying {len(self.retry_pending)} failed user(s)"
+            )
+
+        self.processed = 0
+        self.failures = []
+        self.started = time.monotonic()
+        chunks = self.user_chunks(start_after, options['chunk_size'])
+
+        if options['workers'] == 1:
+            for user_ids, checkpoint_id in chunks:
+                self.record(user_ids, _recompute_chunk(user_ids, options['engine']))
+                self.save_checkpoint(options['checkpoint'], checkpoint_id)
+        else:
+            self.run_pool(chunks, options['workers'], options['checkpoint'], options['engine'])
+
+        elapsed = time.monotonic() - self.started
+        for user_id, error in self.failures:
+            self.stderr.write(f"User {user_id}: {error}")
+        if not self.failures and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed modes for {self.processed} users in {elapsed:.1f}s "
+            f"({self.processed / elapsed if elapsed else 0:.1f} users/s), {len(self.failures)} failed"
+        ))
+
+    def user_chunks(self, start_after, chunk_size):
+        """
+        Yield (user_ids, checkpoint_id) pairs: the users to retry first, then the
+        remaining user ids streamed in primary key order, ``chunk_size`` at a time
+        """
+        # Imported here so spawned workers can load this module before django.setup()
+        from django.contrib.auth.models import User
+
+        retry = sorted(self.retry_pending)
+        for start in range(0, len(retry), chunk_size):
+            yield retry[start:start + chunk_size], start_after
+
+        user_ids = User.objects.filter(pk__gt=start_after).order_by('pk').values_list('pk', flat=True)
+        chunk = []
+        for user_id in user_ids.iterator(chunk_size=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                yield chunk, chunk[-1]
+                chunk = []
+        if chunk:
+            yield chunk, chunk[-1]
+
+    def run_pool(self, chunks, workers, checkpoint, engine):
+        # Chunks finish out of order; the checkpoint only advances past chunks
+        # whose predecessors are all done
+        pending = {}
+        done = {}
+        next_to_checkpoint = 0
+        submitted = 0
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        ) as pool:
+            chunks = iter(chunks)
+            exhausted = False
+            while True:
+                # Keep a bounded number of chunks in flight
+                while not exhausted and len(pending) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    user_ids, checkpoint_id = chunk
+                    pending[pool.submit(_recompute_chunk, user_ids, engine)] = (submitted, user_ids, checkpoint_id)
+                    submitted += 1
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index, user_ids, checkpoint_id = pending.pop(future)
+                    self.record(user_ids, future.result())
+                    done[index] = checkpoint_id
+
+                while next_to_checkpoint in done:
+                    self.save_checkpoint(checkpoint, done.pop(next_to_checkpoint))
+                    next_to_checkpoint += 1
+
+    def record(self, user_ids, result):
+        updated, failures = result
+        self.retry_pending.difference_update(user_ids)
+        self.processed += updated
+        self.failures.extend(failures)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.processed} users done ({self.processed / elapsed if elapsed else 0:.1f} users/s), "
+            f"{len(self.failures)} failed"
+        )
+
+    def save_checkpoint(self, path, last_user_id):
+        with open(path, 'w') as f:
+            json.dump({
+                'last_user_id': last_user_id,
+                'processed': self.processed,
+                'failed': sorted(self.retry_pending.union(user_id for user_id, _ in self.failures)),
+            }, f)
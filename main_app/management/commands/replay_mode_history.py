@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main_app.services.mode_replay import ModeReplayService
+
+
+class Command(BaseCommand):
+    help = "Backfill ModeHistory by replaying each user's ledger month by month"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only replay the given username (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=200, help='Users replayed per transaction')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+
+        user_ids = list(users.values_list('pk', flat=True))
+        written = 0
+        for start in range(0, len(user_ids), options['batch_size']):
+            written += ModeReplayService.replay(user_ids[start:start + options['batch_size']])
+            self.stdout.write(f"{min(start + options['batch_size'], len(user_ids))}/{len(user_ids)} users replayed")
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {written} mode history events"))
@@ -0,0 +1,46 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main_app.services.month_rollover import MonthRolloverService
+
+
+class Command(BaseCommand):
+    help = "Create next month's Stability ratio targets and Vacay freedom fund plans for all active users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to prepare as YYYY-MM (defaults to next month)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per grouped query and bulk insert')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must look like 2025-07")
+        else:
+            # Dashboards pick the month from the UTC date, so this does too
+            month = MonthRolloverService.add_months(timezone.now().date().replace(day=1), 1)
+
+        self.users = self.targets = self.plans = 0
+        batch = []
+        for user_id in MonthRolloverService.active_user_ids(month).iterator(chunk_size=options['batch_size']):
+            batch.append(user_id)
+            if len(batch) >= options['batch_size']:
+                self.rollover(month, batch, options['batch_size'])
+                batch = []
+        if batch:
+            self.rollover(month, batch, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Prepared {month.strftime('%B %Y')} for {self.users} users: "
+            f"{self.targets} ratio targets, {self.plans} freedom fund plans created"
+        ))
+
+    def rollover(self, month, user_ids, batch_size):
+        targets, plans = MonthRolloverService.rollover(month, user_ids, batch_size)
+        self.users += len(user_ids)
+        self.targets += targets
+        self.plans += plans
+        self.stdout.write(f"{self.users} users done")
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from main_app.services.mode_jobs import ModeJobQueue
+
+
+class Command(BaseCommand):
+    help = "Process queued mode evaluations (ModeEvaluationJob) until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        self.stdout.write("Mode worker started")
+
+        try:
+            while True:
+                close_old_connections()
+
+                requeued = ModeJobQueue.requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+                jobs = ModeJobQueue.claim(options['batch_size'])
+                for job in jobs:
+                    if ModeJobQueue.process(job):
+                        processed += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f"Mode evaluation failed for {job.user.username}: {job.last_error}")
+
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Mode worker stopped: {processed} processed, {failed} failed"))
@@ -0,0 +1,116 @@
+import time
+from collections import Counter
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from main_app.services.mode_shadow import ModeShadow
+
+
+class Command(BaseCommand):
+    help = "Compare a candidate mode engine with ModeService.check_all_modes for every user, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', default=settings.MODE_SHADOW_ENGINE or 'cohort',
+                            help=f"Engine to compare ({', '.join(ModeShadow.ENGINES)})")
+        parser.add_argument('--batch-size', type=int, default=500, help='Users evaluated per batch')
+        parser.add_argument('--no-record', action='store_true',
+                            help='Only print the summary; do not store ModeShadowRun rows for mismatches')
+        parser.add_argument('--report', action='store_true',
+                            help='Summarize the stored sampled runs instead of running a comparison')
+
+    def handle(self, *args, **options):
+        engine = options['engine']
+        if engine not in ModeShadow.ENGINES:
+            raise CommandError(f"Unknown engine {engine!r} (choose from {', '.join(ModeShadow.ENGINES)})")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        if options['report']:
+            self.report(engine)
+            return
+
+        users = mismatched = inexact_users = 0
+        legacy_total = candidate_total = 0.0
+        by_mode = Counter()
+        inexact_by_mode = Counter()
+        started = time.monotonic()
+        now = timezone.now()
+
+        for batch in self.user_batches(options['batch_size']):
+            legacy_ms, candidate_ms, mismatches, inexact, inputs = ModeShadow.compare_batch(batch, engine, now)
+            users += len(batch)
+            mismatched += len(mismatches)
+            inexact_users += len(inexact)
+            for keys in inexact.values():
+                inexact_by_mode.update(keys)
+            legacy_total += legacy_ms
+            candidate_total += candidate_ms
+            for user in batch:
+                differences = mismatches.get(user.pk)
+                if not differences:
+                    continue
+                by_mode.update(difference['mode'] for difference in differences)
+                if not options['no_record']:
+                    # Latencies are the batch cost per user
+                    ModeShadow.record(
+                        user, engine, legacy_ms / len(batch), candidate_ms / len(batch),
+                        differences, inputs[user.pk], source='batch'
+                    )
+            self.stdout.write(
+                f"{users} users compared, {mismatched} mismatched "
+                f"(legacy {legacy_ms:.0f}ms, {engine} {candidate_ms:.0f}ms for this batch)"
+            )
+
+        for mode, count in by_mode.most_common():
+            self.stdout.write(f"  {mode}: {count} mismatched users")
+        # Left to the rule checks by the engine, so not compared
+        for mode, count in inexact_by_mode.most_common():
+            self.stdout.write(f"  {mode}: {count} inexact users")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compared {users} users in {time.monotonic() - started:.1f}s: {mismatched} mismatched, "
+            f"{inexact_users} with inexact results; "
+            f"legacy {legacy_total:.0f}ms ({legacy_total / users if users else 0:.2f}ms/user), "
+            f"{engine} {candidate_total:.0f}ms ({candidate_total / users if users else 0:.2f}ms/user)"
+        ))
+
+    def user_batches(self, batch_size):
+        batch = []
+        for user in User.objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def report(self, engine):
+        """
+        Mismatch rate and latency percentiles of the sampled runs for ``engine``
+        """
+        from main_app.models import ModeShadowRun
+
+        runs = list(ModeShadowRun.objects.filter(engine=engine, source='sample').values_list(
+            'legacy_ms', 'candidate_ms', 'mismatches', 'error'
+        ))
+        if not runs:
+            self.stdout.write(f"No sampled runs recorded for {engine}")
+            return
+
+        errors = sum(1 for _, _, _, error in runs if error)
+        mismatched = sum(1 for _, _, mismatches, _ in runs if mismatches)
+        self.stdout.write(f"{len(runs)} sampled runs: {mismatched} mismatched, {errors} engine errors")
+        for label, values in (
+            ('legacy', [legacy_ms for legacy_ms, _, _, _ in runs]),
+            (engine, [candidate_ms for _, candidate_ms, _, _ in runs if candidate_ms is not None]),
+        ):
+            values.sort()
+            if values:
+                self.stdout.write(
+                    f"  {label}: p50 {self.percentile(values, 50):.2f}ms, "
+                    f"p95 {self.percentile(values, 95):.2f}ms, max {values[-1]:.2f}ms"
+                )
+
+    @staticmethod
+    def percentile(values, percent):
+        return values[min(len(values) - 1, len(values) * percent // 100)]
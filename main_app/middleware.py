@@ -0,0 +1,60 @@
+import logging
+from django.conf import settings
+from .services.mode_jobs import ModeJobQueue
+from .services.mode_tracing import ModeTrace
+
+logger = logging.getLogger(__name__)
+
+
+class ModeNotificationMiddleware:
+    """
+    Shows unlock notifications produced by the background mode worker
+    on the user's next page view
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method == 'GET' and request.user.is_authenticated:
+            ModeJobQueue.deliver_notifications(request)
+        return self.get_response(request)
+
+
+class ModeEvaluationMiddleware:
+    """
+    Coalesces the mode evaluations requested by ledger writes during a request
+    into one per user, enqueued after the response is built
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ModeJobQueue.coalesce():
+            return self.get_response(request)
+
+
+class ModeTraceMiddleware:
+    """
+    With MODE_TRACING on, records the cost of every ModeService call made
+    while handling a request (available as ``request.mode_trace``) and logs it
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'MODE_TRACING', False):
+            return self.get_response(request)
+
+        with ModeTrace() as trace:
+            request.mode_trace = trace
+            response = self.get_response(request)
+
+        for row in trace.summary():
+            logger.info(
+                "%s %s: %d call(s), %.1fms, %d queries, %.1fms SQL",
+                request.path, row['name'], row['calls'], row['wall_ms'], row['queries'], row['sql_ms']
+            )
+        return response
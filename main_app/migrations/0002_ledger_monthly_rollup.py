@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 12:52
+
+import datetime
+import decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_ledger_rollup(apps, schema_editor):
+    Transaction = apps.get_model('main_app', 'Transaction')
+    LedgerMonthlyRollup = apps.get_model('main_app', 'LedgerMonthlyRollup')
+
+    buckets = Transaction.objects.annotate(
+        month_start=TruncMonth('date', tzinfo=datetime.timezone.utc)
+    ).values('user_id', 'month_start', 'transaction_type', 'category_id').annotate(
+        bucket_total=Sum('amount'),
+        bucket_count=Count('id')
+    ).order_by()
+
+    LedgerMonthlyRollup.objects.bulk_create([
+        LedgerMonthlyRollup(
+            user_id=bucket['user_id'],
+            year=bucket['month_start'].year,
+            month=bucket['month_start'].month,
+            transaction_type=bucket['transaction_type'],
+            category_id=bucket['category_id'],
+            total=decimal.Decimal(bucket['bucket_total']).quantize(decimal.Decimal('0.01')),
+            count=bucket['bucket_count'],
+        )
+        for bucket in buckets.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('transaction_type', models.CharField(choices=[('EXPENSE', 'Expense'), ('INCOME', 'Income')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main_app.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'year', 'month', 'transaction_type', 'category'), name='unique_ledger_rollup_bucket'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'year', 'month', 'transaction_type'), name='unique_ledger_rollup_uncategorized_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger_rollup, migrations.RunPython.noop),
+    ]
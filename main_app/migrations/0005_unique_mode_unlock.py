@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_mode_unlocks(apps, schema_editor):
+    ModeUnlock = apps.get_model('main_app', 'ModeUnlock')
+
+    # Keep the most advanced row per (user, name): unlocked first, then highest progress
+    seen = set()
+    duplicates = []
+    rows = ModeUnlock.objects.order_by(
+        'user_id', 'name', '-is_unlocked', '-progress_percentage', '-id'
+    ).values_list('id', 'user_id', 'name')
+    for pk, user_id, name in rows.iterator():
+        if (user_id, name) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((user_id, name))
+
+    for start in range(0, len(duplicates), 1000):
+        ModeUnlock.objects.filter(pk__in=duplicates[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_ledger_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_mode_unlocks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='modeunlock',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_mode_unlock_per_user'),
+        ),
+    ]
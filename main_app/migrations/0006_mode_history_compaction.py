@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 13:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_unique_mode_unlock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modehistory',
+            name='event_count',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='modehistory',
+            index=models.Index(fields=['user', '-timestamp'], name='modehistory_user_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_mode_history_compaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modehistory',
+            name='is_replayed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
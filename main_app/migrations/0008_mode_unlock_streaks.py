@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 13:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_current_streaks(apps, schema_editor):
+    ModeUnlock = apps.get_model('main_app', 'ModeUnlock')
+
+    # Unlocked modes have been in their current streak since triggered_on
+    today = timezone.now().date()
+    modes = []
+    for mode in ModeUnlock.objects.filter(is_unlocked=True).iterator():
+        mode.streak_started_on = mode.triggered_on.date() if mode.triggered_on else today
+        mode.streak_days = (today - mode.streak_started_on).days + 1
+        mode.longest_streak_days = mode.streak_days
+        modes.append(mode)
+    ModeUnlock.objects.bulk_update(
+        modes, ['streak_started_on', 'streak_days', 'longest_streak_days'], batch_size=1000
+    )
+    ModeUnlock.objects.filter(is_unlocked=False).update(streak_days=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_mode_history_replay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modeunlock',
+            name='longest_streak_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='modeunlock',
+            name='streak_started_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_current_streaks, migrations.RunPython.noop),
+    ]
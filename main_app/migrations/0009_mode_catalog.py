@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_mode_unlock_streaks'),
+    ]
+
+    operations = [
+        # Replaced by a (user, mode) constraint in 0011
+        migrations.RemoveConstraint(
+            model_name='modeunlock',
+            name='unique_mode_unlock_per_user',
+        ),
+        migrations.CreateModel(
+            name='Mode',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField()),
+                ('icon', models.CharField(default='💰', max_length=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='modeunlock',
+            name='mode',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='main_app.mode'),
+        ),
+        migrations.AddField(
+            model_name='modehistory',
+            name='mode',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='main_app.mode'),
+        ),
+        migrations.AddField(
+            model_name='modehistory',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
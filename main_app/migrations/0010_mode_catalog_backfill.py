@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-18 13:40
+
+from django.db import migrations
+from django.utils.text import slugify
+
+# The catalog as of this migration; ModeCatalog.sync() keeps it current afterwards
+MODES = [
+    ('lockdown_mode', 'lockdown', 'Lockdown Mode', 'Triggered when expenses exceed income. Time to evaluate spending and cut back on non-essentials.', '🔒'),
+    ('vacay_mode', 'vacay', 'Vacay Mode', "Triggered by sustained savings over 3+ months. You're building financial freedom!", '🏝️'),
+    ('survival_mode', 'survival', 'Survival Mode', 'Triggered by spending >50% of monthly income in the first 10 days. Budget carefully!', '⚠️'),
+    ('stability_mode', 'stability', 'Stability Mode', 'Triggered by consistent income/expense ratio over 4+ months. Financial stability achieved!', '🏆'),
+    ('saver_mode', 'saver', 'Saver Mode', "Triggered when total savings exceed 3x monthly income. You're building financial security!", '💰'),
+]
+
+
+def link_modes(apps, schema_editor):
+    Mode = apps.get_model('main_app', 'Mode')
+    ModeUnlock = apps.get_model('main_app', 'ModeUnlock')
+    ModeHistory = apps.get_model('main_app', 'ModeHistory')
+
+    for key, slug, name, description, icon in MODES:
+        Mode.objects.get_or_create(key=key, defaults={'slug': slug, 'name': name, 'description': description, 'icon': icon})
+
+    # Names no rule produces (e.g. loaded from old fixtures) get a catalog row of their own
+    catalog = dict(Mode.objects.values_list('name', 'id'))
+    names = set(ModeUnlock.objects.values_list('name', flat=True).distinct())
+    names |= set(ModeHistory.objects.values_list('mode_name', flat=True).distinct())
+    for name in sorted(names - set(catalog)):
+        unlock = ModeUnlock.objects.filter(name=name).first()
+        slug = slugify(name) or f'mode-{len(catalog) + 1}'
+        catalog[name] = Mode.objects.create(
+            key=slug.replace('-', '_'),
+            slug=slug,
+            name=name,
+            description=unlock.description if unlock else '',
+            icon=unlock.icon if unlock else '💰'
+        ).id
+
+    for name, mode_id in catalog.items():
+        ModeUnlock.objects.filter(name=name).update(mode_id=mode_id)
+        ModeHistory.objects.filter(mode_name=name).update(mode_id=mode_id)
+
+    # Keep the old free-text notes; new events store structured metrics
+    batch = []
+    for event in ModeHistory.objects.exclude(details__isnull=True).exclude(details='').only('id', 'details').iterator():
+        event.metrics = {'notes': event.details}
+        batch.append(event)
+        if len(batch) == 1000:
+            ModeHistory.objects.bulk_update(batch, ['metrics'])
+            batch = []
+    ModeHistory.objects.bulk_update(batch, ['metrics'])
+
+
+def unlink_modes(apps, schema_editor):
+    Mode = apps.get_model('main_app', 'Mode')
+    ModeUnlock = apps.get_model('main_app', 'ModeUnlock')
+    ModeHistory = apps.get_model('main_app', 'ModeHistory')
+
+    for mode in Mode.objects.all():
+        ModeUnlock.objects.filter(mode_id=mode.id).update(name=mode.name, description=mode.description, icon=mode.icon)
+        ModeHistory.objects.filter(mode_id=mode.id).update(mode_name=mode.name)
+
+    batch = []
+    for event in ModeHistory.objects.filter(metrics__has_key='notes').only('id', 'metrics').iterator():
+        event.details = event.metrics['notes']
+        batch.append(event)
+        if len(batch) == 1000:
+            ModeHistory.objects.bulk_update(batch, ['details'])
+            batch = []
+    ModeHistory.objects.bulk_update(batch, ['details'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_mode_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_modes, unlink_modes),
+    ]
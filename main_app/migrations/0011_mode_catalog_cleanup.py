@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_mode_catalog_backfill'),
+    ]
+
+    operations = [
+        # Defaults only so the removed columns can be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='modeunlock',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='modeunlock',
+            name='description',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='modehistory',
+            name='mode_name',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.RemoveField(
+            model_name='modeunlock',
+            name='name',
+        ),
+        migrations.RemoveField(
+            model_name='modeunlock',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='modeunlock',
+            name='icon',
+        ),
+        migrations.AlterField(
+            model_name='modeunlock',
+            name='mode',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main_app.mode'),
+        ),
+        migrations.AddConstraint(
+            model_name='modeunlock',
+            constraint=models.UniqueConstraint(fields=('user', 'mode'), name='unique_mode_unlock_per_user'),
+        ),
+        migrations.RemoveField(
+            model_name='modehistory',
+            name='mode_name',
+        ),
+        migrations.RemoveField(
+            model_name='modehistory',
+            name='details',
+        ),
+        migrations.AlterField(
+            model_name='modehistory',
+            name='mode',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main_app.mode'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0011_mode_catalog_cleanup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModeShadowRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('engine', models.CharField(max_length=50)),
+                ('source', models.CharField(choices=[('sample', 'Sampled evaluation'), ('batch', 'shadow_modes command')], default='sample', max_length=10)),
+                ('legacy_ms', models.FloatField()),
+                ('candidate_ms', models.FloatField(blank=True, null=True)),
+                ('mismatches', models.JSONField(blank=True, default=list)),
+                ('inputs', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['engine', 'created_at'], name='main_app_mo_engine_cee431_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 13:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_mode_shadow_run'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='freedomexpense',
+            index=models.Index(fields=['user', '-date'], name='main_app_fr_user_id_79a37b_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db import transaction as db_transaction
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -8,6 +9,22 @@ from django.db.models import Sum
 import isoweek
 
 
+class Mode(models.Model):
+    """
+    Catalog of the modes (one row per registered ModeRule). ModeUnlock and
+    ModeHistory reference it by id instead of repeating the mode's strings;
+    ModeCatalog keeps it in sync with the rules and caches it in memory.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    key = models.CharField(max_length=50, unique=True)  # Key in check_all_modes, e.g. 'stability_mode'
+    slug = models.SlugField(max_length=50, unique=True)  # Used in dashboard URLs
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField()
+    icon = models.CharField(max_length=10, default="💰")
+
+    def __str__(self):
+        return self.name
+
 class ModeUnlock(models.Model):
     """
     Model to track which modes each user has unlocked.
@@ -29,13 +46,70 @@ class ModeUnlock(models.Model):
     - ⚡ Lightning for quick transactions
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    name = models.CharField(max_length=100)
-    description = models.TextField()
-    icon = models.CharField(max_length=10, default="💰")
+    mode = models.ForeignKey(Mode, on_delete=models.PROTECT)
     is_unlocked = models.BooleanField(default=False)
     triggered_on = models.DateTimeField(null=True, blank=True)
     progress_percentage = models.IntegerField(default=0)
     streak_days = models.IntegerField(default=0)  # Track consecutive days in this mode
+    longest_streak_days = models.IntegerField(default=0)
+    streak_started_on = models.DateField(null=True, blank=True)  # First day of the current streak (UTC)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'mode'], name='unique_mode_unlock_per_user'),
+        ]
+
+    # Name, slug, description and icon come from the cached catalog (no join)
+    @property
+    def catalog_entry(self):
+        from main_app.services.mode_catalog import ModeCatalog
+
+        return ModeCatalog.get(self.mode_id)
+
+    @property
+    def name(self):
+        return self.catalog_entry.name
+
+    @property
+    def slug(self):
+        return self.catalog_entry.slug
+
+    @property
+    def description(self):
+        return self.catalog_entry.description
+
+    @property
+    def icon(self):
+        return self.catalog_entry.icon
+
+    def update_streak(self, today):
+        """
+        Start, extend or reset the streak to match is_unlocked as of ``today``.
+        Returns True when a streak field changed.
+        """
+        before = (self.streak_days, self.longest_streak_days, self.streak_started_on)
+        if self.is_unlocked:
+            if self.streak_started_on is None:
+                self.streak_started_on = today
+            self.streak_days = (today - self.streak_started_on).days + 1
+            self.longest_streak_days = max(self.longest_streak_days, self.streak_days)
+        else:
+            self.streak_started_on = None
+            self.streak_days = 0
+        return before != (self.streak_days, self.longest_streak_days, self.streak_started_on)
+
+    @property
+    def current_streak_days(self):
+        """
+        Current streak counted up to today (streak_days is as of the last evaluation)
+        """
+        if not self.is_unlocked or self.streak_started_on is None:
+            return 0
+        return (timezone.now().date() - self.streak_started_on).days + 1
+
+    @property
+    def best_streak_days(self):
+        return max(self.longest_streak_days, self.current_streak_days)
 
     def __str__(self):
         unlock_status = "Unlocked" if self.is_unlocked else "Locked"
@@ -44,7 +118,7 @@ class ModeUnlock(models.Model):
 class ModeHistory(models.Model):
     """Model to track history of mode changes and progress"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    mode_name = models.CharField(max_length=50)
+    mode = models.ForeignKey(Mode, on_delete=models.PROTECT)
     status_change = models.CharField(max_length=50, choices=[
         ('unlocked', 'Mode Unlocked'),
         ('locked', 'Mode Locked'),
@@ -52,14 +126,123 @@ class ModeHistory(models.Model):
     ])
     progress_percentage = models.IntegerField(default=0)
     timestamp = models.DateTimeField(default=timezone.now)
-    details = models.TextField(blank=True, null=True)
+    # Numbers behind the event, as returned in the rule's 'metrics' (amounts in cents)
+    metrics = models.JSONField(default=dict, blank=True)
+    # Number of progress updates this row stands for once compacted (see compact_mode_history)
+    event_count = models.IntegerField(default=1)
+    # Reconstructed from the ledger by replay_mode_history rather than recorded live
+    is_replayed = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='modehistory_user_time_idx'),
+        ]
     
+    @property
+    def mode_name(self):
+        from main_app.services.mode_catalog import ModeCatalog
+
+        return ModeCatalog.get(self.mode_id).name
+
     def __str__(self):
         return f"{self.user.username} - {self.mode_name} - {self.status_change} on {self.timestamp.strftime('%Y-%m-%d')}"
 
+class ModeEvaluationJob(models.Model):
+    """Queued mode re-evaluation for a user, processed by the run_mode_worker command"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            # One pending job per user is enough to pick up every change
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_mode_job_per_user'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - mode evaluation {self.get_status_display()} ({self.attempts} attempts)"
+
+class ModeNotification(models.Model):
+    """Unlock notification waiting to be shown on the user's next page view"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    message = models.CharField(max_length=300)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'delivered_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.message[:40]}"
+
+class ModeShadowRun(models.Model):
+    """A candidate mode engine compared against ModeService.check_all_modes (see services/mode_shadow.py)"""
+    SOURCE_CHOICES = [
+        ('sample', 'Sampled evaluation'),
+        ('batch', 'shadow_modes command'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    engine = models.CharField(max_length=50)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='sample')
+    legacy_ms = models.FloatField()
+    candidate_ms = models.FloatField(null=True, blank=True)
+    # [{'mode', 'legacy', 'candidate'}], empty when both paths agree
+    mismatches = models.JSONField(default=list, blank=True)
+    # Rule inputs, kept for runs with mismatches or errors
+    inputs = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['engine', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.engine} shadow run ({len(self.mismatches)} mismatches)"
+
+class LedgerState(models.Model):
+    """
+    Per-user ledger version, bumped by writes to mode inputs. ModeService skips
+    re-evaluation while the ModeUnlock rows were computed from the current version
+    on the current (UTC) day.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='ledger_state')
+    version = models.BigIntegerField(default=0)
+    modes_version = models.BigIntegerField(null=True, blank=True)  # Version the ModeUnlock state was computed from
+    modes_evaluated_on = models.DateField(null=True, blank=True)
+    
+    def modes_are_current(self, today=None):
+        today = today or timezone.now().date()
+        return self.modes_version == self.version and self.modes_evaluated_on == today
+    
+    def __str__(self):
+        return f"{self.user.username} - ledger v{self.version} (modes v{self.modes_version})"
+
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('EXPENSE', 'Expense'),
@@ -79,7 +262,9 @@ class Transaction(models.Model):
         # Ensure the date is timezone-aware
         if self.date and not timezone.is_aware(self.date):
             self.date = timezone.make_aware(self.date)
-        super().save(*args, **kwargs)
+        # Keep the row and its LedgerMonthlyRollup bucket (updated by signals) in one transaction
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} - ${self.amount} - {self.description[:30]}"
@@ -90,31 +275,22 @@ class Transaction(models.Model):
         Get monthly totals for income and expenses for a specific month
         If year and month are not provided, use current month
         """
-        from django.db.models import Sum
-        from django.utils import timezone
-        
         if year is None or month is None:
             now = timezone.now()
             year = now.year
             month = now.month
             
-        # Get first and last day of the month
-        first_day = timezone.datetime(year, month, 1)
-        if month == 12:
-            last_day = timezone.datetime(year + 1, 1, 1) - timezone.timedelta(days=1)
-        else:
-            last_day = timezone.datetime(year, month + 1, 1) - timezone.timedelta(days=1)
-            
-        # Get transactions for the month
-        transactions = cls.objects.filter(
+        # Read the month's rollup buckets instead of the raw transactions
+        totals = LedgerMonthlyRollup.objects.filter(
             user=user,
-            date__gte=first_day,
-            date__lte=last_day
-        )
+            year=year,
+            month=month
+        ).values('transaction_type').annotate(total=Sum('total')).order_by()
+        totals = {row['transaction_type']: row['total'] for row in totals}
         
         # Calculate totals
-        income = transactions.filter(transaction_type='INCOME').aggregate(total=Sum('amount'))['total'] or 0
-        expenses = transactions.filter(transaction_type='EXPENSE').aggregate(total=Sum('amount'))['total'] or 0
+        income = totals.get('INCOME') or 0
+        expenses = totals.get('EXPENSE') or 0
         
         return {
             'income': income,
@@ -127,35 +303,56 @@ class Transaction(models.Model):
         """
         Get monthly totals by category for a specific month
         """
-        from django.db.models import Sum
-        from django.utils import timezone
-        
         if year is None or month is None:
             now = timezone.now()
             year = now.year
             month = now.month
             
-        # Get first and last day of the month
-        first_day = timezone.datetime(year, month, 1)
-        if month == 12:
-            last_day = timezone.datetime(year + 1, 1, 1) - timezone.timedelta(days=1)
-        else:
-            last_day = timezone.datetime(year, month + 1, 1) - timezone.timedelta(days=1)
-            
-        # Get transactions for the month grouped by category
-        transactions = cls.objects.filter(
+        # Get the month's rollup buckets grouped by category
+        transactions = LedgerMonthlyRollup.objects.filter(
             user=user,
-            date__gte=first_day,
-            date__lte=last_day
+            year=year,
+            month=month
         ).values('category__category_type', 'transaction_type').annotate(
-            total=Sum('amount')
-        )
+            total=Sum('total')
+        ).order_by()
         
         return transactions
 
     class Meta:
         ordering = ['-date']
 
+class LedgerMonthlyRollup(models.Model):
+    """
+    Per-user monthly ledger totals, kept in step with Transaction writes by signals.
+    Months are UTC calendar months, matching ModeService. Use the
+    rebuild_ledger_rollup command after bulk operations that bypass signals.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    category = models.ForeignKey('Category', on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.year}-{self.month:02d} {self.transaction_type} - ${self.total} ({self.count})"
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'transaction_type', 'category'],
+                name='unique_ledger_rollup_bucket'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'transaction_type'],
+                condition=models.Q(category__isnull=True),
+                name='unique_ledger_rollup_uncategorized_bucket'
+            ),
+        ]
+
 class Calendar(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     year = models.IntegerField()
@@ -520,3 +717,6 @@ class FreedomExpense(models.Model):
     
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date']),
+        ]
@@ -0,0 +1,196 @@
+import numpy as np
+from datetime import timezone as dt_timezone
+from django.utils import timezone
+from main_app.services.financial_snapshot import FinancialSnapshot
+from main_app.services.money import to_cents
+
+
+class CohortEvaluator:
+    """
+    Evaluates the mode rules for many users at once with NumPy.
+
+    Loads the same grouped rows FinancialSnapshot is built from into integer-cent
+    arrays of shape (users, months) and applies every rule as array arithmetic.
+    Comparisons are done on integer cents, the same as the checks in
+    ModeService. Where those checks divide in Decimal (the stability ratios and the
+    saver target) rows that land exactly on, or within float error of, a
+    threshold are flagged as not exact; callers fall back to the scalar check
+    for those users.
+    """
+
+    # Keys and names as returned by ModeService.check_all_modes
+    MODES = {
+        'lockdown_mode': 'Lockdown Mode',
+        'vacay_mode': 'Vacay Mode',
+        'survival_mode': 'Survival Mode',
+        'stability_mode': 'Stability Mode',
+        'saver_mode': 'Saver Mode',
+    }
+
+    # Distance from a threshold below which float64 results are not trusted
+    TOLERANCE = 1e-9
+
+    def __init__(self, user_ids, now=None):
+        self.now = (now or timezone.now()).astimezone(dt_timezone.utc)
+        self.user_ids = list(user_ids)
+        self.rows_by_user = FinancialSnapshot.grouped_rows(self.user_ids, self.now)
+        self._load()
+
+    def _load(self):
+        """
+        Fill the cent arrays from the grouped rows. Month slot 0 is the first
+        month that can overlap a trailing window; later slots run up to the
+        newest month seen (future-dated transactions included).
+        """
+        recent_start = FinancialSnapshot.recent_start(self.now)
+        base = recent_start.year * 12 + recent_start.month - 1
+        self.current_slot = self.now.year * 12 + self.now.month - 1 - base
+
+        recent = []
+        months = self.current_slot + 1
+        for index, user_id in enumerate(self.user_ids):
+            for row in self.rows_by_user[user_id]:
+                slot = row['month'].year * 12 + row['month'].month - 1 - base
+                recent.append((index, slot, row))
+                months = max(months, slot + 1)
+
+        users = len(self.user_ids)
+        shape = (users, months)
+        self.total_income = np.zeros(users, dtype=np.int64)
+        self.total_expenses = np.zeros(users, dtype=np.int64)
+        self.month_income = np.zeros(shape, dtype=np.int64)
+        self.month_expenses_to_date = np.zeros(shape, dtype=np.int64)
+        self.windows = {
+            days: {
+                'income': np.zeros(shape, dtype=np.int64),
+                'expenses': np.zeros(shape, dtype=np.int64),
+                'income_count': np.zeros(shape, dtype=np.int64),
+                'expense_count': np.zeros(shape, dtype=np.int64),
+            }
+            for days in FinancialSnapshot.windows()
+        }
+
+        for index, slot, row in recent:
+            income = row['transaction_type'] == 'INCOME'
+            total = to_cents(row['total'])
+            if income:
+                self.total_income[index] += total
+            else:
+                self.total_expenses[index] += total
+
+            # Rollup rows are older than every window
+            if slot < 0:
+                continue
+
+            if income:
+                self.month_income[index, slot] += total
+            else:
+                self.month_expenses_to_date[index, slot] += to_cents(row['to_date'])
+
+            side, count_key = ('income', 'income_count') if income else ('expenses', 'expense_count')
+            for days, window in self.windows.items():
+                window[side][index, slot] += to_cents(row[f'last_{days}'])
+                window[count_key][index, slot] += row[f'last_{days}_count']
+
+    def evaluate(self):
+        """
+        Returns {mode key: {'is_unlocked': bool array, 'progress': int array,
+        'exact': bool array}} indexed like ``user_ids``
+        """
+        return {
+            'lockdown_mode': self.lockdown(),
+            'vacay_mode': self.vacay(),
+            'survival_mode': self.survival(),
+            'stability_mode': self.stability(),
+            'saver_mode': self.saver(),
+        }
+
+    def _result(self, is_unlocked, progress, exact=None):
+        if exact is None:
+            exact = np.ones(len(self.user_ids), dtype=bool)
+        return {'is_unlocked': is_unlocked, 'progress': progress.astype(np.int64), 'exact': exact}
+
+    @staticmethod
+    def _ratio_percent(numerator, denominator):
+        """
+        floor(numerator / denominator * 100) capped at 100, 0 where denominator <= 0
+        """
+        positive = denominator > 0
+        percent = np.zeros(numerator.shape, dtype=np.int64)
+        percent[positive] = np.minimum(100, (numerator[positive] * 100) // denominator[positive])
+        return percent
+
+    def lockdown(self):
+        return self._result(
+            self.total_expenses > self.total_income,
+            self._ratio_percent(self.total_expenses, self.total_income)
+        )
+
+    def vacay(self):
+        window = self.windows[90]
+        active = (window['income_count'] > 0) | (window['expense_count'] > 0)
+        counted = active & (window['income'] > 0) & (window['expenses'] >= 0)
+        # (income - expenses) / income >= 0.15
+        saving = counted & ((window['income'] - window['expenses']) * 100 >= window['income'] * 15)
+        savings_months = saving.sum(axis=1)
+
+        progress = np.where(active.any(axis=1), np.minimum(100, savings_months * 100 // 3), 0)
+        return self._result(savings_months >= 3, progress)
+
+    def survival(self):
+        users = len(self.user_ids)
+        if self.now.day > 10:
+            return self._result(np.zeros(users, dtype=bool), np.zeros(users, dtype=np.int64))
+
+        previous_income = self.month_income[:, self.current_slot - 1]
+        early_expenses = self.month_expenses_to_date[:, self.current_slot]
+        # expenses / previous income > 0.5
+        is_unlocked = (previous_income > 0) & (early_expenses * 2 > previous_income)
+        return self._result(is_unlocked, self._ratio_percent(early_expenses, previous_income))
+
+    def stability(self):
+        window = self.windows[120]
+        active = (window['income_count'] > 0) | (window['expense_count'] > 0)
+        counted = active & (window['income'] > 0) & (window['expenses'] > 0)
+        months = counted.sum(axis=1)
+
+        ratios = np.divide(
+            window['expenses'], window['income'],
+            out=np.zeros(window['income'].shape), where=counted
+        )
+        average = np.divide(ratios.sum(axis=1), months, out=np.ones(months.shape), where=months > 0)
+        deviation = np.abs(ratios - average[:, None]) / average[:, None]
+        consistent = (counted & (deviation <= 0.1)).sum(axis=1)
+        borderline = (counted & (np.abs(deviation - 0.1) < self.TOLERANCE)).any(axis=1)
+
+        enough = months >= 4
+        progress = np.where(enough, np.minimum(100, consistent * 25), np.minimum(75, months * 25))
+        return self._result(enough & (consistent >= 4), progress, ~(enough & borderline))
+
+    def saver(self):
+        window = self.windows[180]
+        with_income = window['income_count'] > 0
+        months = with_income.sum(axis=1)
+        income = np.where(with_income, window['income'], 0).sum(axis=1)
+        savings = self.total_income - self.total_expenses
+
+        # savings / (3 * income / months), compared as integers
+        has_target = (months > 0) & (income > 0)
+        scaled_savings = savings * months
+        target = 3 * income
+        is_unlocked = has_target & (scaled_savings >= target)
+        progress = self._ratio_percent(np.where(has_target, scaled_savings, 0), np.where(has_target, target, 0))
+
+        # The Decimal average is rounded, so exact hits on the target or on a
+        # whole percent may land on either side
+        safe_target = np.where(has_target, target, 1)
+        borderline = has_target & (
+            (scaled_savings == target) | ((scaled_savings * 100) % safe_target == 0)
+        )
+        return self._result(is_unlocked, progress, ~borderline)
+
+    def snapshot(self, user_id):
+        """
+        FinancialSnapshot for one user of the cohort, for the scalar checks
+        """
+        return FinancialSnapshot.from_rows(self.rows_by_user[user_id], self.now)
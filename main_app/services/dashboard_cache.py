@@ -0,0 +1,112 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+
+class DashboardCache:
+    """
+    Caches each mode dashboard's payload per user.
+
+    Entries are keyed by user, mode, a data version for that (user, mode)
+    pair and the date, so a write only has to bump the version of the
+    dashboards it feeds (see DASHBOARD_INPUTS in signals.py) and stale entries
+    simply stop being read; the date in the key rolls month-to-date figures
+    over at midnight UTC. Versions and hit/miss counters live in the same
+    cache (the ``dashboards`` alias), which every web process must share: a
+    version bumped in one worker's local memory would leave the others
+    serving stale payloads, so LocMemCache is only used under DEBUG.
+    """
+
+    ALIAS = 'dashboards'
+    PREFIX = 'dashboard'
+
+    @classmethod
+    def cache(cls):
+        return caches[cls.ALIAS]
+
+    @classmethod
+    def enabled(cls):
+        return settings.DEBUG or not isinstance(cls.cache(), LocMemCache)
+
+    @classmethod
+    def get_or_build(cls, user_id, mode_key, build):
+        """
+        The cached payload for (user, mode), or build() stored under the
+        current version
+        """
+        if not cls.enabled():
+            return build()
+        cache = cls.cache()
+        version = cls.version(user_id, mode_key)
+        key = f'{cls.PREFIX}:{user_id}:{mode_key}:{version}:{timezone.now().date().isoformat()}'
+        payload = cache.get(key)
+        if payload is not None:
+            cls._count('hits', mode_key)
+            return payload
+
+        cls._count('misses', mode_key)
+        payload = build()
+        cache.set(key, payload, settings.DASHBOARD_CACHE_TIMEOUT)
+        return payload
+
+    @classmethod
+    def version(cls, user_id, mode_key):
+        cache = cls.cache()
+        key = f'{cls.PREFIX}:version:{user_id}:{mode_key}'
+        version = cache.get(key)
+        if version is None:
+            # Never reuse a number an evicted version key may have reached
+            version = time.time_ns()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        return version
+
+    @classmethod
+    def invalidate(cls, user_id, mode_keys):
+        """
+        Bump the (user, mode) versions so the next view rebuilds those dashboards
+        """
+        if not cls.enabled():
+            return
+        cache = cls.cache()
+        for mode_key in mode_keys:
+            key = f'{cls.PREFIX}:version:{user_id}:{mode_key}'
+            try:
+                cache.incr(key)
+            except ValueError:
+                # No version yet: the first view will pick a fresh one
+                pass
+
+    @classmethod
+    def _count(cls, event, mode_key):
+        cache = cls.cache()
+        key = f'{cls.PREFIX}:stats:{event}:{mode_key}'
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+    @classmethod
+    def stats(cls, mode_keys):
+        """
+        {mode key: {'hits': n, 'misses': n}} counted since the last reset
+        """
+        cache = cls.cache()
+        keys = {
+            (mode_key, event): f'{cls.PREFIX}:stats:{event}:{mode_key}'
+            for mode_key in mode_keys for event in ('hits', 'misses')
+        }
+        values = cache.get_many(keys.values())
+        return {
+            mode_key: {event: values.get(keys[(mode_key, event)], 0) for event in ('hits', 'misses')}
+            for mode_key in mode_keys
+        }
+
+    @classmethod
+    def reset_stats(cls, mode_keys):
+        cls.cache().delete_many([
+            f'{cls.PREFIX}:stats:{event}:{mode_key}' for mode_key in mode_keys for event in ('hits', 'misses')
+        ])
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import TruncMonth
+from main_app.services.money import to_cents
+
+
+class FinancialSnapshot:
+    """
+    Aggregated view of a user's ledger shared by every ModeService check.
+
+    Built from grouped rows, one per (month, transaction type), carrying the month
+    total, the month-to-date total and the totals that fall inside each trailing
+    window used by the mode rules. Months are bucketed in UTC, the same way the
+    checks always grouped ``t.date.year, t.date.month``. All amounts are integer
+    cents (see services/money.py).
+    """
+
+    def __init__(self, now, months, total_income=None, total_expenses=None):
+        self.now = now
+        self.start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # {(year, month): bucket} - see empty_bucket() for the bucket layout
+        self.months = months
+        # Lifetime totals default to the sum of the buckets; callers that only
+        # fill in recent months pass them explicitly
+        if total_income is None:
+            total_income = sum(m['income'] for m in months.values())
+        if total_expenses is None:
+            total_expenses = sum(m['expenses'] for m in months.values())
+        self.total_income = total_income
+        self.total_expenses = total_expenses
+
+    @staticmethod
+    def windows():
+        """
+        The trailing windows (in days) the registered mode rules declare
+        """
+        from main_app.services.mode_rules import ModeRuleRegistry  # Import here to avoid circular imports
+
+        return ModeRuleRegistry.plan().windows
+
+    @classmethod
+    def empty_bucket(cls):
+        return {
+            'income': 0,
+            'expenses': 0,
+            'income_to_date': 0,
+            'expenses_to_date': 0,
+            'windows': {
+                days: {'income': 0, 'expenses': 0, 'income_count': 0, 'expense_count': 0}
+                for days in cls.windows()
+            },
+        }
+
+    @classmethod
+    def build(cls, user, now=None):
+        """
+        Build the snapshot for a user.
+
+        Months that end before the longest window come from LedgerMonthlyRollup,
+        so lifetime totals cost O(months). Recent months are aggregated from the
+        raw rows in one grouped query so the day-based windows stay exact.
+        """
+        return cls.build_many([user.pk], now)[user.pk]
+
+    @classmethod
+    def build_many(cls, user_ids, now=None):
+        """
+        Build snapshots for several users with the same two grouped queries
+        build() uses, grouped by user as well. Returns {user_id: snapshot};
+        users without transactions get an empty snapshot.
+        """
+        now = (now or timezone.now()).astimezone(dt_timezone.utc)
+        rows_by_user = cls.grouped_rows(user_ids, now)
+        return {user_id: cls.from_rows(rows, now) for user_id, rows in rows_by_user.items()}
+
+    @classmethod
+    def grouped_rows(cls, user_ids, now):
+        """
+        Run the grouped queries and return {user_id: [(month, transaction_type) row, ...]}
+        """
+        from main_app.models import Transaction, LedgerMonthlyRollup  # Import here to avoid circular imports
+
+        recent_start = cls.recent_start(now)
+
+        older_months = LedgerMonthlyRollup.objects.filter(
+            Q(year__lt=recent_start.year) | Q(year=recent_start.year, month__lt=recent_start.month),
+            user_id__in=user_ids
+        ).values('user_id', 'year', 'month', 'transaction_type').annotate(month_total=Sum('total')).order_by()
+
+        aggregates = {
+            'total': Sum('amount'),
+            'to_date': Sum('amount', filter=Q(date__lte=now)),
+        }
+        for days in cls.windows():
+            since = now - timedelta(days=days)
+            aggregates[f'last_{days}'] = Sum('amount', filter=Q(date__gte=since))
+            aggregates[f'last_{days}_count'] = Count('id', filter=Q(date__gte=since))
+
+        recent_months = Transaction.objects.filter(
+            user_id__in=user_ids,
+            date__gte=recent_start
+        ).annotate(
+            month=TruncMonth('date', tzinfo=dt_timezone.utc)
+        ).values('user_id', 'month', 'transaction_type').annotate(**aggregates).order_by()
+
+        rows_by_user = {user_id: [] for user_id in user_ids}
+        for row in older_months:
+            rows_by_user[row['user_id']].append(cls.rollup_row(row))
+        for row in recent_months:
+            rows_by_user[row['user_id']].append(row)
+        return rows_by_user
+
+    @classmethod
+    def recent_start(cls, now):
+        """
+        First day of the oldest month that can overlap a trailing window
+        """
+        return (now - timedelta(days=max(cls.windows()))).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+
+    @classmethod
+    def rollup_row(cls, row):
+        """
+        Shape a rollup aggregate like a recent-months row (outside every window)
+        """
+        shaped = {
+            'month': datetime(row['year'], row['month'], 1, tzinfo=dt_timezone.utc),
+            'transaction_type': row['transaction_type'],
+            'total': row['month_total'],
+            'to_date': row['month_total'],
+        }
+        for days in cls.windows():
+            shaped[f'last_{days}'] = None
+            shaped[f'last_{days}_count'] = 0
+        return shaped
+
+    @classmethod
+    def from_rows(cls, rows, now):
+        """
+        Fold grouped (month, transaction_type) aggregate rows into month buckets
+        """
+        months = {}
+        for row in rows:
+            month_key = (row['month'].year, row['month'].month)
+            bucket = months.setdefault(month_key, cls.empty_bucket())
+
+            side = 'income' if row['transaction_type'] == 'INCOME' else 'expenses'
+            count_key = 'income_count' if side == 'income' else 'expense_count'
+
+            bucket[side] += to_cents(row['total'])
+            bucket[f'{side}_to_date'] += to_cents(row['to_date'])
+            for days in cls.windows():
+                bucket['windows'][days][side] += to_cents(row[f'last_{days}'])
+                bucket['windows'][days][count_key] += row[f'last_{days}_count']
+
+        return cls(now, months)
+
+    def trailing_months(self, days):
+        """
+        Per-month income/expense totals for transactions dated within the last
+        ``days`` days, newest month first. Months without activity are omitted.
+        """
+        result = []
+        for month_key in sorted(self.months, reverse=True):
+            window = self.months[month_key]['windows'][days]
+            if window['income_count'] or window['expense_count']:
+                result.append((month_key, window))
+        return result
+
+    def month_totals(self, year, month):
+        """
+        Whole-month income/expense totals for a calendar month
+        """
+        bucket = self.months.get((year, month))
+        if not bucket:
+            return {'income': 0, 'expenses': 0}
+        return {'income': bucket['income'], 'expenses': bucket['expenses']}
+
+    def month_to_date_expenses(self):
+        """
+        Expenses dated between the start of the current month and now
+        """
+        bucket = self.months.get((self.now.year, self.now.month))
+        return bucket['expenses_to_date'] if bucket else 0
@@ -0,0 +1,169 @@
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Sum, Count
+from django.db.models.functions import TruncMonth
+
+
+class LedgerRollupService:
+    """
+    Maintains LedgerMonthlyRollup, the per-user (year, month, transaction type, category)
+    sums and counts that monthly reads use instead of scanning Transaction rows.
+    """
+
+    @staticmethod
+    def bucket_key(user_id, date, transaction_type, category_id):
+        """
+        Rollup key for a transaction; months are UTC calendar months
+        """
+        date = date.astimezone(dt_timezone.utc)
+        return {
+            'user_id': user_id,
+            'year': date.year,
+            'month': date.month,
+            'transaction_type': transaction_type,
+            'category_id': category_id,
+        }
+
+    @classmethod
+    def apply(cls, key, amount, count):
+        """
+        Add ``amount`` and ``count`` to a rollup bucket, creating it when needed.
+        Buckets whose count drops to zero are removed.
+        """
+        from main_app.models import LedgerMonthlyRollup  # Import here to avoid circular imports
+
+        with db_transaction.atomic():
+            updated = LedgerMonthlyRollup.objects.filter(**key).update(
+                total=F('total') + amount,
+                count=F('count') + count
+            )
+            if updated:
+                if count < 0:
+                    LedgerMonthlyRollup.objects.filter(count__lte=0, **key).delete()
+                return
+
+            # Nothing to subtract from (e.g. the bucket was already removed by a cascade)
+            if count <= 0:
+                return
+
+            try:
+                with db_transaction.atomic():
+                    LedgerMonthlyRollup.objects.create(total=amount, count=count, **key)
+            except IntegrityError:
+                # A concurrent writer created the bucket first
+                LedgerMonthlyRollup.objects.filter(**key).update(
+                    total=F('total') + amount,
+                    count=F('count') + count
+                )
+
+    @staticmethod
+    def previous_state(instance):
+        """
+        Fetch the stored version of a Transaction that is about to be saved
+        """
+        if instance._state.adding or instance.pk is None:
+            return None
+        return type(instance).objects.filter(pk=instance.pk).values(
+            'user_id', 'date', 'transaction_type', 'category_id', 'amount'
+        ).first()
+
+    @classmethod
+    def record_save(cls, instance, previous=None):
+        """
+        Move a saved Transaction into its bucket, taking it out of its old one
+        when the amount, date, type or category changed
+        """
+        amount = Decimal(str(instance.amount))
+        key = cls.bucket_key(instance.user_id, instance.date, instance.transaction_type, instance.category_id)
+
+        if previous is None:
+            cls.apply(key, amount, 1)
+            return
+
+        previous_key = cls.bucket_key(
+            previous['user_id'], previous['date'], previous['transaction_type'], previous['category_id']
+        )
+        if previous_key == key:
+            if amount != previous['amount']:
+                cls.apply(key, amount - previous['amount'], 0)
+        else:
+            cls.apply(previous_key, -previous['amount'], -1)
+            cls.apply(key, amount, 1)
+
+    @classmethod
+    def record_delete(cls, instance):
+        key = cls.bucket_key(instance.user_id, instance.date, instance.transaction_type, instance.category_id)
+        cls.apply(key, -Decimal(str(instance.amount)), -1)
+
+    @classmethod
+    def fold_category(cls, category):
+        """
+        Merge a category's buckets into the uncategorized buckets before the
+        category is deleted (its transactions are SET_NULL without signals).
+        Existing rows are only updated or re-pointed, never inserted, so this is
+        also safe while the owning user is being cascade-deleted.
+        """
+        from main_app.models import LedgerMonthlyRollup
+
+        with db_transaction.atomic():
+            for row in LedgerMonthlyRollup.objects.filter(category=category):
+                merged = LedgerMonthlyRollup.objects.filter(
+                    user_id=row.user_id,
+                    year=row.year,
+                    month=row.month,
+                    transaction_type=row.transaction_type,
+                    category__isnull=True
+                ).update(total=F('total') + row.total, count=F('count') + row.count)
+
+                if merged:
+                    LedgerMonthlyRollup.objects.filter(pk=row.pk).delete()
+                else:
+                    LedgerMonthlyRollup.objects.filter(pk=row.pk).update(category=None)
+
+    @classmethod
+    def rebuild(cls, users=None, batch_size=1000):
+        """
+        Recompute the rollup from scratch, for everyone or for the given users.
+        Returns the number of buckets written.
+        """
+        from main_app.models import LedgerMonthlyRollup, Transaction
+
+        transactions = Transaction.objects.all()
+        rollups = LedgerMonthlyRollup.objects.all()
+        if users is not None:
+            transactions = transactions.filter(user__in=users)
+            rollups = rollups.filter(user__in=users)
+
+        buckets = transactions.annotate(
+            month_start=TruncMonth('date', tzinfo=dt_timezone.utc)
+        ).values(
+            'user_id', 'month_start', 'transaction_type', 'category_id'
+        ).annotate(
+            bucket_total=Sum('amount'),
+            bucket_count=Count('id')
+        ).order_by()
+
+        written = 0
+        with db_transaction.atomic():
+            rollups.delete()
+            batch = []
+            for bucket in buckets.iterator(chunk_size=batch_size):
+                batch.append(LedgerMonthlyRollup(
+                    user_id=bucket['user_id'],
+                    year=bucket['month_start'].year,
+                    month=bucket['month_start'].month,
+                    transaction_type=bucket['transaction_type'],
+                    category_id=bucket['category_id'],
+                    total=Decimal(bucket['bucket_total']).quantize(Decimal('0.01')),
+                    count=bucket['bucket_count']
+                ))
+                if len(batch) >= batch_size:
+                    LedgerMonthlyRollup.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                LedgerMonthlyRollup.objects.bulk_create(batch)
+                written += len(batch)
+
+        return written
@@ -0,0 +1,79 @@
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import BigIntegerField, Case, F, Value, When
+from django.utils import timezone
+
+
+class LedgerStateService:
+    """
+    Reads and bumps the per-user LedgerState version used to gate mode evaluation
+    """
+
+    @staticmethod
+    def get(user):
+        from main_app.models import LedgerState  # Import here to avoid circular imports
+
+        try:
+            with db_transaction.atomic():
+                state, created = LedgerState.objects.get_or_create(user=user)
+        except IntegrityError:
+            state = LedgerState.objects.get(user=user)
+        return state
+
+    @staticmethod
+    def bump(user_id):
+        """
+        Mark the user's ledger as changed. Only updates an existing row: a user
+        without a LedgerState has never been evaluated, so there is nothing to
+        invalidate (and this keeps cascade deletes of the user safe).
+        """
+        from main_app.models import LedgerState
+
+        LedgerState.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+    @staticmethod
+    def modes_are_current(user):
+        from main_app.models import LedgerState
+
+        return LedgerState.objects.filter(
+            user=user,
+            modes_version=F('version'),
+            modes_evaluated_on=timezone.now().date()
+        ).exists()
+
+    @staticmethod
+    def mark_evaluated(user, version):
+        """
+        Record the ledger version the ModeUnlock rows were just computed from
+        """
+        from main_app.models import LedgerState
+
+        LedgerState.objects.filter(user=user).update(
+            modes_version=version,
+            modes_evaluated_on=timezone.now().date()
+        )
+
+    @staticmethod
+    def versions(user_ids):
+        """
+        Current ledger version for each user that has a LedgerState
+        """
+        from main_app.models import LedgerState
+
+        return dict(LedgerState.objects.filter(user_id__in=user_ids).values_list('user_id', 'version'))
+
+    @staticmethod
+    def mark_evaluated_many(versions):
+        """
+        mark_evaluated() for a batch of users, given {user_id: version}
+        """
+        from main_app.models import LedgerState
+
+        if not versions:
+            return
+        LedgerState.objects.filter(user_id__in=versions).update(
+            modes_version=Case(
+                *[When(user_id=user_id, then=Value(version)) for user_id, version in versions.items()],
+                output_field=BigIntegerField()
+            ),
+            modes_evaluated_on=timezone.now().date()
+        )
@@ -0,0 +1,95 @@
+import threading
+from django.db import IntegrityError, transaction as db_transaction
+from main_app.services.mode_rules import MODE_DEFINITIONS
+
+
+class ModeCatalog:
+    """
+    In-memory copy of the Mode table, kept in sync with the registered rules.
+
+    The table is tiny and only grows when a rule is added, so it is read once
+    per process and lookups by id, key, name or slug never query. A miss
+    (e.g. a mode added by another process) reloads it.
+    """
+
+    _lock = threading.Lock()
+    _by_id = {}
+    _by_key = {}
+    _synced = False
+
+    @classmethod
+    def sync(cls):
+        """
+        Insert or update a Mode row for every registered rule and reload the cache
+        """
+        from main_app.models import Mode  # Import here to avoid circular imports
+
+        with cls._lock:
+            existing = {mode.key: mode for mode in Mode.objects.all()}
+            changed = []
+            for key, definition in MODE_DEFINITIONS.items():
+                mode = existing.get(key)
+                if mode is None:
+                    try:
+                        with db_transaction.atomic():
+                            Mode.objects.create(key=key, **definition)
+                    except IntegrityError:
+                        pass  # Created concurrently
+                    continue
+                if any(getattr(mode, field) != value for field, value in definition.items()):
+                    for field, value in definition.items():
+                        setattr(mode, field, value)
+                    changed.append(mode)
+            if changed:
+                Mode.objects.bulk_update(changed, ['name', 'slug', 'description', 'icon'])
+            cls._load()
+            cls._synced = True
+
+    @classmethod
+    def _load(cls):
+        from main_app.models import Mode
+
+        modes = list(Mode.objects.all())
+        cls._by_id = {mode.id: mode for mode in modes}
+        cls._by_key = {mode.key: mode for mode in modes}
+
+    @classmethod
+    def _ensure(cls):
+        if not cls._synced:
+            cls.sync()
+
+    @classmethod
+    def get(cls, mode_id):
+        cls._ensure()
+        if mode_id not in cls._by_id:
+            cls.sync()
+        return cls._by_id[mode_id]
+
+    @classmethod
+    def by_key(cls, key):
+        cls._ensure()
+        if key not in cls._by_key:
+            cls.sync()
+        return cls._by_key[key]
+
+    @classmethod
+    def all(cls):
+        cls._ensure()
+        return list(cls._by_id.values())
+
+    @classmethod
+    def resolve(cls, value):
+        """
+        Mode for a dashboard URL argument: a slug, or a full name like 'Stability Mode'
+        """
+        for mode in cls.all():
+            if value in (mode.slug, mode.name):
+                return mode
+        return None
+
+    @classmethod
+    def ids(cls, keys):
+        """
+        {key: id} for the given rule keys
+        """
+        return {key: cls.by_key(key).id for key in keys}
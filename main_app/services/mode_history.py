@@ -0,0 +1,108 @@
+from datetime import timedelta, timezone as dt_timezone
+from itertools import groupby
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+
+class ModeHistoryService:
+    """
+    Keeps ModeHistory bounded for long-lived accounts. Old 'progress' events are
+    merged into one row per mode and day (or week), and progress rows older than
+    the retention age are deleted. Unlock and lock events are never touched.
+    """
+
+    PERIODS = ('day', 'week')
+
+    @staticmethod
+    def period_start(timestamp, period):
+        """
+        UTC date of the day or week (starting Monday) a timestamp falls in,
+        like every other ledger date
+        """
+        day = timestamp.astimezone(dt_timezone.utc).date()
+        if period == 'week':
+            day -= timedelta(days=day.weekday())
+        return day
+
+    @classmethod
+    def compact(cls, older_than_days=None, period=None, batch_size=500):
+        """
+        Merge progress events older than ``older_than_days`` into one summary row
+        per (user, mode, period). A summary keeps the last progress value and
+        timestamp of the events it replaces and counts them in ``event_count``.
+        Returns (rows removed, summary rows written).
+        """
+        from main_app.models import ModeHistory  # Import here to avoid circular imports
+
+        if older_than_days is None:
+            older_than_days = getattr(settings, 'MODE_HISTORY_COMPACT_AFTER_DAYS', 30)
+        period = period or getattr(settings, 'MODE_HISTORY_COMPACT_PERIOD', 'day')
+        if period not in cls.PERIODS:
+            raise ValueError(f"Unknown compaction period: {period}")
+
+        candidates = ModeHistory.objects.filter(
+            status_change='progress',
+            timestamp__lt=timezone.now() - timedelta(days=older_than_days)
+        )
+        user_ids = list(candidates.order_by('user_id').values_list('user_id', flat=True).distinct())
+
+        removed = written = 0
+        for start in range(0, len(user_ids), batch_size):
+            rows = candidates.filter(user_id__in=user_ids[start:start + batch_size]).order_by(
+                'user_id', 'mode_id', 'timestamp', 'id'
+            ).values('id', 'user_id', 'mode_id', 'progress_percentage', 'timestamp', 'event_count', 'metrics')
+
+            stale_ids = []
+            summaries = []
+            grouped = groupby(
+                rows.iterator(),
+                key=lambda row: (row['user_id'], row['mode_id'], cls.period_start(row['timestamp'], period))
+            )
+            for (user_id, mode_id, period_start), events in grouped:
+                events = list(events)
+                if len(events) < 2:
+                    continue
+
+                progress = [event['progress_percentage'] for event in events]
+                event_count = sum(event['event_count'] for event in events)
+                stale_ids.extend(event['id'] for event in events)
+                summaries.append(ModeHistory(
+                    user_id=user_id,
+                    mode_id=mode_id,
+                    status_change='progress',
+                    progress_percentage=progress[-1],
+                    timestamp=events[-1]['timestamp'],
+                    event_count=event_count,
+                    # Latest metrics, plus the progress range of the merged events
+                    metrics={
+                        **events[-1]['metrics'],
+                        'progress_range': [min(progress), max(progress)],
+                        period: period_start.isoformat(),
+                    }
+                ))
+
+            with db_transaction.atomic():
+                for chunk in range(0, len(stale_ids), 1000):
+                    ModeHistory.objects.filter(pk__in=stale_ids[chunk:chunk + 1000]).delete()
+                ModeHistory.objects.bulk_create(summaries, batch_size=1000)
+            removed += len(stale_ids)
+            written += len(summaries)
+
+        return removed, written
+
+    @staticmethod
+    def purge(retention_days=None):
+        """
+        Delete progress rows older than ``retention_days``. Returns the number deleted.
+        """
+        from main_app.models import ModeHistory
+
+        if retention_days is None:
+            retention_days = getattr(settings, 'MODE_HISTORY_RETENTION_DAYS', 365)
+
+        deleted, _ = ModeHistory.objects.filter(
+            status_change='progress',
+            timestamp__lt=timezone.now() - timedelta(days=retention_days)
+        ).delete()
+        return deleted
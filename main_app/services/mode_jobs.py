@@ -0,0 +1,267 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from main_app.services.ledger_state import LedgerStateService
+from main_app.services.single_flight import SingleFlight
+
+# Users waiting for an evaluation in the current thread (see ModeJobQueue.schedule)
+_pending = threading.local()
+
+# Concurrent evaluate() calls for a user share the result (and its notifications)
+_evaluations = SingleFlight('mode_evaluation')
+
+
+class _PendingEvaluations:
+    """
+    on_commit callback that enqueues each collected user once
+    """
+
+    def __init__(self):
+        self.user_ids = set()
+
+    def __call__(self):
+        ModeJobQueue.enqueue_many(self.user_ids)
+
+
+class ModeJobQueue:
+    """
+    Database-backed queue that moves mode evaluation off the request path.
+
+    Views enqueue a job per user, the ``run_mode_worker`` management command
+    evaluates it with ModeService.update_user_modes, and unlock notifications are
+    stored as ModeNotification rows for the user's next page view.
+    """
+
+    MAX_ATTEMPTS = 5
+    # Jobs left 'running' longer than this are assumed to belong to a dead worker
+    STALE_AFTER = timedelta(minutes=10)
+
+    @staticmethod
+    def is_async():
+        return getattr(settings, 'MODE_EVALUATION_ASYNC', True)
+
+    @classmethod
+    def enqueue(cls, user):
+        """
+        Queue a mode evaluation for a user. Evaluates inline when
+        MODE_EVALUATION_ASYNC is off.
+        """
+        from main_app.models import ModeEvaluationJob  # Import here to avoid circular imports
+
+        # Nothing changed since the last evaluation today
+        if LedgerStateService.modes_are_current(user):
+            return
+
+        if not cls.is_async():
+            cls.evaluate(user)
+            return
+
+        try:
+            with db_transaction.atomic():
+                ModeEvaluationJob.objects.create(user=user)
+        except IntegrityError:
+            # A pending job for this user already covers the change
+            pass
+
+    @classmethod
+    def enqueue_many(cls, user_ids):
+        """
+        enqueue() for a set of user ids with a fixed number of queries
+        """
+        from django.contrib.auth.models import User
+        from main_app.models import LedgerState, ModeEvaluationJob
+
+        current = LedgerState.objects.filter(
+            user_id__in=user_ids,
+            modes_version=F('version'),
+            modes_evaluated_on=timezone.now().date()
+        ).values('user_id')
+        # Also drops users deleted since the write that scheduled them
+        users = User.objects.filter(pk__in=user_ids).exclude(pk__in=current)
+        user_ids = list(users.values_list('pk', flat=True))
+        if not user_ids:
+            return
+
+        if not cls.is_async():
+            for user in users:
+                cls.evaluate(user)
+            return
+
+        # Users that already have a pending job are skipped by the unique constraint
+        ModeEvaluationJob.objects.bulk_create(
+            [ModeEvaluationJob(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def schedule(cls, user_id, using=None):
+        """
+        Ask for a mode evaluation once the current database transaction commits.
+        Any number of calls for the same user inside one transaction (or one
+        coalesce() block) result in a single enqueue.
+        """
+        scope = getattr(_pending, 'scope', None)
+        if scope is not None:
+            scope.add(user_id)
+            return
+
+        using = using or DEFAULT_DB_ALIAS
+        connection = connections[using]
+        if not connection.in_atomic_block:
+            cls.enqueue_many([user_id])
+            return
+
+        # Reuse the callback registered earlier in this transaction, unless it
+        # was discarded by a rollback
+        callbacks = getattr(_pending, 'callbacks', None)
+        if callbacks is None:
+            callbacks = _pending.callbacks = {}
+        callback = callbacks.get(using)
+        if callback is None or not any(func is callback for sids, func, robust in connection.run_on_commit):
+            callback = callbacks[using] = _PendingEvaluations()
+            db_transaction.on_commit(callback, using=using)
+        callback.user_ids.add(user_id)
+
+    @classmethod
+    @contextmanager
+    def coalesce(cls):
+        """
+        Collect schedule() calls made inside the block (e.g. one request) and
+        enqueue each user once when it exits
+        """
+        if getattr(_pending, 'scope', None) is not None:
+            yield
+            return
+
+        _pending.scope = set()
+        try:
+            yield
+        finally:
+            user_ids, _pending.scope = _pending.scope, None
+            if user_ids:
+                db_transaction.on_commit(lambda: cls.enqueue_many(user_ids))
+
+    @classmethod
+    def evaluate(cls, user):
+        """
+        Run the evaluation and store notifications for newly unlocked modes.
+        Callers that arrive while one is running for the user get its result.
+        """
+        return _evaluations.do(user.pk, lambda: cls._evaluate(user))
+
+    @classmethod
+    def _evaluate(cls, user):
+        from main_app.services.mode_service import ModeService
+
+        newly_unlocked = ModeService.update_user_modes(user)
+        cls.notify(user, newly_unlocked)
+        return newly_unlocked
+
+    @staticmethod
+    def notify(user, modes):
+        from main_app.models import ModeNotification
+
+        if modes:
+            ModeNotification.objects.bulk_create([
+                ModeNotification(user=user, message=f"Alert! You've unlocked {mode.name}: {mode.description}")
+                for mode in modes
+            ])
+
+    @classmethod
+    def claim(cls, batch_size=10):
+        """
+        Mark up to ``batch_size`` due jobs as running and return them.
+        Uses SKIP LOCKED so several workers can share the queue.
+        """
+        from main_app.models import ModeEvaluationJob
+
+        now = timezone.now()
+        with db_transaction.atomic():
+            jobs = list(
+                ModeEvaluationJob.objects.select_for_update(skip_locked=True).filter(
+                    status='pending',
+                    run_after__lte=now
+                ).select_related('user')[:batch_size]
+            )
+            if jobs:
+                ModeEvaluationJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                    status='running',
+                    started_at=now,
+                    attempts=F('attempts') + 1
+                )
+        for job in jobs:
+            job.status = 'running'
+            job.started_at = now
+            job.attempts += 1
+        return jobs
+
+    @classmethod
+    def process(cls, job):
+        """
+        Evaluate a claimed job. Finished jobs are deleted; failures are retried
+        with backoff until MAX_ATTEMPTS, then kept as 'failed' for inspection.
+        Returns True when the evaluation succeeded.
+        """
+        from main_app.models import ModeEvaluationJob
+
+        try:
+            cls.evaluate(job.user)
+        except Exception as e:
+            job.last_error = repr(e)
+            if job.attempts < cls.MAX_ATTEMPTS:
+                job.status = 'pending'
+                job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** job.attempts)
+            else:
+                job.status = 'failed'
+            try:
+                with db_transaction.atomic():
+                    job.save(update_fields=['status', 'run_after', 'last_error'])
+            except IntegrityError:
+                # A newer pending job for this user will redo the work
+                ModeEvaluationJob.objects.filter(pk=job.pk).update(status='failed', last_error=job.last_error)
+            return False
+
+        ModeEvaluationJob.objects.filter(pk=job.pk).delete()
+        return True
+
+    @classmethod
+    def requeue_stale(cls):
+        """
+        Put jobs claimed by a worker that died back in the queue.
+        Returns the number of jobs requeued.
+        """
+        from main_app.models import ModeEvaluationJob
+
+        requeued = 0
+        stale_jobs = ModeEvaluationJob.objects.filter(
+            status='running',
+            started_at__lt=timezone.now() - cls.STALE_AFTER
+        )
+        for job in stale_jobs:
+            try:
+                with db_transaction.atomic():
+                    job.status = 'pending'
+                    job.save(update_fields=['status'])
+                requeued += 1
+            except IntegrityError:
+                ModeEvaluationJob.objects.filter(pk=job.pk).delete()
+        return requeued
+
+    @staticmethod
+    def deliver_notifications(request):
+        """
+        Move undelivered notifications into the messages framework
+        """
+        from django.contrib import messages
+        from main_app.models import ModeNotification
+
+        notifications = list(ModeNotification.objects.filter(user=request.user, delivered_at__isnull=True))
+        for notification in notifications:
+            messages.success(request, notification.message)
+        if notifications:
+            ModeNotification.objects.filter(pk__in=[n.pk for n in notifications]).update(delivered_at=timezone.now())
+        return len(notifications)
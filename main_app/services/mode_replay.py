@@ -0,0 +1,113 @@
+import calendar
+from datetime import date, timezone as dt_timezone
+from django.db import transaction as db_transaction
+from django.db.models import Min
+from django.utils import timezone
+from main_app.services.mode_catalog import ModeCatalog
+from main_app.services.mode_rules import ModeRuleRegistry
+from main_app.services.mode_timeline import LedgerTimeline
+
+
+class ModeReplayService:
+    """
+    Backfills ModeHistory for the time before a user's first live evaluation.
+
+    Each user's ledger is read once into a LedgerTimeline, and every mode's
+    check runs on the snapshot of one day a month (its rule's replay day,
+    the month end by default) in date order. The unlock, lock and progress
+    transitions between consecutive evaluations are stored as ModeHistory
+    rows with ``is_replayed`` set. They are produced in the same way
+    update_user_modes records live changes.
+    """
+
+    @staticmethod
+    def evaluation_days(first_day, before, rules):
+        """
+        Yield (day, rule keys) in date order for every month from
+        ``first_day``'s month: each rule is due on its replay day. Days on or
+        after ``before`` are left out.
+        """
+        year, month = first_day.year, first_day.month
+        while date(year, month, 1) < before:
+            last_day = calendar.monthrange(year, month)[1]
+            due = {}
+            for rule in rules:
+                day = date(year, month, min(rule.replay_day or last_day, last_day))
+                due.setdefault(day, []).append(rule.key)
+            for day in sorted(due):
+                if day < before:
+                    yield day, due[day]
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    @classmethod
+    def transitions(cls, user, timeline, before):
+        """
+        Yield the ModeHistory rows the monthly evaluations would have written
+        """
+        from main_app.models import ModeHistory  # Import here to avoid circular imports
+        from main_app.services.mode_service import ModeService
+
+        mode_ids = ModeCatalog.ids(ModeRuleRegistry.keys())
+        previous = {}
+        for day, keys in cls.evaluation_days(timeline.first_day, before, ModeRuleRegistry.rules()):
+            snapshot = timeline.snapshot(day)
+            results = ModeService.check_all_modes(user, snapshot)
+            for key in keys:
+                mode_data = results[key]
+                progress = mode_data.get('progress', 0)
+                changes = []
+
+                if key not in previous:
+                    if mode_data['is_unlocked']:
+                        changes.append('unlocked')
+                else:
+                    was_unlocked, previous_progress = previous[key]
+                    if previous_progress != progress:
+                        changes.append('progress')
+                    if was_unlocked != mode_data['is_unlocked']:
+                        changes.append('unlocked' if mode_data['is_unlocked'] else 'locked')
+
+                for status_change in changes:
+                    yield ModeHistory(
+                        user=user,
+                        mode_id=mode_ids[key],
+                        status_change=status_change,
+                        progress_percentage=progress,
+                        timestamp=snapshot.now,
+                        metrics=mode_data.get('metrics', {}),
+                        is_replayed=True
+                    )
+                previous[key] = (mode_data['is_unlocked'], progress)
+
+    @classmethod
+    def replay(cls, user_ids):
+        """
+        Replace the replayed history of a batch of users. Months up to the
+        user's first live ModeHistory event (or the current month) are replayed.
+        Returns the number of rows written.
+        """
+        from django.contrib.auth.models import User
+        from main_app.models import ModeHistory
+
+        users = list(User.objects.filter(pk__in=user_ids))
+        timelines = LedgerTimeline.build_many([user.pk for user in users])
+        first_live = dict(ModeHistory.objects.filter(
+            user_id__in=[user.pk for user in users],
+            is_replayed=False
+        ).values('user_id').annotate(first=Min('timestamp')).values_list('user_id', 'first'))
+
+        current_month = timezone.now().date().replace(day=1)
+        history = []
+        for user in users:
+            timeline = timelines[user.pk]
+            if timeline.is_empty:
+                continue
+            before = current_month
+            if user.pk in first_live:
+                before = min(before, first_live[user.pk].astimezone(dt_timezone.utc).date())
+            history.extend(cls.transitions(user, timeline, before))
+
+        with db_transaction.atomic():
+            ModeHistory.objects.filter(user__in=users, is_replayed=True).delete()
+            ModeHistory.objects.bulk_create(history, batch_size=1000)
+        return len(history)
@@ -0,0 +1,417 @@
+import math
+from datetime import timedelta
+from decimal import Decimal
+from main_app.services.financial_snapshot import FinancialSnapshot
+from main_app.services.money import from_cents
+from main_app.services.mode_tracing import trace_block
+
+# Every mode a user can unlock, keyed as in check_all_modes (filled by ModeRuleRegistry.register)
+MODE_DEFINITIONS = {}
+
+
+# Aggregates a rule can declare in ``requires``. The FinancialSnapshot queries
+# serve all of them, once per batch of users.
+
+class LifetimeTotals:
+    """
+    All-time income and expense totals (snapshot.total_income / total_expenses)
+    """
+
+
+class TrailingMonths:
+    """
+    Per-month totals of the transactions dated in the last ``days`` days
+    (snapshot.trailing_months(days))
+    """
+
+    def __init__(self, days):
+        self.days = days
+
+
+class CalendarMonths:
+    """
+    Whole-month and month-to-date totals of calendar months
+    (snapshot.month_totals / month_to_date_expenses)
+    """
+
+
+class RuleInputs:
+    """
+    The aggregates loaded for one user, passed to every rule
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+
+class AggregatePlan:
+    """
+    The merged requirements of a set of rules.
+
+    Every snapshot aggregate is served by the FinancialSnapshot queries (one
+    rollup read plus one grouped read of recent months). The registry plan's
+    ``windows`` are the trailing windows every snapshot carries, so a declared
+    window becomes extra columns of that query rather than an extra query.
+    """
+
+    def __init__(self, rules):
+        requirements = [requirement for rule in rules for requirement in rule.requires]
+        self.windows = tuple(sorted({
+            requirement.days for requirement in requirements if isinstance(requirement, TrailingMonths)
+        }))
+
+    def load(self, user_ids, now=None, snapshots=None):
+        """
+        RuleInputs for each user, from one run of the snapshot queries.
+        ``snapshots`` ({user_id: snapshot}) replaces the snapshot queries, e.g.
+        with an as-of snapshot from LedgerTimeline. Returns {user_id: inputs}
+        """
+        user_ids = list(user_ids)
+        if snapshots is None:
+            snapshots = FinancialSnapshot.build_many(user_ids, now)
+        return {user_id: RuleInputs(snapshots[user_id]) for user_id in user_ids}
+
+
+class ModeRule:
+    """
+    A mode's unlock rule. Subclasses set ``key`` (as used in check_all_modes),
+    ``definition`` (name, URL slug, description, icon), ``requires`` (the
+    aggregates above) and implement ``check(user, inputs)``, returning the mode
+    result dict. They never query on their own: everything comes from ``inputs``.
+
+    Besides the display ``notes`` a result carries ``metrics``: the numbers
+    behind it as a small JSON-ready dict (amounts in cents), which is what
+    ModeHistory stores.
+
+    History replays evaluate each rule once a month: on the last day unless
+    ``replay_day`` names the day the rule's window closes.
+    """
+
+    key = None
+    definition = {}
+    requires = ()
+    replay_day = None
+
+    @classmethod
+    def check(cls, user, inputs):
+        raise NotImplementedError
+
+
+class ModeRuleRegistry:
+    """
+    The registered mode rules, in registration order
+    """
+
+    _rules = {}
+    _plan = None
+
+    @classmethod
+    def register(cls, rule):
+        cls._rules[rule.key] = rule
+        cls._plan = None
+        # The catalog needs a unique slug; 'weekend_mode' defaults to 'weekend'
+        MODE_DEFINITIONS[rule.key] = {'slug': rule.key.removesuffix('_mode').replace('_', '-'), **rule.definition}
+        return rule
+
+    @classmethod
+    def get(cls, key):
+        return cls._rules[key]
+
+    @classmethod
+    def keys(cls):
+        return list(cls._rules)
+
+    @classmethod
+    def rules(cls):
+        return list(cls._rules.values())
+
+    @classmethod
+    def plan(cls):
+        if cls._plan is None:
+            cls._plan = AggregatePlan(cls.rules())
+        return cls._plan
+
+    @classmethod
+    def evaluate(cls, user, inputs):
+        """
+        Run every rule on the loaded inputs. Returns {key: result}
+        """
+        results = {}
+        for key, rule in cls._rules.items():
+            with trace_block(f'{rule.__name__}.check'):
+                results[key] = rule.check(user, inputs)
+        return results
+
+
+@ModeRuleRegistry.register
+class LockdownRule(ModeRule):
+    """
+    Lockdown Mode: Triggered when expenses exceed income
+    """
+    key = 'lockdown_mode'
+    definition = {
+        'name': 'Lockdown Mode',
+        'slug': 'lockdown',
+        'description': 'Triggered when expenses exceed income. Time to evaluate spending and cut back on non-essentials.',
+        'icon': '🔒',
+    }
+    requires = (LifetimeTotals(),)
+
+    @classmethod
+    def check(cls, user, inputs):
+        snapshot = inputs.snapshot
+
+        # Totals in cents
+        total_expenses = snapshot.total_expenses
+        total_income = snapshot.total_income
+
+        # Calculate progress percentage
+        if total_income > 0:
+            # Scale from 0-100% as expense ratio goes from 0 to 1
+            progress = min(100, total_expenses * 100 // total_income)
+        else:
+            progress = 0
+
+        return {
+            'is_unlocked': total_expenses > total_income,
+            **cls.definition,
+            'progress': progress,
+            'notes': f"Total expenses: ${from_cents(total_expenses)}, Total income: ${from_cents(total_income)}",
+            'metrics': {'income': total_income, 'expenses': total_expenses}
+        }
+
+
+@ModeRuleRegistry.register
+class VacayRule(ModeRule):
+    """
+    Vacay Mode: Triggered by sustained savings (3+ months where income > expenses by at least 15%)
+    """
+    key = 'vacay_mode'
+    definition = {
+        'name': 'Vacay Mode',
+        'slug': 'vacay',
+        'description': 'Triggered by sustained savings over 3+ months. You\'re building financial freedom!',
+        'icon': '🏝️',
+    }
+    requires = (TrailingMonths(90),)
+
+    @classmethod
+    def check(cls, user, inputs):
+        snapshot = inputs.snapshot
+
+        # Monthly totals over the last 3 months
+        months = snapshot.trailing_months(90)
+
+        # Check if we have at least 3 months of data with savings >= 15%
+        savings_months = 0
+        total_months = len(months)
+        notes = []
+        rates = {}
+
+        for month_key, month_data in months:
+            income, expenses = month_data['income'], month_data['expenses']
+            if income > 0 and expenses >= 0:
+                savings_rate = Decimal(income - expenses) / Decimal(income)
+                month_name = f"{month_key[0]}-{month_key[1]}"
+                savings_pct = round(savings_rate * 100, 1)
+                notes.append(f"{month_name}: {savings_pct}% savings rate")
+                rates[month_name] = float(savings_pct)
+
+                if (income - expenses) * 100 >= income * 15:  # 15% savings rate
+                    savings_months += 1
+
+        # Calculate progress - need 3 months with 15% savings
+        if total_months > 0:
+            progress = min(100, math.floor((savings_months / 3) * 100))
+        else:
+            progress = 0
+
+        notes_text = " | ".join(notes) if notes else "No monthly data available yet"
+
+        return {
+            'is_unlocked': savings_months >= 3,
+            **cls.definition,
+            'progress': progress,
+            'notes': f"Months with 15%+ savings: {savings_months}/3 needed. {notes_text}",
+            'metrics': {'months': savings_months, 'rates': rates}
+        }
+
+
+@ModeRuleRegistry.register
+class SurvivalRule(ModeRule):
+    """
+    Survival Mode: Triggered by intense early-month spending (>50% of monthly income spent in first 10 days)
+    """
+    key = 'survival_mode'
+    definition = {
+        'name': 'Survival Mode',
+        'slug': 'survival',
+        'description': 'Triggered by spending >50% of monthly income in the first 10 days. Budget carefully!',
+        'icon': '⚠️',
+    }
+    requires = (CalendarMonths(),)
+    # Only the first 10 days count, so a month-end replay would never unlock it
+    replay_day = 10
+
+    @classmethod
+    def check(cls, user, inputs):
+        snapshot = inputs.snapshot
+
+        # Get current month transactions
+        now = snapshot.now
+        start_of_month = snapshot.start_of_month
+
+        progress = 0
+        is_survival_mode = False
+        notes = "Not in first 10 days of the month"
+        metrics = {}
+
+        # Check if we're past the 10th day of the month
+        if now.day <= 10:
+            # Get last month's income as reference
+            previous_month = (start_of_month - timedelta(days=1)).replace(day=1)
+            previous_month_income = snapshot.month_totals(previous_month.year, previous_month.month)['income']
+
+            # Early month expenses
+            early_month_expenses = snapshot.month_to_date_expenses()
+
+            # Calculate progress
+            if previous_month_income > 0:
+                progress = min(100, early_month_expenses * 100 // previous_month_income)
+                is_survival_mode = early_month_expenses * 2 > previous_month_income
+                notes = (
+                    f"Early month spending: ${from_cents(early_month_expenses)} "
+                    f"of ${from_cents(previous_month_income)} ({progress}%)"
+                )
+                metrics = {'spent': early_month_expenses, 'income': previous_month_income}
+            else:
+                notes = "No income data from previous month"
+
+        return {
+            'is_unlocked': is_survival_mode,
+            **cls.definition,
+            'progress': progress,
+            'notes': notes,
+            'metrics': metrics
+        }
+
+
+@ModeRuleRegistry.register
+class StabilityRule(ModeRule):
+    """
+    Stability Mode: Triggered by consistent income/expense ratio (within 10% fluctuation for 4+ months)
+    """
+    key = 'stability_mode'
+    definition = {
+        'name': 'Stability Mode',
+        'slug': 'stability',
+        'description': 'Triggered by consistent income/expense ratio over 4+ months. Financial stability achieved!',
+        'icon': '🏆',
+    }
+    requires = (TrailingMonths(120),)
+
+    @classmethod
+    def check(cls, user, inputs):
+        snapshot = inputs.snapshot
+
+        # Monthly totals over the last 4 months
+        months = snapshot.trailing_months(120)
+
+        # Calculate ratios for each month
+        ratios = []
+        month_details = []
+        metrics = {'ratios': {}}
+
+        for month_key, month_data in months:
+            if month_data['income'] > 0 and month_data['expenses'] > 0:
+                ratio = Decimal(month_data['expenses']) / Decimal(month_data['income'])
+                ratios.append(ratio)
+                month_details.append(f"{month_key[0]}-{month_key[1]}: {round(ratio * 100)}%")
+                metrics['ratios'][f"{month_key[0]}-{month_key[1]}"] = round(ratio * 100)
+
+        # Calculate progress - need 4 months of consistent ratios
+        stability_achieved = False
+        progress = 0
+        notes = "Insufficient monthly data"
+
+        if len(ratios) >= 4:
+            # Check if all ratios are within 10% of the average
+            avg_ratio = sum(ratios) / len(ratios)
+            consistent_months = 0
+
+            for ratio in ratios:
+                if abs(ratio - avg_ratio) / avg_ratio <= Decimal('0.1'):
+                    consistent_months += 1
+
+            stability_achieved = consistent_months >= 4
+            metrics.update(months=consistent_months, average=round(avg_ratio * 100))
+            progress = min(100, math.floor((consistent_months / 4) * 100))
+            notes = f"Consistent months: {consistent_months}/4 needed. Average ratio: {round(avg_ratio * 100)}%. {' | '.join(month_details)}"
+        else:
+            # Still tracking progress even with fewer months
+            progress = min(75, math.floor((len(ratios) / 4) * 100))
+            notes = f"Months with data: {len(ratios)}/4 needed. {' | '.join(month_details)}"
+
+        return {
+            'is_unlocked': stability_achieved,
+            **cls.definition,
+            'progress': progress,
+            'notes': notes,
+            'metrics': metrics
+        }
+
+
+@ModeRuleRegistry.register
+class SaverRule(ModeRule):
+    """
+    Saver Mode: Triggered when total savings exceed 3x monthly income
+    """
+    key = 'saver_mode'
+    definition = {
+        'name': 'Saver Mode',
+        'slug': 'saver',
+        'description': 'Triggered when total savings exceed 3x monthly income. You\'re building financial security!',
+        'icon': '💰',
+    }
+    requires = (LifetimeTotals(), TrailingMonths(180))
+
+    @classmethod
+    def check(cls, user, inputs):
+        snapshot = inputs.snapshot
+
+        # Calculate total savings (all-time income minus all-time expenses)
+        total_savings = snapshot.total_income - snapshot.total_expenses
+
+        # Average monthly income over the last 6 months (months with income only)
+        months = [
+            month_data['income']
+            for month_key, month_data in snapshot.trailing_months(180)
+            if month_data['income_count']
+        ]
+
+        progress = 0
+        is_saver = False
+        notes = "Insufficient income data"
+        metrics = {}
+
+        if months:
+            # Average in (fractional) cents, kept exact to Decimal precision
+            avg_monthly_income = Decimal(sum(months)) / len(months)
+            target = avg_monthly_income * 3
+
+            if target > 0:
+                progress = min(100, math.floor((total_savings / target) * 100))
+                is_saver = total_savings >= target
+                notes = (
+                    f"Savings: ${from_cents(total_savings)} of ${from_cents(target)} target "
+                    f"(3x monthly income of ${from_cents(avg_monthly_income)})"
+                )
+                metrics = {'savings': total_savings, 'target': round(target)}
+
+        return {
+            'is_unlocked': is_saver,
+            **cls.definition,
+            'progress': progress,
+            'notes': notes,
+            'metrics': metrics
+        }
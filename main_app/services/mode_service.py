@@ -1,393 +1,361 @@
 from django.utils import timezone
-from datetime import timedelta
+from django.db import transaction as db_transaction
+from datetime import timedelta, timezone as dt_timezone
 from decimal import Decimal
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Avg, Q, F, Window
+from django.db.models.functions import RowNumber, TruncMonth
 import math
 import calendar
+from main_app.services.financial_snapshot import FinancialSnapshot
+from main_app.services.money import from_cents
+from main_app.services.month_rollover import MonthRolloverService
+from main_app.services.ledger_state import LedgerStateService
+from main_app.services.dashboard_cache import DashboardCache
+from main_app.services.mode_catalog import ModeCatalog
+from main_app.services.mode_rules import ModeRuleRegistry, AggregatePlan
+from main_app.services.mode_shadow import ModeShadow
+from main_app.services.mode_tracing import traced, trace_block
+from main_app.services.single_flight import SingleFlight
+
+# One update_user_modes run per user at a time
+_evaluations = SingleFlight('update_user_modes')
 
 class ModeService:
     """
     Service class responsible for checking and managing mode unlock conditions.
-    Each mode has its own method to check unlock conditions.
+    The unlock rules themselves live in services/mode_rules.py; each mode keeps
+    a check method here for callers that only need one mode.
     """
     
+    # Events per mode shown on the journey map
+    HISTORY_EVENTS_PER_MODE = 50
+    
     @staticmethod
-    def check_lockdown_mode(user, transactions=None):
+    @traced
+    def check_lockdown_mode(user, snapshot=None):
         """
         Lockdown Mode: Triggered when expenses exceed income
         """
-        from main_app.models import Transaction  # Import here to avoid circular imports
-        
-        if not transactions:
-            transactions = Transaction.objects.filter(user=user)
-            
-        total_expenses = sum(t.amount for t in transactions if t.transaction_type == 'EXPENSE')
-        total_income = sum(t.amount for t in transactions if t.transaction_type == 'INCOME')
-        
-        # Calculate progress percentage
-        if total_income > 0:
-            expense_ratio = total_expenses / total_income
-            if expense_ratio >= 1:
-                progress = 100  # Already unlocked
-            else:
-                # Scale from 0-100% as expense ratio goes from 0 to 1
-                progress = min(100, math.floor(expense_ratio * 100))
-        else:
-            progress = 0
-            
-        return {
-            'is_unlocked': total_expenses > total_income,
-            'name': 'Lockdown Mode',
-            'description': 'Triggered when expenses exceed income. Time to evaluate spending and cut back on non-essentials.',
-            'icon': '🔒',
-            'progress': progress,
-            'notes': f"Total expenses: ${total_expenses}, Total income: ${total_income}"
-        }
+        return ModeService.check_mode('lockdown_mode', user, snapshot)
     
     @staticmethod
-    def check_vacay_mode(user, transactions=None):
+    @traced
+    def check_vacay_mode(user, snapshot=None):
         """
         Vacay Mode: Triggered by sustained savings (3+ months where income > expenses by at least 15%)
         """
-        from main_app.models import Transaction  # Import here to avoid circular imports
-        
-        if not transactions:
-            transactions = Transaction.objects.filter(user=user)
-        
-        # Check the last 3 months
-        three_months_ago = timezone.now() - timedelta(days=90)
-        recent_transactions = transactions.filter(date__isnull=False, date__gte=three_months_ago)
-        
-        # Group by month and check if each month has savings
-        months = {}
-        for t in recent_transactions:
-            # Skip transactions with None date - belt and suspenders approach
-            if t.date is None:
-                continue
-            
-            month_key = (t.date.year, t.date.month)
-            if month_key not in months:
-                months[month_key] = {'income': Decimal('0'), 'expenses': Decimal('0')}
-            
-            if t.transaction_type == 'INCOME':
-                months[month_key]['income'] += t.amount
-            else:
-                months[month_key]['expenses'] += t.amount
-        
-        # Check if we have at least 3 months of data with savings >= 15%
-        savings_months = 0
-        total_months = len(months)
-        notes = []
-        
-        for month_key, month_data in months.items():
-            if month_data['income'] > 0 and month_data['expenses'] >= 0:
-                savings_rate = (month_data['income'] - month_data['expenses']) / month_data['income']
-                month_name = f"{month_key[0]}-{month_key[1]}"
-                savings_pct = round(savings_rate * 100, 1)
-                notes.append(f"{month_name}: {savings_pct}% savings rate")
-                
-                if savings_rate >= Decimal('0.15'):  # 15% savings rate
-                    savings_months += 1
-        
-        # Calculate progress - need 3 months with 15% savings
-        if total_months > 0:
-            progress = min(100, math.floor((savings_months / 3) * 100))
-        else:
-            progress = 0
-            
-        notes_text = " | ".join(notes) if notes else "No monthly data available yet"
-        
-        return {
-            'is_unlocked': savings_months >= 3,
-            'name': 'Vacay Mode',
-            'description': 'Triggered by sustained savings over 3+ months. You\'re building financial freedom!',
-            'icon': '🏝️',
-            'progress': progress,
-            'notes': f"Months with 15%+ savings: {savings_months}/3 needed. {notes_text}"
-        }
+        return ModeService.check_mode('vacay_mode', user, snapshot)
     
     @staticmethod
-    def check_survival_mode(user, transactions=None):
+    @traced
+    def check_survival_mode(user, snapshot=None):
         """
         Survival Mode: Triggered by intense early-month spending (>50% of monthly income spent in first 10 days)
         """
-        from main_app.models import Transaction  # Import here to avoid circular imports
-        
-        if not transactions:
-            transactions = Transaction.objects.filter(user=user)
-        
-        # Get current month transactions
-        now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        progress = 0
-        is_survival_mode = False
-        notes = "Not in first 10 days of the month"
-        
-        # Check if we're past the 10th day of the month
-        if now.day <= 10:
-            # Get last month's income as reference
-            previous_month = (start_of_month - timedelta(days=1)).replace(day=1)
-            
-            # Filter out transactions with None dates
-            previous_month_income = transactions.filter(
-                transaction_type='INCOME', 
-                date__isnull=False,
-                date__gte=previous_month,
-                date__lt=start_of_month
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            # Early month expenses - filter out None dates
-            early_month_expenses = transactions.filter(
-                transaction_type='EXPENSE',
-                date__isnull=False,
-                date__gte=start_of_month,
-                date__lte=now
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            # Calculate progress
-            if previous_month_income > 0:
-                expense_ratio = early_month_expenses / previous_month_income
-                progress = min(100, math.floor(expense_ratio * 100))
-                is_survival_mode = expense_ratio > Decimal('0.5')
-                notes = f"Early month spending: ${early_month_expenses} of ${previous_month_income} ({progress}%)"
-            else:
-                notes = "No income data from previous month"
-        
-        return {
-            'is_unlocked': is_survival_mode,
-            'name': 'Survival Mode',
-            'description': 'Triggered by spending >50% of monthly income in the first 10 days. Budget carefully!',
-            'icon': '⚠️',
-            'progress': progress,
-            'notes': notes
-        }
+        return ModeService.check_mode('survival_mode', user, snapshot)
     
     @staticmethod
-    def check_stability_mode(user, transactions=None):
+    @traced
+    def check_stability_mode(user, snapshot=None):
         """
         Stability Mode: Triggered by consistent income/expense ratio (within 10% fluctuation for 4+ months)
         """
-        from main_app.models import Transaction  # Import here to avoid circular imports
-        
-        if not transactions:
-            transactions = Transaction.objects.filter(user=user)
-        
-        # Check the last 4 months
-        four_months_ago = timezone.now() - timedelta(days=120)
-        recent_transactions = transactions.filter(date__isnull=False, date__gte=four_months_ago)
-        
-        # Group by month and calculate income/expense ratio
-        months = {}
-        for t in recent_transactions:
-            # Skip transactions with None date
-            if t.date is None:
-                continue
-            
-            month_key = (t.date.year, t.date.month)
-            if month_key not in months:
-                months[month_key] = {'income': Decimal('0'), 'expenses': Decimal('0')}
-            
-            if t.transaction_type == 'INCOME':
-                months[month_key]['income'] += t.amount
-            else:
-                months[month_key]['expenses'] += t.amount
-        
-        # Calculate ratios for each month
-        ratios = []
-        month_details = []
-        
-        for month_key, month_data in months.items():
-            if month_data['income'] > 0 and month_data['expenses'] > 0:
-                ratio = month_data['expenses'] / month_data['income']
-                ratios.append(ratio)
-                month_details.append(f"{month_key[0]}-{month_key[1]}: {round(ratio * 100)}%")
-        
-        # Calculate progress - need 4 months of consistent ratios
-        stability_achieved = False
-        progress = 0
-        notes = "Insufficient monthly data"
-        
-        if len(ratios) >= 4:
-            # Check if all ratios are within 10% of the average
-            avg_ratio = sum(ratios) / len(ratios)
-            consistent_months = 0
-            
-            for ratio in ratios:
-                if abs(ratio - avg_ratio) / avg_ratio <= Decimal('0.1'):
-                    consistent_months += 1
-            
-            stability_achieved = consistent_months >= 4
-            progress = min(100, math.floor((consistent_months / 4) * 100))
-            notes = f"Consistent months: {consistent_months}/4 needed. Average ratio: {round(avg_ratio * 100)}%. {' | '.join(month_details)}"
-        else:
-            # Still tracking progress even with fewer months
-            progress = min(75, math.floor((len(ratios) / 4) * 100))
-            notes = f"Months with data: {len(ratios)}/4 needed. {' | '.join(month_details)}"
-        
-        return {
-            'is_unlocked': stability_achieved,
-            'name': 'Stability Mode',
-            'description': 'Triggered by consistent income/expense ratio over 4+ months. Financial stability achieved!',
-            'icon': '🏆',
-            'progress': progress,
-            'notes': notes
-        }
+        return ModeService.check_mode('stability_mode', user, snapshot)
     
     @staticmethod
-    def check_saver_mode(user, transactions=None):
+    @traced
+    def check_saver_mode(user, snapshot=None):
         """
         Saver Mode: Triggered when total savings exceed 3x monthly income
         """
-        from main_app.models import Transaction  # Import here to avoid circular imports
-        
-        if not transactions:
-            transactions = Transaction.objects.filter(user=user)
-        
-        # Calculate total savings (all-time income minus all-time expenses)
-        total_income = sum(t.amount for t in transactions if t.transaction_type == 'INCOME')
-        total_expenses = sum(t.amount for t in transactions if t.transaction_type == 'EXPENSE')
-        total_savings = total_income - total_expenses
+        return ModeService.check_mode('saver_mode', user, snapshot)
+    
+    @classmethod
+    @traced
+    def check_all_modes(cls, user, snapshot=None, inputs=None):
+        """
+        Check all financial modes for a user and return combined results.
+        The registered rules declare the aggregates they read; ModeRuleRegistry
+        loads them once per call (see AggregatePlan) and every rule reads from
+        the same inputs. ``snapshot`` replaces the snapshot queries.
+        """
+        if inputs is None:
+            snapshots = {user.pk: snapshot} if snapshot is not None else None
+            inputs = ModeRuleRegistry.plan().load([user.pk], snapshots=snapshots)[user.pk]
+        return ModeRuleRegistry.evaluate(user, inputs)
+    
+    @classmethod
+    def check_mode(cls, key, user, snapshot=None):
+        """
+        Check a single registered mode, loading only the aggregates it declares
+        """
+        rule = ModeRuleRegistry.get(key)
+        snapshots = {user.pk: snapshot} if snapshot is not None else None
+        inputs = AggregatePlan([rule]).load([user.pk], snapshots=snapshots)[user.pk]
+        return rule.check(user, inputs)
+    
+    @classmethod
+    @traced
+    def evaluate_as_of(cls, user, as_of):
+        """
+        Mode results as they stood at the end of a past date (UTC),
+        counting only transactions dated on or before it
+        """
+        from main_app.services.mode_timeline import LedgerTimeline
         
-        # Calculate average monthly income over the last 6 months
-        six_months_ago = timezone.now() - timedelta(days=180)
-        recent_income = transactions.filter(
-            transaction_type='INCOME',
-            date__isnull=False,
-            date__gte=six_months_ago
-        )
+        return cls.check_all_modes(user, LedgerTimeline.build(user).snapshot(as_of))
+    
+    @classmethod
+    @traced
+    def evaluate_date_range(cls, user, start, end):
+        """
+        evaluate_as_of() for every date from start to end (inclusive).
+        The ledger is read once; returns {date: mode results}
+        """
+        from main_app.services.mode_timeline import LedgerTimeline
+        
+        timeline = LedgerTimeline.build(user)
+        results = {}
+        day = start
+        while day <= end:
+            results[day] = cls.check_all_modes(user, timeline.snapshot(day))
+            day += timedelta(days=1)
+        return results
+    
+    @classmethod
+    @traced
+    def update_user_modes(cls, user, force=False, snapshot=None, inputs=None, version=None):
+        """
+        Check all mode conditions and update the database
+        Returns a list of newly unlocked modes
         
-        # Group by month to calculate average monthly income
-        months = {}
-        for t in recent_income:
-            # Skip transactions with None date
-            if t.date is None:
-                continue
-            
-            month_key = (t.date.year, t.date.month)
-            if month_key not in months:
-                months[month_key] = Decimal('0')
-            months[month_key] += t.amount
-        
-        progress = 0
-        is_saver = False
-        notes = "Insufficient income data"
-        
-        if months:
-            avg_monthly_income = sum(months.values()) / len(months)
-            target = avg_monthly_income * 3
-            
-            if target > 0:
-                progress = min(100, math.floor((total_savings / target) * 100))
-                is_saver = total_savings >= target
-                notes = f"Savings: ${total_savings} of ${target} target (3x monthly income of ${avg_monthly_income})"
+        Skipped when nothing in the ledger changed since the last evaluation
+        today (date-based windows such as Survival Mode expire at midnight UTC).
+        Concurrent calls for the same user share one evaluation (SingleFlight).
+        Callers passing a preloaded ``snapshot`` or ``inputs`` pass the ledger
+        ``version`` they read before loading it.
+        """
+        return _evaluations.do(user.pk, lambda: cls._update_user_modes(user, force, snapshot, inputs, version))
+
+    @classmethod
+    def _update_user_modes(cls, user, force, snapshot, inputs, version):
+        state = LedgerStateService.get(user)
+        if not force and state.modes_are_current():
+            return []
+        
+        # Check all mode conditions (a sample of plain evaluations also runs the shadow engine)
+        if snapshot is None and inputs is None and ModeShadow.sampled():
+            mode_results = ModeShadow.check_all_modes(user)
+        else:
+            mode_results = cls.check_all_modes(user, snapshot, inputs)
+        newly_unlocked = cls.save_mode_results(user, mode_results)
         
-        return {
-            'is_unlocked': is_saver,
-            'name': 'Saver Mode',
-            'description': 'Triggered when total savings exceed 3x monthly income. You\'re building financial security!',
-            'icon': '💰',
-            'progress': progress,
-            'notes': notes
-        }
+        # Remember which ledger version these results came from
+        LedgerStateService.mark_evaluated(user, state.version if version is None else version)
+                
+        return newly_unlocked
     
     @classmethod
-    def check_all_modes(cls, user):
+    @traced
+    def update_modes_for_users(cls, user_ids):
         """
-        Check all financial modes for a user and return combined results
+        Re-evaluate every mode for a batch of users, e.g. after a rule change.
+        Rule inputs for the whole batch come from one run of the planned queries.
+        Returns (number of users updated, [(user_id, error), ...])
         """
-        modes = {
-            'lockdown_mode': cls.check_lockdown_mode(user),
-            'vacay_mode': cls.check_vacay_mode(user),
-            'survival_mode': cls.check_survival_mode(user),
-            'stability_mode': cls.check_stability_mode(user),
-            'saver_mode': cls.check_saver_mode(user),
-        }
-        return modes
+        from django.contrib.auth.models import User
+        
+        users = list(User.objects.filter(pk__in=user_ids))
+        # Read before loading the inputs, so writes that land meanwhile stay pending
+        versions = LedgerStateService.versions([user.pk for user in users])
+        inputs = ModeRuleRegistry.plan().load([user.pk for user in users])
+        updated = 0
+        failures = []
+        
+        for user in users:
+            try:
+                cls.update_user_modes(user, force=True, inputs=inputs[user.pk], version=versions.get(user.pk))
+                updated += 1
+            except Exception as e:
+                failures.append((user.pk, repr(e)))
+        
+        return updated, failures
     
     @classmethod
-    def update_user_modes(cls, user):
+    @traced
+    def update_modes_for_cohort(cls, user_ids):
         """
-        Check all mode conditions and update the database
+        Vectorized variant of update_modes_for_users. The rules are evaluated for
+        the whole batch with CohortEvaluator; users whose stored modes already
+        match are only marked as evaluated, and the rest (plus any borderline
+        rows) go through the regular scalar update.
+        Returns (number of users updated, [(user_id, error), ...])
+        """
+        import numpy as np
+        from django.contrib.auth.models import User
+        from main_app.models import ModeUnlock
+        from main_app.services.cohort_evaluator import CohortEvaluator
+        
+        # CohortEvaluator only knows the built-in rules
+        if set(ModeRuleRegistry.keys()) - set(CohortEvaluator.MODES):
+            return cls.update_modes_for_users(user_ids)
+        
+        # Read before evaluating, so writes that land meanwhile stay pending
+        versions = LedgerStateService.versions(user_ids)
+        cohort = CohortEvaluator(user_ids)
+        results = cohort.evaluate()
+        
+        index = {user_id: i for i, user_id in enumerate(cohort.user_ids)}
+        mode_ids = list(ModeCatalog.ids(CohortEvaluator.MODES).values())
+        shape = (len(cohort.user_ids), len(mode_ids))
+        stored = np.zeros(shape, dtype=bool)
+        stored_unlocked = np.zeros(shape, dtype=bool)
+        stored_progress = np.zeros(shape, dtype=np.int64)
+        for user_id, mode_id, is_unlocked, progress in ModeUnlock.objects.filter(
+            user_id__in=cohort.user_ids,
+            mode_id__in=mode_ids
+        ).values_list('user_id', 'mode_id', 'is_unlocked', 'progress_percentage'):
+            row, column = index[user_id], mode_ids.index(mode_id)
+            stored[row, column] = True
+            stored_unlocked[row, column] = is_unlocked
+            stored_progress[row, column] = progress
+        
+        unlocked = np.stack([results[key]['is_unlocked'] for key in CohortEvaluator.MODES], axis=1)
+        progress = np.stack([results[key]['progress'] for key in CohortEvaluator.MODES], axis=1)
+        exact = np.stack([results[key]['exact'] for key in CohortEvaluator.MODES], axis=1)
+        current = (stored & exact & (stored_unlocked == unlocked) & (stored_progress == progress)).all(axis=1)
+        
+        unchanged = {}
+        changed = []
+        for user_id, is_current in zip(cohort.user_ids, current):
+            if is_current and user_id in versions:
+                unchanged[user_id] = versions[user_id]
+            else:
+                changed.append(user_id)
+        LedgerStateService.mark_evaluated_many(unchanged)
+        
+        updated = len(unchanged)
+        failures = []
+        for user in User.objects.filter(pk__in=changed):
+            try:
+                cls.update_user_modes(user, force=True, snapshot=cohort.snapshot(user.pk), version=versions.get(user.pk))
+                updated += 1
+            except Exception as e:
+                failures.append((user.pk, repr(e)))
+        
+        return updated, failures
+    
+    @classmethod
+    @traced
+    def save_mode_results(cls, user, mode_results):
+        """
+        Persist check results in one transaction with a bounded number of queries:
+        one locking read of the user's ModeUnlock rows, one upsert of every changed
+        row and one bulk insert of the ModeHistory events.
         Returns a list of newly unlocked modes
         """
         from main_app.models import ModeUnlock, ModeHistory  # Import here to avoid circular imports
         
-        # Check all mode conditions
-        mode_results = cls.check_all_modes(user)
+        now = timezone.now()
+        today = now.date()
         newly_unlocked = []
+        changed_modes = []
+        history = []
         
-        # Update database for each mode
-        for mode_data in mode_results.values():
-            mode, created = ModeUnlock.objects.get_or_create(
+        mode_ids = ModeCatalog.ids(mode_results)
+        
+        def history_event(mode_id, mode_data, status_change):
+            return ModeHistory(
                 user=user,
-                name=mode_data['name'],
-                defaults={
-                    "description": mode_data['description'],
-                    "is_unlocked": mode_data['is_unlocked'],
-                    "triggered_on": timezone.now() if mode_data['is_unlocked'] else None,
-                    "icon": mode_data.get('icon', ''),
-                    "progress_percentage": mode_data.get('progress', 0)
-                }
+                mode_id=mode_id,
+                status_change=status_change,
+                progress_percentage=mode_data.get('progress', 0),
+                timestamp=now,
+                metrics=mode_data.get('metrics', {})
             )
+        
+        with db_transaction.atomic():
+            existing = {
+                mode.mode_id: mode
+                for mode in ModeUnlock.objects.select_for_update().filter(user=user)
+            }
             
-            # Update progress percentage
-            if not created and mode.progress_percentage != mode_data.get('progress', 0):
-                # Log progress update to history
-                ModeHistory.objects.create(
-                    user=user,
-                    mode_name=mode_data['name'],
-                    status_change='progress',
-                    progress_percentage=mode_data.get('progress', 0),
-                    details=mode_data.get('notes', '')
-                )
+            for key, mode_data in mode_results.items():
+                mode_id = mode_ids[key]
+                progress = mode_data.get('progress', 0)
+                mode = existing.get(mode_id)
                 
-                mode.progress_percentage = mode_data.get('progress', 0)
-                mode.save(update_fields=['progress_percentage'])
-            
-            # If mode exists but unlock status has changed
-            if not created and mode.is_unlocked != mode_data['is_unlocked']:
-                # Log the status change to history
-                ModeHistory.objects.create(
-                    user=user,
-                    mode_name=mode_data['name'],
-                    status_change='unlocked' if mode_data['is_unlocked'] else 'locked',
-                    progress_percentage=mode_data.get('progress', 0),
-                    details=mode_data.get('notes', '')
-                )
+                # New mode for this user
+                if mode is None:
+                    mode = ModeUnlock(
+                        user=user,
+                        mode_id=mode_id,
+                        is_unlocked=mode_data['is_unlocked'],
+                        triggered_on=now if mode_data['is_unlocked'] else None,
+                        progress_percentage=progress
+                    )
+                    mode.update_streak(today)
+                    changed_modes.append(mode)
+                    if mode_data['is_unlocked']:
+                        # Also log the initial unlock to history
+                        history.append(history_event(mode_id, mode_data, 'unlocked'))
+                        newly_unlocked.append(mode)
+                    continue
                 
-                # Update the mode status
-                mode.is_unlocked = mode_data['is_unlocked']
-                if mode_data['is_unlocked']:
-                    mode.triggered_on = timezone.now()
-                    newly_unlocked.append(mode)
+                changed = False
                 
-                mode.save()
+                # Update progress percentage
+                if mode.progress_percentage != progress:
+                    history.append(history_event(mode_id, mode_data, 'progress'))
+                    mode.progress_percentage = progress
+                    changed = True
                 
-            # If new mode was created and it's unlocked
-            elif created and mode_data['is_unlocked']:
-                # Also log the initial unlock to history
-                ModeHistory.objects.create(
-                    user=user,
-                    mode_name=mode_data['name'],
-                    status_change='unlocked',
-                    progress_percentage=mode_data.get('progress', 0),
-                    details=mode_data.get('notes', '')
-                )
+                # Unlock status has changed
+                if mode.is_unlocked != mode_data['is_unlocked']:
+                    history.append(history_event(mode_id, mode_data, 'unlocked' if mode_data['is_unlocked'] else 'locked'))
+                    mode.is_unlocked = mode_data['is_unlocked']
+                    if mode_data['is_unlocked']:
+                        mode.triggered_on = now
+                        newly_unlocked.append(mode)
+                    changed = True
                 
-                newly_unlocked.append(mode)
+                # Start, extend or reset the streak (no history needed)
+                if mode.update_streak(today):
+                    changed = True
                 
+                if changed:
+                    changed_modes.append(mode)
+            
+            if changed_modes:
+                ModeUnlock.objects.bulk_create(
+                    changed_modes,
+                    update_conflicts=True,
+                    unique_fields=['user', 'mode'],
+                    update_fields=[
+                        'is_unlocked', 'triggered_on', 'progress_percentage',
+                        'streak_days', 'longest_streak_days', 'streak_started_on'
+                    ]
+                )
+            if history:
+                ModeHistory.objects.bulk_create(history)
+        
         return newly_unlocked
     
     @classmethod
-    def get_user_mode_history(cls, user):
+    @traced
+    def get_user_mode_history(cls, user, limit=None):
         """
         Retrieve the user's mode history for the journey map
+        (the ``limit`` most recent events of each mode)
         """
         from main_app.models import ModeHistory
         
-        # Get all mode history events ordered by timestamp (newest first)
-        history_events = ModeHistory.objects.filter(user=user).order_by('-timestamp')
+        limit = limit or cls.HISTORY_EVENTS_PER_MODE
+        
+        # Latest events per mode, newest first
+        history_events = ModeHistory.objects.filter(user=user).annotate(
+            position=Window(RowNumber(), partition_by=F('mode'), order_by=F('timestamp').desc())
+        ).filter(position__lte=limit).order_by('-timestamp')
         
         # Group history events by mode
         mode_history = {}
@@ -399,11 +367,36 @@ class ModeService:
         return mode_history
     
     @classmethod
-    def get_mode_dashboard_data(cls, user, mode_name):
+    @traced
+    def get_mode_dashboard_data(cls, user, mode_name, use_cache=True):
+        """
+        Get detailed data for a specific mode's dashboard.
+        The payload comes from DashboardCache unless ``use_cache`` is False;
+        the mode row itself is always read fresh.
+        """
+        from main_app.models import ModeUnlock
+        
+        # Get the mode data (dashboard URLs carry the slug; full names still work)
+        catalog_entry = ModeCatalog.resolve(mode_name)
+        if catalog_entry is None:
+            return None
+        mode = ModeUnlock.objects.filter(user=user, mode_id=catalog_entry.id).first()
+        if not mode:
+            return None
+        
+        def build():
+            return cls.build_mode_dashboard_data(user, catalog_entry.name)
+        
+        payload = DashboardCache.get_or_build(user.pk, catalog_entry.key, build) if use_cache else build()
+        return {'mode': mode, **payload}
+    
+    @classmethod
+    @traced
+    def build_mode_dashboard_data(cls, user, mode_name):
         """
-        Get detailed data for a specific mode's dashboard
+        Compute a mode dashboard's payload (current_data and mode_data) for a full mode name
         """
-        from main_app.models import ModeUnlock, Transaction, CriticalSpending, EssentialBill
+        from main_app.models import Transaction, CriticalSpending, EssentialBill
         from django.db.models import Sum
         from datetime import datetime, timedelta
         from decimal import Decimal
@@ -419,22 +412,18 @@ class ModeService:
             else:
                 return obj
         
-        # Get the mode data
-        mode = ModeUnlock.objects.filter(user=user, name=mode_name).first()
-        if not mode:
-            return None
-        
         # Get current financial data
+        snapshot = FinancialSnapshot.build(user)
         transactions = Transaction.objects.filter(user=user)
-        total_income = sum(t.amount for t in transactions if t.transaction_type == 'INCOME')
-        total_expenses = sum(t.amount for t in transactions if t.transaction_type == 'EXPENSE')
+        total_income = from_cents(snapshot.total_income)
+        total_expenses = from_cents(snapshot.total_expenses)
         savings = total_income - total_expenses
         
         # Get mode-specific data
         mode_data = {}
         
         if mode_name == "Lockdown Mode":
-            mode_data = cls.check_lockdown_mode(user, transactions)
+            mode_data = cls.check_lockdown_mode(user, snapshot)
             
             # Get today's date and calculate days left in month
             today = timezone.now().date()
@@ -445,8 +434,8 @@ class ModeService:
             # Calculate basic food budget based on 15% of income (or minimum amount if no income)
             base_amount = total_income * Decimal('0.15') if total_income > 0 else Decimal('100')
             
-            # Get month start date
-            first_day = today.replace(day=1)
+            # Get month start date (months are UTC calendar months, like the ledger rollup)
+            first_day = MonthRolloverService.starts_at(today.replace(day=1))
             
             # Get all critical spending categories
             critical_categories = {
@@ -489,47 +478,31 @@ class ModeService:
                 }
             }
             
-            # Get spending for food categories
-            basic_groceries_spent = CriticalSpending.objects.filter(
-                user=user,
-                category='basic_groceries',
-                date__gte=first_day
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            essential_meals_spent = CriticalSpending.objects.filter(
-                user=user,
-                category='essential_meals',
-                date__gte=first_day
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            emergency_food_spent = CriticalSpending.objects.filter(
+            # Spending per food category, one conditional aggregate
+            food_spent = CriticalSpending.objects.filter(
                 user=user,
-                category='emergency_food',
                 date__gte=first_day
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            # Update spent values
-            critical_categories['food']['basic_groceries']['spent'] = basic_groceries_spent
-            critical_categories['food']['essential_meals']['spent'] = essential_meals_spent
-            critical_categories['food']['emergency_food']['spent'] = emergency_food_spent
-            
-            # Calculate other categories spending from transactions
-            transportation_spent = Transaction.objects.filter(
-                user=user,
-                transaction_type='EXPENSE',
-                category__category_type='transportation',
-                date__gte=first_day
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            health_spent = Transaction.objects.filter(
-                user=user,
-                transaction_type='EXPENSE',
-                category__category_type__in=['healthcare', 'health'],
-                date__gte=first_day
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            ).aggregate(**{
+                category: Sum('amount', filter=Q(category=category))
+                for category in critical_categories['food']
+            })
+            for category, spent in food_spent.items():
+                critical_categories['food'][category]['spent'] = spent or Decimal('0')
+            
+            # Transportation, health and recent food spending from transactions, one conditional aggregate.
+            # Recent food counts expenses described as food and expenses in a food category
+            # (a transaction matching both counts twice, as it always has)
+            month_expenses = Q(date__gte=first_day)
+            recent_expenses = Q(date__gte=timezone.now() - timedelta(days=30))
+            transaction_spent = transactions.filter(month_expenses | recent_expenses, transaction_type='EXPENSE').aggregate(
+                transportation=Sum('amount', filter=month_expenses & Q(category__category_type='transportation')),
+                health=Sum('amount', filter=month_expenses & Q(category__category_type__in=['healthcare', 'health'])),
+                food_described=Sum('amount', filter=recent_expenses & Q(description__icontains='food')),
+                food_categorized=Sum('amount', filter=recent_expenses & Q(category__category_type__in=['groceries', 'dining_out']))
+            )
             
-            critical_categories['transportation']['spent'] = transportation_spent
-            critical_categories['health']['spent'] = health_spent
+            critical_categories['transportation']['spent'] = transaction_spent['transportation'] or Decimal('0')
+            critical_categories['health']['spent'] = transaction_spent['health'] or Decimal('0')
             
             # Calculate totals first
             food_total_amount = sum(cat['amount'] for cat in critical_categories['food'].values())
@@ -551,87 +524,66 @@ class ModeService:
             mode_data['money_left_to_spend'] = food_total_amount - food_total_spent
             mode_data['daily_allowance'] = (food_total_amount - food_total_spent) / days_left_in_month if days_left_in_month > 0 else Decimal('0')
             
-            # Get essential bills status
-            essential_bills = EssentialBill.objects.filter(user=user)
-            
-            # If no essential bills exist yet, create some default ones
-            if not essential_bills.exists():
-                # This can be moved to a separate method for initializing bills
-                pass
-            
-            # Get bills by category
-            bills_by_category = {}
-            for category in EssentialBill.CATEGORY_CHOICES:
-                cat_code = category[0]
-                bills = essential_bills.filter(category=cat_code)
-                bills_paid = bills.filter(status='paid').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                bills_unpaid = bills.filter(status__in=['unpaid', 'scheduled']).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            with trace_block('Lockdown Mode: essential bills'):
+                # Every bill in one read, bucketed by category
+                bills_by_category = {
+                    cat_code: {'name': cat_name, 'paid': Decimal('0'), 'unpaid': Decimal('0'), 'bills': []}
+                    for cat_code, cat_name in EssentialBill.CATEGORY_CHOICES
+                }
+                for bill in EssentialBill.objects.filter(user=user).values('id', 'name', 'amount', 'due_date', 'status', 'category'):
+                    bucket = bills_by_category.get(bill.pop('category'))
+                    if bucket is None:
+                        continue
+                    if bill['status'] == 'paid':
+                        bucket['paid'] += bill['amount']
+                    elif bill['status'] in ('unpaid', 'scheduled'):
+                        bucket['unpaid'] += bill['amount']
+                    bucket['bills'].append(bill)
                 
-                bills_by_category[cat_code] = {
-                    'name': category[1],
-                    'paid': bills_paid,
-                    'unpaid': bills_unpaid,
-                    'total': bills_paid + bills_unpaid,
-                    'percent_paid': int((bills_paid / (bills_paid + bills_unpaid)) * 100) if (bills_paid + bills_unpaid) > 0 else 0,
-                    'bills': list(bills.values('id', 'name', 'amount', 'due_date', 'status'))
+                for bucket in bills_by_category.values():
+                    bucket['total'] = bucket['paid'] + bucket['unpaid']
+                    bucket['percent_paid'] = int((bucket['paid'] / bucket['total']) * 100) if bucket['total'] > 0 else 0
+            
+                # Check if critical bills (housing, utilities) are paid
+                housing_paid = bills_by_category.get('housing', {}).get('percent_paid', 0) == 100
+                utilities_paid = bills_by_category.get('utilities', {}).get('percent_paid', 0) == 100
+                transportation_paid = bills_by_category.get('transportation', {}).get('percent_paid', 0) == 100
+            
+                mode_data['essential_bills'] = bills_by_category
+                mode_data['critical_bills_status'] = {
+                    'housing_paid': housing_paid,
+                    'utilities_paid': utilities_paid,
+                    'transportation_paid': transportation_paid,
+                    'all_critical_paid': housing_paid and utilities_paid and transportation_paid
                 }
             
-            # Check if critical bills (housing, utilities) are paid
-            housing_paid = bills_by_category.get('housing', {}).get('percent_paid', 0) == 100
-            utilities_paid = bills_by_category.get('utilities', {}).get('percent_paid', 0) == 100
-            transportation_paid = bills_by_category.get('transportation', {}).get('percent_paid', 0) == 100
-            
-            mode_data['essential_bills'] = bills_by_category
-            mode_data['critical_bills_status'] = {
-                'housing_paid': housing_paid,
-                'utilities_paid': utilities_paid,
-                'transportation_paid': transportation_paid,
-                'all_critical_paid': housing_paid and utilities_paid and transportation_paid
-            }
-            
-            # Get recent food expenses to estimate current spending
-            recent_food_expenses = transactions.filter(
-                transaction_type='EXPENSE',
-                description__icontains='food', 
-                date__gte=timezone.now() - timedelta(days=30)
-            )
-            
-            # Alternative method if we have categories
-            food_categories = transactions.filter(
-                transaction_type='EXPENSE',
-                category__category_type__in=['groceries', 'dining_out'],
-                date__gte=timezone.now() - timedelta(days=30)
-            )
-            
-            # Combine both methods
-            all_food_expenses = list(recent_food_expenses) + list(food_categories)
-            recent_food_total = sum(t.amount for t in all_food_expenses)
+            recent_food_total = (transaction_spent['food_described'] or Decimal('0')) + (transaction_spent['food_categorized'] or Decimal('0'))
             
             mode_data['recent_food_spending'] = recent_food_total
             
         elif mode_name == "Survival Mode":
-            mode_data = cls.check_survival_mode(user, transactions)
+            mode_data = cls.check_survival_mode(user, snapshot)
             
             # Add expense scheduler data for Survival Mode
             expense_schedule_data = cls.get_survival_expense_scheduler_data(user)
             mode_data['expense_scheduler'] = expense_schedule_data
             
         elif mode_name == "Stability Mode":
-            mode_data = cls.check_stability_mode(user, transactions)
+            mode_data = cls.check_stability_mode(user, snapshot)
             
             # Add balance maintainer data for Stability Mode
             balance_maintainer_data = cls.get_stability_balance_maintainer_data(user)
             mode_data['balance_maintainer'] = balance_maintainer_data
             
         elif mode_name == "Saver Mode":
-            mode_data = cls.check_saver_mode(user, transactions)
+            mode_data = cls.check_saver_mode(user, snapshot)
             
             # Add savings accelerator data for Saver Mode
             savings_accelerator_data = cls.get_saver_accelerator_data(user)
             mode_data['savings_accelerator'] = savings_accelerator_data
             
         elif mode_name == "Vacay Mode":
-            mode_data = cls.check_vacay_mode(user, transactions)
+            mode_data = cls.check_vacay_mode(user, snapshot)
             
             # Add freedom fund planner data for Vacay Mode
             freedom_fund_data = cls.get_vacay_freedom_fund_data(user)
@@ -641,7 +593,6 @@ class ModeService:
         mode_data = decimal_to_float(mode_data)
         
         return {
-            'mode': mode,
             'current_data': {
                 'total_income': float(total_income),
                 'total_expenses': float(total_expenses),
@@ -651,6 +602,7 @@ class ModeService:
         }
     
     @classmethod
+    @traced
     def get_mode_tips(cls, mode_name):
         """
         Get financial tips specific to a mode
@@ -694,12 +646,15 @@ class ModeService:
             ],
         }
         
-        # Convert mode_name to the format used in the tips dictionary
-        mode_key = mode_name.lower().replace(' ', '_')
-        
-        return tips.get(mode_key, [])
+        # The tips dictionary is keyed by rule key; mode_name may be a slug or a full name
+        catalog_entry = ModeCatalog.resolve(mode_name)
+        if catalog_entry is None:
+            return []
+
+        return tips.get(catalog_entry.key, [])
     
     @classmethod
+    @traced
     def get_survival_expense_scheduler_data(cls, user):
         """
         Get data for Survival Mode's expense scheduler feature
@@ -722,7 +677,7 @@ class ModeService:
         total_upcoming = sum(bill.amount for bill in upcoming_bills)
         
         # Get current available funds
-        start_of_month = today.replace(day=1)
+        start_of_month = MonthRolloverService.starts_at(today.replace(day=1))
         current_month_income = Transaction.objects.filter(
             user=user,
             transaction_type='INCOME',
@@ -814,6 +769,7 @@ class ModeService:
         }
     
     @classmethod
+    @traced
     def get_stability_balance_maintainer_data(cls, user):
         """
         Get data for Stability Mode's balance maintainer feature
@@ -827,45 +783,25 @@ class ModeService:
         start_of_month = today.replace(day=1)
         end_of_month = (start_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        # Get income and expenses for current month
-        current_month_income = Transaction.objects.filter(
-            user=user,
-            transaction_type='INCOME',
-            date__gte=start_of_month,
-            date__lte=end_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+        # Income and expenses for this month and the 4 before it, one query grouped by calendar month
+        history_start = MonthRolloverService.add_months(start_of_month, -4)
+        totals = MonthRolloverService.monthly_totals([user.pk], history_start, start_of_month).get(user.pk, {})
+        no_activity = {'income': Decimal('0'), 'expenses': Decimal('0')}
         
-        current_month_expenses = Transaction.objects.filter(
-            user=user,
-            transaction_type='EXPENSE',
-            date__gte=start_of_month,
-            date__lte=end_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+        current_month_income = totals.get(start_of_month, no_activity)['income']
+        current_month_expenses = totals.get(start_of_month, no_activity)['expenses']
         
         # Calculate current ratio
         current_ratio = Decimal('0')
         if current_month_income > 0:
             current_ratio = current_month_expenses / current_month_income
         
-        # Get ratio history (last 5 months)
+        # Ratio history (last 5 months, newest first)
         monthly_ratios = []
         for i in range(5):
-            month_start = (start_of_month - timedelta(days=i * 30)).replace(day=1)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            month_income = Transaction.objects.filter(
-                user=user,
-                transaction_type='INCOME',
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            
-            month_expenses = Transaction.objects.filter(
-                user=user,
-                transaction_type='EXPENSE',
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            month_start = MonthRolloverService.add_months(start_of_month, -i)
+            month_income = totals.get(month_start, no_activity)['income']
+            month_expenses = totals.get(month_start, no_activity)['expenses']
             
             month_ratio = Decimal('0')
             if month_income > 0:
@@ -878,20 +814,11 @@ class ModeService:
                 'expenses': float(month_expenses)
             })
         
-        # Calculate the average ratio from history to determine target
-        valid_ratios = [r['ratio'] for r in monthly_ratios if r['ratio'] > 0]
-        target_ratio = sum(valid_ratios) / len(valid_ratios) if valid_ratios else 0.7  # Default to 70% if no history
-        
-        # Get or create current month's target
-        ratio_target, created = StabilityRatioTarget.objects.get_or_create(
-            user=user,
-            month=start_of_month,
-            defaults={
-                'income_target': current_month_income if current_month_income > 0 else Decimal('1000'),
-                'expense_target': current_month_income * Decimal(str(target_ratio)) if current_month_income > 0 else Decimal('700'),
-                'ratio_target': Decimal(str(target_ratio))
-            }
-        )
+        # Current month's target (created ahead of time by rollover_month)
+        ratio_target = StabilityRatioTarget.objects.filter(user=user, month=start_of_month).first()
+        if ratio_target is None:
+            MonthRolloverService.rollover(start_of_month, [user.pk])
+            ratio_target = StabilityRatioTarget.objects.get(user=user, month=start_of_month)
         
         # Calculate spending guardrails
         remaining_budget = ratio_target.income_target * ratio_target.ratio_target - current_month_expenses
@@ -906,18 +833,22 @@ class ModeService:
         category_limits = CategorySpendingLimit.objects.filter(
             user=user,
             month=start_of_month
+        ).select_related('category')
+        
+        # This month's spending in every limited category, one grouped query
+        month_range = Q(date__gte=MonthRolloverService.starts_at(start_of_month)) & Q(
+            date__lt=MonthRolloverService.starts_at(MonthRolloverService.add_months(start_of_month, 1))
         )
+        spent_by_category = dict(Transaction.objects.filter(
+            month_range,
+            user=user,
+            transaction_type='EXPENSE',
+            category_id__in=[limit.category_id for limit in category_limits]
+        ).values('category_id').annotate(total=Sum('amount')).order_by().values_list('category_id', 'total'))
         
         category_spending = {}
         for limit in category_limits:
-            # Get current spending for this category
-            category_expenses = Transaction.objects.filter(
-                user=user,
-                transaction_type='EXPENSE',
-                category=limit.category,
-                date__gte=start_of_month,
-                date__lte=end_of_month
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+            category_expenses = spent_by_category.get(limit.category_id) or Decimal('0')
             
             # Calculate percentage of limit used
             percentage_used = 0
@@ -960,6 +891,7 @@ class ModeService:
         }
     
     @classmethod
+    @traced
     def get_saver_accelerator_data(cls, user):
         """
         Get data for Saver Mode's savings accelerator feature
@@ -976,8 +908,8 @@ class ModeService:
         current_month_income = Transaction.objects.filter(
             user=user,
             transaction_type='INCOME',
-            date__gte=start_of_month,
-            date__lte=end_of_month
+            date__gte=MonthRolloverService.starts_at(start_of_month),
+            date__lt=MonthRolloverService.starts_at(MonthRolloverService.add_months(start_of_month, 1))
         ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
         
         # Average income over last 3 months for more stable numbers
@@ -985,8 +917,10 @@ class ModeService:
         avg_monthly_income = Transaction.objects.filter(
             user=user,
             transaction_type='INCOME',
-            date__gte=three_months_ago
-        ).values('date__month').annotate(monthly_sum=Sum('amount')).aggregate(Avg('monthly_sum'))['monthly_sum__avg'] or current_month_income
+            date__gte=MonthRolloverService.starts_at(three_months_ago)
+        ).annotate(month=TruncMonth('date', tzinfo=dt_timezone.utc)).values('month').annotate(
+            monthly_sum=Sum('amount')
+        ).aggregate(Avg('monthly_sum'))['monthly_sum__avg'] or current_month_income
         
         if avg_monthly_income == 0:
             avg_monthly_income = Decimal('1000')  # Default for new users
@@ -1015,78 +949,92 @@ class ModeService:
         current_month_saved = sum(c.amount for c in current_contributions)
         
         # Get total savings by goal
+        savings_goals = list(savings_goals)
+        goal_ids = [goal.id for goal in savings_goals]
+        
+        # Every goal's monthly contribution totals over the last 90 days, one grouped query
+        monthly_sums = {}
+        for row in SavingsContribution.objects.filter(
+            user=user,
+            goal_id__in=goal_ids,
+            date__gte=three_months_ago
+        ).values('goal_id', 'date__month').annotate(monthly_sum=Sum('amount')).order_by():
+            monthly_sums.setdefault(row['goal_id'], []).append(row['monthly_sum'])
+        
+        # Every goal's five latest contributions, one window query
+        recent_by_goal = {}
+        for contribution in SavingsContribution.objects.filter(
+            user=user,
+            goal_id__in=goal_ids
+        ).annotate(
+            recent_rank=Window(RowNumber(), partition_by=[F('goal_id')], order_by=[F('date').desc(), F('id').desc()])
+        ).filter(recent_rank__lte=5).order_by('goal_id', 'recent_rank').values('goal_id', 'date', 'amount', 'description'):
+            recent_by_goal.setdefault(contribution['goal_id'], []).append(contribution)
+        
         goal_data = []
-        for goal in savings_goals:
-            # Calculate time to goal completion based on current contribution rate
-            monthly_contributions = SavingsContribution.objects.filter(
-                user=user,
-                goal=goal,
-                date__gte=three_months_ago
-            ).values('date__month').annotate(monthly_sum=Sum('amount'))
-            
-            avg_monthly_contribution = Decimal('0')
-            if monthly_contributions:
-                avg_monthly_contribution = sum(m['monthly_sum'] for m in monthly_contributions) / len(monthly_contributions)
-            
-            # Calculate months to complete, acceleration options
-            months_to_complete = 0
-            if avg_monthly_contribution > 0:
-                months_to_complete = (goal.target_amount - goal.current_amount) / avg_monthly_contribution
-            
-            # Create acceleration options
-            acceleration_options = []
-            remaining = goal.target_amount - goal.current_amount
-            
-            if remaining > 0:
-                for multiplier in [1.25, 1.5, 2.0]:
-                    accelerated_contribution = avg_monthly_contribution * Decimal(str(multiplier))
-                    if accelerated_contribution <= 0:
-                        # If no contribution history, suggest a reasonable amount based on goal size
-                        accelerated_contribution = remaining * Decimal('0.05')  # 5% of remaining
+        with trace_block('Saver Mode: per-goal accelerator'):
+            for goal in savings_goals:
+                # Calculate time to goal completion based on current contribution rate
+                monthly_contributions = monthly_sums.get(goal.id, [])
+            
+                avg_monthly_contribution = Decimal('0')
+                if monthly_contributions:
+                    avg_monthly_contribution = sum(monthly_contributions) / len(monthly_contributions)
+            
+                # Calculate months to complete, acceleration options
+                months_to_complete = 0
+                if avg_monthly_contribution > 0:
+                    months_to_complete = (goal.target_amount - goal.current_amount) / avg_monthly_contribution
+            
+                # Create acceleration options
+                acceleration_options = []
+                remaining = goal.target_amount - goal.current_amount
+            
+                if remaining > 0:
+                    for multiplier in [1.25, 1.5, 2.0]:
+                        accelerated_contribution = avg_monthly_contribution * Decimal(str(multiplier))
+                        if accelerated_contribution <= 0:
+                            # If no contribution history, suggest a reasonable amount based on goal size
+                            accelerated_contribution = remaining * Decimal('0.05')  # 5% of remaining
                         
-                    accelerated_months = 0
-                    if accelerated_contribution > 0:
-                        accelerated_months = math.ceil(remaining / accelerated_contribution)
+                        accelerated_months = 0
+                        if accelerated_contribution > 0:
+                            accelerated_months = math.ceil(remaining / accelerated_contribution)
                         
-                    months_saved = 0
-                    if avg_monthly_contribution > 0:
-                        months_saved = math.ceil(months_to_complete - accelerated_months)
+                        months_saved = 0
+                        if avg_monthly_contribution > 0:
+                            months_saved = math.ceil(months_to_complete - accelerated_months)
                         
-                    acceleration_options.append({
-                        'multiplier': float(multiplier),
-                        'monthly_amount': float(accelerated_contribution),
-                        'months_to_complete': accelerated_months,
-                        'months_saved': months_saved,
-                        'percentage_of_income': float((accelerated_contribution / avg_monthly_income) * 100)
-                    })
-            
-            # Get recent contributions
-            recent_contributions = SavingsContribution.objects.filter(
-                user=user,
-                goal=goal
-            ).order_by('-date')[:5]
-            
-            # Format goal data
-            goal_data.append({
-                'id': goal.id,
-                'name': goal.name,
-                'goal_type': goal.goal_type,
-                'target_amount': float(goal.target_amount),
-                'current_amount': float(goal.current_amount),
-                'progress_percentage': goal.progress_percentage(),
-                'target_date': goal.target_date.strftime('%Y-%m-%d') if goal.target_date else None,
-                'icon': goal.icon,
-                'monthly_target': float(goal.monthly_target()),
-                'avg_monthly_contribution': float(avg_monthly_contribution),
-                'months_to_complete': math.ceil(months_to_complete) if months_to_complete > 0 else None,
-                'is_on_track': avg_monthly_contribution >= goal.monthly_target() if goal.monthly_target() > 0 else True,
-                'acceleration_options': acceleration_options,
-                'recent_contributions': [{
-                    'date': c.date.strftime('%Y-%m-%d'),
-                    'amount': float(c.amount),
-                    'description': c.description
-                } for c in recent_contributions]
-            })
+                        acceleration_options.append({
+                            'multiplier': float(multiplier),
+                            'monthly_amount': float(accelerated_contribution),
+                            'months_to_complete': accelerated_months,
+                            'months_saved': months_saved,
+                            'percentage_of_income': float((accelerated_contribution / avg_monthly_income) * 100)
+                        })
+            
+                # Format goal data
+                goal_data.append({
+                    'id': goal.id,
+                    'name': goal.name,
+                    'goal_type': goal.goal_type,
+                    'target_amount': float(goal.target_amount),
+                    'current_amount': float(goal.current_amount),
+                    'progress_percentage': goal.progress_percentage(),
+                    'target_date': goal.target_date.strftime('%Y-%m-%d') if goal.target_date else None,
+                    'icon': goal.icon,
+                    'priority': goal.priority,
+                    'monthly_target': float(goal.monthly_target()),
+                    'avg_monthly_contribution': float(avg_monthly_contribution),
+                    'months_to_complete': math.ceil(months_to_complete) if months_to_complete > 0 else None,
+                    'is_on_track': avg_monthly_contribution >= goal.monthly_target() if goal.monthly_target() > 0 else True,
+                    'acceleration_options': acceleration_options,
+                    'recent_contributions': [{
+                        'date': c['date'].strftime('%Y-%m-%d'),
+                        'amount': float(c['amount']),
+                        'description': c['description']
+                    } for c in recent_by_goal.get(goal.id, [])]
+                })
             
         # Calculate optimal allocation of the recommended monthly savings
         # Prioritize emergency fund first, then goals by priority
@@ -1105,7 +1053,7 @@ class ModeService:
         
         # Allocate remaining based on priority
         prioritized_goals = sorted([g for g in goal_data if g['goal_type'] != 'emergency' and g['progress_percentage'] < 100], 
-                                 key=lambda x: (x['priority'], x.get('months_to_complete', 999)))
+                                 key=lambda x: (x['priority'], x['months_to_complete'] or 999))
                                  
         for goal in prioritized_goals:
             if remaining_savings <= 0:
@@ -1131,12 +1079,13 @@ class ModeService:
         }
     
     @classmethod
+    @traced
     def get_vacay_freedom_fund_data(cls, user):
         """
         Get data for Vacay Mode's freedom fund planner feature
         """
-        from main_app.models import Transaction, FreedomFundPlan, FreedomExpense
-        from django.db.models import Sum, Count
+        from main_app.models import FreedomFundPlan, FreedomExpense
+        from django.db.models import Sum
         from datetime import timedelta
         
         # Get current month's financials
@@ -1144,45 +1093,21 @@ class ModeService:
         start_of_month = today.replace(day=1)
         end_of_month = (start_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        # Get income and expenses for current month
-        current_month_income = Transaction.objects.filter(
-            user=user,
-            transaction_type='INCOME',
-            date__gte=start_of_month,
-            date__lte=end_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        current_month_expenses = Transaction.objects.filter(
-            user=user,
-            transaction_type='EXPENSE',
-            date__gte=start_of_month,
-            date__lte=end_of_month
-        ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+        # Income and expenses for this month and the 5 before it, one query grouped by calendar month
+        history_start = MonthRolloverService.add_months(start_of_month, -5)
+        totals = MonthRolloverService.monthly_totals([user.pk], history_start, start_of_month).get(user.pk, {})
+        no_activity = {'income': Decimal('0'), 'expenses': Decimal('0')}
         
+        current_month_income = totals.get(start_of_month, no_activity)['income']
+        current_month_expenses = totals.get(start_of_month, no_activity)['expenses']
         current_savings = current_month_income - current_month_expenses
         
-        # Get savings trend over the last 6 months
-        six_months_ago = today - timedelta(days=180)
+        # Savings trend over the last 6 months, newest first
         monthly_savings = []
-        
         for i in range(6):
-            month_start = (start_of_month - timedelta(days=i * 30)).replace(day=1)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            month_income = Transaction.objects.filter(
-                user=user,
-                transaction_type='INCOME',
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            
-            month_expenses = Transaction.objects.filter(
-                user=user,
-                transaction_type='EXPENSE',
-                date__gte=month_start,
-                date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-            
+            month_start = MonthRolloverService.add_months(start_of_month, -i)
+            month_income = totals.get(month_start, no_activity)['income']
+            month_expenses = totals.get(month_start, no_activity)['expenses']
             month_savings = month_income - month_expenses
             
             monthly_savings.append({
@@ -1196,27 +1121,21 @@ class ModeService:
         valid_savings = [ms['savings'] for ms in monthly_savings if ms['savings'] > 0]
         avg_monthly_savings = sum(valid_savings) / len(valid_savings) if valid_savings else 0
         
-        # Get or create current month's freedom fund plan
-        freedom_plan, created = FreedomFundPlan.objects.get_or_create(
-            user=user,
-            month=start_of_month,
-            defaults={
-                'discretionary_amount': max(current_savings, Decimal('0')),
-                'freedom_allocation': max(current_savings * Decimal('0.3'), Decimal('0')),  # Default to 30% for freedom fund
-                'savings_allocation': max(current_savings * Decimal('0.7'), Decimal('0')),  # Default to 70% for long-term savings
-                'is_active': True
-            }
-        )
+        # Current month's freedom fund plan (created ahead of time by rollover_month)
+        freedom_plan = FreedomFundPlan.objects.filter(user=user, month=start_of_month).first()
+        if freedom_plan is None:
+            MonthRolloverService.rollover(start_of_month, [user.pk])
+            freedom_plan = FreedomFundPlan.objects.get(user=user, month=start_of_month)
         
-        # Get freedom expenses for current month
-        freedom_expenses = FreedomExpense.objects.filter(
+        # This month's freedom expenses per category, totalled in the database
+        category_totals = FreedomExpense.objects.filter(
             user=user,
             date__gte=start_of_month,
             date__lte=end_of_month
-        )
+        ).values('category').annotate(total=Sum('amount')).order_by('-total', 'category')
         
         # Calculate total spent from freedom fund
-        total_freedom_spent = sum(fe.amount for fe in freedom_expenses)
+        total_freedom_spent = sum((row['total'] for row in category_totals), Decimal('0'))
         freedom_remaining = freedom_plan.freedom_allocation - total_freedom_spent
         
         # Calculate percentage used
@@ -1224,40 +1143,30 @@ class ModeService:
         if freedom_plan.freedom_allocation > 0:
             freedom_percentage_used = (total_freedom_spent / freedom_plan.freedom_allocation) * 100
         
-        # Group freedom expenses by category
-        category_totals = {}
-        for expense in freedom_expenses:
-            if expense.category not in category_totals:
-                category_totals[expense.category] = Decimal('0')
-            category_totals[expense.category] += expense.amount
-        
-        # Format category data
+        # Format category data (sorted by total spent, descending)
         categories = []
-        for category, total in category_totals.items():
+        for row in category_totals:
             categories.append({
-                'category': category,
-                'total': float(total),
-                'percentage': float((total / total_freedom_spent) * 100) if total_freedom_spent > 0 else 0
+                'category': row['category'],
+                'total': float(row['total']),
+                'percentage': float((row['total'] / total_freedom_spent) * 100) if total_freedom_spent > 0 else 0
             })
         
-        # Sort categories by total spent (descending)
-        categories.sort(key=lambda x: x['total'], reverse=True)
-        
-        # Get recent freedom expenses
-        recent_expenses = FreedomExpense.objects.filter(
-            user=user
-        ).order_by('-date')[:10]
+        # Ten most recent freedom expenses (served by the (user, -date) index)
+        recent_expenses = FreedomExpense.objects.filter(user=user).order_by('-date').values(
+            'id', 'date', 'category', 'amount', 'description', 'location', 'photo_url'
+        )[:10]
         
         recent_expense_data = []
         for expense in recent_expenses:
             recent_expense_data.append({
-                'id': expense.id,
-                'date': expense.date.strftime('%Y-%m-%d'),
-                'category': expense.category,
-                'amount': float(expense.amount),
-                'description': expense.description,
-                'location': expense.location,
-                'photo_url': expense.photo_url
+                'id': expense['id'],
+                'date': expense['date'].strftime('%Y-%m-%d'),
+                'category': expense['category'],
+                'amount': float(expense['amount']),
+                'description': expense['description'],
+                'location': expense['location'],
+                'photo_url': expense['photo_url']
             })
         
         # Calculate next month's recommended freedom allocation
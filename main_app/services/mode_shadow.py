@@ -0,0 +1,193 @@
+import logging
+import random
+import time
+from django.conf import settings
+from django.utils import timezone
+from main_app.services.mode_rules import ModeRuleRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ModeShadow:
+    """
+    Runs a candidate mode engine next to ModeService.check_all_modes and
+    records where the two disagree, so a faster evaluator can be validated
+    before it replaces the rule checks.
+
+    An engine is registered with ``@ModeShadow.engine(name)``; it takes a list
+    of user ids and the evaluation time and returns
+    {user_id: {mode key: {'is_unlocked': bool, 'progress': int, ...}}}.
+    With MODE_SHADOW_ENGINE set, MODE_SHADOW_SAMPLE_RATE of the evaluations
+    update_user_modes runs are repeated on that engine and stored as a
+    ModeShadowRun with both latencies; runs that disagree on ``is_unlocked``
+    or ``progress`` also keep the rule inputs. Results an engine marks
+    ``'exact': False`` are ones it leaves to the rule checks, so they are
+    not compared. The shadow_modes command does the same comparison for
+    every user in batches.
+    """
+
+    ENGINES = {}
+    COMPARED = ('is_unlocked', 'progress')
+
+    @classmethod
+    def engine(cls, name):
+        def register(func):
+            cls.ENGINES[name] = func
+            return func
+        return register
+
+    @classmethod
+    def sampled(cls):
+        """
+        Whether this evaluation should also run the shadow engine
+        """
+        if not settings.MODE_SHADOW_ENGINE or settings.MODE_SHADOW_SAMPLE_RATE <= 0:
+            return False
+        return random.random() < settings.MODE_SHADOW_SAMPLE_RATE
+
+    @classmethod
+    def check_all_modes(cls, user, engine=None):
+        """
+        ModeService.check_all_modes(user), repeated on the shadow engine.
+        Always returns the rule results; engine errors are logged and stored
+        on the run, never raised.
+        """
+        from main_app.services.mode_service import ModeService  # Import here to avoid circular imports
+
+        start = time.perf_counter()
+        inputs = ModeRuleRegistry.plan().load([user.pk])[user.pk]
+        mode_results = ModeService.check_all_modes(user, inputs=inputs)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        engine = engine or settings.MODE_SHADOW_ENGINE
+        try:
+            start = time.perf_counter()
+            try:
+                candidate = cls.ENGINES[engine]([user.pk], inputs.snapshot.now)[user.pk]
+            except Exception as e:
+                logger.exception("Shadow engine %s failed for user %s", engine, user.pk)
+                cls.record(user, engine, legacy_ms, None, [], inputs, error=repr(e))
+                return mode_results
+            candidate_ms = (time.perf_counter() - start) * 1000
+            cls.record(user, engine, legacy_ms, candidate_ms, cls.compare(mode_results, candidate), inputs)
+        except Exception:
+            logger.exception("Could not record shadow run for user %s", user.pk)
+        return mode_results
+
+    @classmethod
+    def compare_batch(cls, users, engine, now=None):
+        """
+        Evaluate a batch of users on both paths at the same instant.
+        Returns (legacy_ms, candidate_ms, {user_id: mismatches},
+        {user_id: inexact mode keys}, inputs by user id)
+        """
+        from main_app.services.mode_service import ModeService  # Import here to avoid circular imports
+
+        now = now or timezone.now()
+        user_ids = [user.pk for user in users]
+
+        start = time.perf_counter()
+        inputs = ModeRuleRegistry.plan().load(user_ids, now=now)
+        legacy = {user.pk: ModeService.check_all_modes(user, inputs=inputs[user.pk]) for user in users}
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        candidate = cls.ENGINES[engine](user_ids, now)
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = {}
+        inexact = {}
+        for user_id in user_ids:
+            results = candidate.get(user_id, {})
+            differences = cls.compare(legacy[user_id], results)
+            if differences:
+                mismatches[user_id] = differences
+            keys = cls.inexact(results)
+            if keys:
+                inexact[user_id] = keys
+        return legacy_ms, candidate_ms, mismatches, inexact, inputs
+
+    @classmethod
+    def compare(cls, legacy, candidate):
+        """
+        [{'mode', 'legacy', 'candidate'}] for every mode whose is_unlocked or
+        progress differ (or that the engine did not return). Results the
+        engine marks inexact are skipped (see inexact())
+        """
+        mismatches = []
+        for key, expected in legacy.items():
+            actual = candidate.get(key)
+            if actual is not None and actual.get('exact') is False:
+                continue
+            if actual is not None and all(expected[field] == actual[field] for field in cls.COMPARED):
+                continue
+            mismatches.append({
+                'mode': key,
+                'legacy': {field: expected[field] for field in cls.COMPARED},
+                'candidate': actual,
+            })
+        return mismatches
+
+    @staticmethod
+    def inexact(candidate):
+        """
+        Mode keys the engine could not decide exactly (its caller re-checks
+        them with the rules), so they are counted apart from mismatches
+        """
+        return [key for key, actual in candidate.items() if actual.get('exact') is False]
+
+    @classmethod
+    def record(cls, user, engine, legacy_ms, candidate_ms, mismatches, inputs, source='sample', error=''):
+        from main_app.models import ModeShadowRun  # Import here to avoid circular imports
+
+        return ModeShadowRun.objects.create(
+            user=user,
+            engine=engine,
+            source=source,
+            legacy_ms=legacy_ms,
+            candidate_ms=candidate_ms,
+            mismatches=mismatches,
+            # Inputs are only worth their size when something needs explaining
+            inputs=cls.describe_inputs(inputs) if mismatches or error else None,
+            error=error
+        )
+
+    @staticmethod
+    def describe_inputs(inputs):
+        """
+        The loaded rule inputs as JSON: lifetime totals and the month buckets, in cents
+        """
+        snapshot = inputs.snapshot
+        described = {
+            'now': snapshot.now.isoformat(),
+            'total_income': snapshot.total_income,
+            'total_expenses': snapshot.total_expenses,
+            'months': {
+                f'{year}-{month:02d}': bucket
+                for (year, month), bucket in sorted(snapshot.months.items())
+            },
+        }
+        return described
+
+
+@ModeShadow.engine('cohort')
+def cohort_engine(user_ids, now):
+    """
+    CohortEvaluator (NumPy, one pass per batch). Results carry its ``exact``
+    flag: inexact rows are the ones update_modes_for_cohort re-checks.
+    """
+    from main_app.services.cohort_evaluator import CohortEvaluator
+
+    cohort = CohortEvaluator(user_ids, now)
+    results = cohort.evaluate()
+    return {
+        user_id: {
+            key: {
+                'is_unlocked': bool(result['is_unlocked'][index]),
+                'progress': int(result['progress'][index]),
+                'exact': bool(result['exact'][index]),
+            }
+            for key, result in results.items()
+        }
+        for index, user_id in enumerate(cohort.user_ids)
+    }
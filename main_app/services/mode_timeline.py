@@ -0,0 +1,130 @@
+import calendar
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from itertools import accumulate
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDate
+from main_app.services.financial_snapshot import FinancialSnapshot
+from main_app.services.money import to_cents
+
+
+class LedgerTimeline:
+    """
+    Daily prefix sums of a user's ledger, used to rebuild the FinancialSnapshot
+    the mode checks would have seen at the end of any past day.
+
+    Built from one grouped query (one row per UTC day and transaction type).
+    Any day range sum is a difference of two prefix entries, so a snapshot for
+    a date costs a constant number of lookups however long the history is.
+    As-of snapshots only include transactions dated on or before that day, and
+    their trailing windows cover whole days (the ``days`` days ending on it).
+    Amounts are integer cents, like FinancialSnapshot.
+    """
+
+    SERIES = ('income', 'expenses', 'income_count', 'expense_count')
+
+    def __init__(self, first_day, daily):
+        """
+        ``daily`` maps each series name to a list of per-day values starting at ``first_day``
+        """
+        self.first_day = first_day
+        self.first_ordinal = first_day.toordinal()
+        self.days = len(daily['income'])
+        # prefix[series][i] is the sum of the first i days
+        self.prefix = {
+            series: list(accumulate(daily[series], initial=0))
+            for series in self.SERIES
+        }
+
+    @classmethod
+    def build(cls, user):
+        return cls.build_many([user.pk])[user.pk]
+
+    @classmethod
+    def build_many(cls, user_ids):
+        """
+        Timelines for several users from a single grouped query. Returns {user_id: timeline}
+        """
+        from main_app.models import Transaction  # Import here to avoid circular imports
+
+        rows_by_user = {user_id: [] for user_id in user_ids}
+        for row in Transaction.objects.filter(user_id__in=user_ids).annotate(
+            day=TruncDate('date', tzinfo=dt_timezone.utc)
+        ).values('user_id', 'day', 'transaction_type').annotate(total=Sum('amount'), count=Count('id')).order_by():
+            rows_by_user[row['user_id']].append(row)
+
+        return {user_id: cls.from_rows(rows) for user_id, rows in rows_by_user.items()}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a timeline from grouped (day, transaction_type) rows
+        """
+        if not rows:
+            return cls(date.today(), {series: [] for series in cls.SERIES})
+
+        first_day = min(row['day'] for row in rows)
+        length = (max(row['day'] for row in rows) - first_day).days + 1
+        daily = {
+            'income': [0] * length,
+            'expenses': [0] * length,
+            'income_count': [0] * length,
+            'expense_count': [0] * length,
+        }
+        for row in rows:
+            index = (row['day'] - first_day).days
+            if row['transaction_type'] == 'INCOME':
+                daily['income'][index] += to_cents(row['total'])
+                daily['income_count'][index] += row['count']
+            else:
+                daily['expenses'][index] += to_cents(row['total'])
+                daily['expense_count'][index] += row['count']
+        return cls(first_day, daily)
+
+    @property
+    def is_empty(self):
+        return self.days == 0
+
+    def total(self, series, first, last):
+        """
+        Sum of a series over the days ``first`` to ``last`` inclusive (dates or ordinals)
+        """
+        if isinstance(first, date):
+            first, last = first.toordinal(), last.toordinal()
+        start = max(0, first - self.first_ordinal)
+        end = min(self.days, last - self.first_ordinal + 1)
+        if end <= start:
+            return 0
+        return self.prefix[series][end] - self.prefix[series][start]
+
+    def snapshot(self, as_of):
+        """
+        FinancialSnapshot as of the end of ``as_of`` (a date, UTC)
+        """
+        now = datetime.combine(as_of, time.max, tzinfo=dt_timezone.utc)
+        oldest = as_of - timedelta(days=max(FinancialSnapshot.windows()) - 1)
+
+        today = as_of.toordinal()
+        months = {}
+        year, month = oldest.year, oldest.month
+        while (year, month) <= (as_of.year, as_of.month):
+            first = date(year, month, 1).toordinal()
+            last = min(first + calendar.monthrange(year, month)[1] - 1, today)
+
+            if self.total('income_count', first, last) or self.total('expense_count', first, last):
+                bucket = FinancialSnapshot.empty_bucket()
+                for side in ('income', 'expenses'):
+                    bucket[side] = bucket[f'{side}_to_date'] = self.total(side, first, last)
+                for days, window in bucket['windows'].items():
+                    window_first = max(first, today - days + 1)
+                    for series in self.SERIES:
+                        window[series] = self.total(series, window_first, last)
+                months[(year, month)] = bucket
+
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        return FinancialSnapshot(
+            now,
+            months,
+            total_income=self.total('income', self.first_day, as_of),
+            total_expenses=self.total('expenses', self.first_day, as_of)
+        )
@@ -0,0 +1,107 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from django.db import connection
+
+# Trace collecting in the current thread, if any
+_state = threading.local()
+
+
+class ModeTrace:
+    """
+    Collects wall time, SQL query count and SQL time of the traced ModeService
+    calls (and trace_block sections) made inside a ``with ModeTrace()`` block.
+    Costs are inclusive: a call's numbers include the calls it makes.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.queries = 0
+        self.sql_time = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        self._previous = getattr(_state, 'trace', None)
+        _state.trace = self
+        self._wrapper = connection.execute_wrapper(self._execute)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        _state.trace = self._previous
+
+    def _execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    @contextmanager
+    def span(self, name):
+        start, queries, sql_time = time.perf_counter(), self.queries, self.sql_time
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            self.records.append({
+                'name': name,
+                'depth': self.depth,
+                'wall_ms': (time.perf_counter() - start) * 1000,
+                'queries': self.queries - queries,
+                'sql_ms': (self.sql_time - sql_time) * 1000,
+            })
+
+    def summary(self):
+        """
+        Records grouped by name, most expensive first
+        """
+        totals = {}
+        for record in self.records:
+            row = totals.setdefault(record['name'], {
+                'name': record['name'], 'calls': 0, 'wall_ms': 0.0, 'queries': 0, 'sql_ms': 0.0
+            })
+            row['calls'] += 1
+            row['wall_ms'] += record['wall_ms']
+            row['queries'] += record['queries']
+            row['sql_ms'] += record['sql_ms']
+        return sorted(totals.values(), key=lambda row: row['wall_ms'], reverse=True)
+
+
+def current_trace():
+    return getattr(_state, 'trace', None)
+
+
+def traced(func):
+    """
+    Record calls to ``func`` in the active ModeTrace. Without one the
+    function is called directly.
+    """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return func(*args, **kwargs)
+        with trace.span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def trace_block(name):
+    """
+    Record a section of a method in the active ModeTrace
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
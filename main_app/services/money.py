@@ -0,0 +1,21 @@
+from decimal import Decimal
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """
+    Convert an amount (Decimal, or None for an empty aggregate) to integer cents.
+    Rounds to the cent the way DecimalField values are quantized; SQLite's
+    float-backed sums are normalised the same way.
+    """
+    if value is None:
+        return 0
+    return int(Decimal(value).quantize(CENT).scaleb(2))
+
+
+def from_cents(cents):
+    """
+    Convert integer (or Decimal) cents back to a Decimal amount, e.g. 1234 -> Decimal('12.34')
+    """
+    return Decimal(cents).scaleb(-2)
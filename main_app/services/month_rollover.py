@@ -0,0 +1,176 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from django.db import transaction as db_transaction
+from django.db.models import Q, Sum
+
+
+class MonthRolloverService:
+    """
+    Creates each month's planning rows - the Stability Mode StabilityRatioTarget
+    and the Vacay Mode FreedomFundPlan - for many users at once, so the
+    dashboards only read them. Defaults are computed from one grouped
+    LedgerMonthlyRollup query per batch; rows that already exist (e.g. a
+    plan the user saved) are left alone.
+    """
+
+    # Targets are averaged over the full months before the one being prepared,
+    # so the rows are the same whether the job runs ahead or a view creates them
+    HISTORY_MONTHS = 5
+    DEFAULT_INCOME_TARGET = Decimal('1000')
+    DEFAULT_EXPENSE_TARGET = Decimal('700')
+    DEFAULT_RATIO = Decimal('0.7')
+    # ratio_target is DECIMAL(5, 4)
+    MAX_RATIO = Decimal('9.9999')
+    RATIO_PLACES = Decimal('0.0001')
+    FREEDOM_SHARE = Decimal('0.3')
+    SAVINGS_SHARE = Decimal('0.7')
+
+    @staticmethod
+    def add_months(month, count):
+        """
+        First day of the month ``count`` months after (or before) ``month``
+        """
+        index = month.year * 12 + month.month - 1 + count
+        return date(index // 12, index % 12 + 1, 1)
+
+    @staticmethod
+    def starts_at(day):
+        """
+        Midnight UTC at the start of ``day``: ledger months are UTC calendar
+        months everywhere (rollup, snapshot and dashboards)
+        """
+        return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+    @staticmethod
+    def rollup_months(first_month, last_month):
+        """
+        Filter for the LedgerMonthlyRollup buckets of first_month..last_month
+        """
+        return (
+            (Q(year__gt=first_month.year) | Q(year=first_month.year, month__gte=first_month.month))
+            & (Q(year__lt=last_month.year) | Q(year=last_month.year, month__lte=last_month.month))
+        )
+
+    @classmethod
+    def monthly_totals(cls, user_ids, first_month, last_month):
+        """
+        {user_id: {month: {'income': Decimal, 'expenses': Decimal}}} for the
+        calendar months first_month..last_month, read from LedgerMonthlyRollup
+        (UTC calendar months) in one grouped query
+        """
+        from main_app.models import LedgerMonthlyRollup  # Import here to avoid circular imports
+
+        totals = {}
+        rows = LedgerMonthlyRollup.objects.filter(
+            cls.rollup_months(first_month, last_month),
+            user_id__in=user_ids
+        ).values('user_id', 'year', 'month', 'transaction_type').annotate(total=Sum('total')).order_by()
+        for row in rows:
+            month = totals.setdefault(row['user_id'], {}).setdefault(
+                date(row['year'], row['month'], 1), {'income': Decimal('0'), 'expenses': Decimal('0')}
+            )
+            month['income' if row['transaction_type'] == 'INCOME' else 'expenses'] += row['total']
+        return totals
+
+    @classmethod
+    def history(cls, month, totals):
+        """
+        Totals of the HISTORY_MONTHS months before ``month`` that have any
+        transactions, oldest first
+        """
+        months = [cls.add_months(month, -offset) for offset in range(cls.HISTORY_MONTHS, 0, -1)]
+        return [totals[history_month] for history_month in months if history_month in totals]
+
+    @classmethod
+    def stability_target(cls, user_id, month, totals):
+        """
+        Unsaved StabilityRatioTarget for ``month``: the average monthly income
+        of the history months at their average expense/income ratio
+        """
+        from main_app.models import StabilityRatioTarget  # Import here to avoid circular imports
+
+        history = cls.history(month, totals)
+        ratios = [
+            entry['expenses'] / entry['income']
+            for entry in history if entry['income'] > 0 and entry['expenses'] > 0
+        ]
+        ratio = sum(ratios) / len(ratios) if ratios else cls.DEFAULT_RATIO
+        ratio = min(ratio.quantize(cls.RATIO_PLACES), cls.MAX_RATIO)
+
+        incomes = [entry['income'] for entry in history if entry['income'] > 0]
+        income = sum(incomes) / len(incomes) if incomes else Decimal('0')
+        return StabilityRatioTarget(
+            user_id=user_id,
+            month=month,
+            income_target=income if income > 0 else cls.DEFAULT_INCOME_TARGET,
+            expense_target=income * ratio if income > 0 else cls.DEFAULT_EXPENSE_TARGET,
+            ratio_target=ratio
+        )
+
+    @classmethod
+    def freedom_plan(cls, user_id, month, totals):
+        """
+        Unsaved FreedomFundPlan for ``month``: the average monthly savings of
+        the history months split 30/70 between the freedom fund and
+        long-term savings
+        """
+        from main_app.models import FreedomFundPlan  # Import here to avoid circular imports
+
+        history = cls.history(month, totals)
+        savings = sum(entry['income'] - entry['expenses'] for entry in history) / len(history) if history else Decimal('0')
+        savings = max(savings, Decimal('0'))
+        return FreedomFundPlan(
+            user_id=user_id,
+            month=month,
+            discretionary_amount=savings,
+            freedom_allocation=savings * cls.FREEDOM_SHARE,
+            savings_allocation=savings * cls.SAVINGS_SHARE,
+            is_active=True
+        )
+
+    @classmethod
+    def rollover(cls, month, user_ids, batch_size=1000):
+        """
+        Create the missing target and plan rows for ``month`` (a first of the
+        month) for the given users. Returns (targets_created, plans_created)
+        """
+        from main_app.models import StabilityRatioTarget, FreedomFundPlan  # Import here to avoid circular imports
+
+        user_ids = list(user_ids)
+        has_target = set(StabilityRatioTarget.objects.filter(
+            user_id__in=user_ids, month=month
+        ).values_list('user_id', flat=True))
+        has_plan = set(FreedomFundPlan.objects.filter(
+            user_id__in=user_ids, month=month
+        ).values_list('user_id', flat=True))
+        pending = [user_id for user_id in user_ids if user_id not in has_target or user_id not in has_plan]
+        if not pending:
+            return 0, 0
+
+        totals = cls.monthly_totals(pending, cls.add_months(month, -cls.HISTORY_MONTHS), cls.add_months(month, -1))
+        targets = [
+            cls.stability_target(user_id, month, totals.get(user_id, {}))
+            for user_id in pending if user_id not in has_target
+        ]
+        plans = [
+            cls.freedom_plan(user_id, month, totals.get(user_id, {}))
+            for user_id in pending if user_id not in has_plan
+        ]
+        with db_transaction.atomic():
+            # A dashboard view may create a row meanwhile; it wins
+            StabilityRatioTarget.objects.bulk_create(targets, batch_size=batch_size, ignore_conflicts=True)
+            FreedomFundPlan.objects.bulk_create(plans, batch_size=batch_size, ignore_conflicts=True)
+        return len(targets), len(plans)
+
+    @classmethod
+    def active_user_ids(cls, month):
+        """
+        Active accounts with a transaction in the months the rows are computed
+        from. Anyone else gets the defaults on their first dashboard view.
+        """
+        from main_app.models import LedgerMonthlyRollup  # Import here to avoid circular imports
+
+        return LedgerMonthlyRollup.objects.filter(
+            cls.rollup_months(cls.add_months(month, -cls.HISTORY_MONTHS), cls.add_months(month, -1)),
+            user__is_active=True
+        ).order_by('user_id').values_list('user_id', flat=True).distinct()
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from main_app.services.mode_catalog import ModeCatalog
+from main_app.services.mode_rules import MODE_DEFINITIONS
+
+
+class OnboardingService:
+    """
+    Creates the rows a new account starts with: one locked ModeUnlock per
+    mode in MODE_DEFINITIONS and, optionally, a set of default categories.
+    Works on batches of users with one bulk insert per model.
+    """
+
+    # (category_type, is_income)
+    DEFAULT_CATEGORIES = (
+        ('salary', True),
+        ('rent', False),
+        ('utilities', False),
+        ('groceries', False),
+        ('transportation', False),
+        ('dining_out', False),
+        ('entertainment', False),
+        ('savings', False),
+    )
+
+    @classmethod
+    def provision(cls, user_ids, categories=None, batch_size=1000):
+        """
+        Provision the given users. Mode rows that already exist are left
+        alone, and default categories are only added for users without any
+        categories. Users with an empty ledger and no LedgerState are marked
+        as evaluated: the locked, 0% rows are what an evaluation would write.
+        Returns (modes_created, categories_created).
+        """
+        from main_app.models import ModeUnlock, Category, LedgerState, Transaction  # Import here to avoid circular imports
+
+        if categories is None:
+            categories = settings.PROVISION_DEFAULT_CATEGORIES
+        user_ids = list(user_ids)
+
+        with db_transaction.atomic():
+            mode_ids = ModeCatalog.ids(MODE_DEFINITIONS).values()
+            existing = set(ModeUnlock.objects.filter(user_id__in=user_ids).values_list('user_id', 'mode_id'))
+            modes = [
+                ModeUnlock(user_id=user_id, mode_id=mode_id)
+                for user_id in user_ids
+                for mode_id in mode_ids
+                if (user_id, mode_id) not in existing
+            ]
+            ModeUnlock.objects.bulk_create(modes, batch_size=batch_size, ignore_conflicts=True)
+
+            new_categories = []
+            if categories:
+                with_categories = set(
+                    Category.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True).order_by().distinct()
+                )
+                new_categories = [
+                    Category(user_id=user_id, category_type=category_type, is_income=is_income)
+                    for user_id in user_ids if user_id not in with_categories
+                    for category_type, is_income in cls.DEFAULT_CATEGORIES
+                ]
+                Category.objects.bulk_create(new_categories, batch_size=batch_size)
+
+            skip = set(LedgerState.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            skip.update(Transaction.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True).order_by().distinct())
+            today = timezone.now().date()
+            LedgerState.objects.bulk_create([
+                LedgerState(user_id=user_id, modes_version=0, modes_evaluated_on=today)
+                for user_id in user_ids if user_id not in skip
+            ], batch_size=batch_size, ignore_conflicts=True)
+
+        return len(modes), len(new_categories)
@@ -0,0 +1,85 @@
+import threading
+import zlib
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class _Call:
+    """
+    An in-flight call; followers wait on ``done`` and reuse its outcome
+    """
+
+    def __init__(self):
+        self.owner = threading.get_ident()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Concurrent ``do()`` calls for the same key in this process wait for the
+    call already in flight and return its result (or raise its error) instead
+    of running the function again. Each call runs in its own atomic block;
+    across processes it holds a Postgres transaction-level advisory lock for
+    the key, so callers in other workers queue behind it; other databases get
+    no cross-process lock (in this process the in-flight call already is the
+    only one per key). A nested ``do()`` for a key the current thread is
+    already running executes directly.
+    """
+
+    def __init__(self, name, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.using = using
+        # Advisory locks take two int4 keys: one for this flight, one for the item
+        self.lock_class = zlib.crc32(name.encode()) & 0x7fffffff
+        self._mutex = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._mutex:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if call.owner == threading.get_ident():
+                return func()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self.lock(key):
+                call.result = func()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._mutex:
+                del self._calls[key]
+            call.done.set()
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Run the block in its own atomic block, holding the cross-process lock
+        for ``key`` (integer) on Postgres
+        """
+        with transaction.atomic(using=self.using):
+            connection = connections[self.using]
+            if connection.vendor == 'postgresql':
+                # Transaction-level lock: released at commit or rollback, so a
+                # database error in the block can't leave it held. Inside an
+                # outer transaction it is held until that one ends. Keys beyond
+                # int4 only share a lock.
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [self.lock_class, key & 0x7fffffff])
+            yield
@@ -1,9 +1,79 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Transaction
-from .utils import check_and_unlock_modes
+from django.db import transaction as db_transaction
+from .models import (
+    Transaction, Category, ModeUnlock, CriticalSpending, EssentialBill,
+    SurvivalExpenseSchedule, CategorySpendingLimit, SavingsGoal,
+    SavingsContribution, FreedomExpense, FreedomFundPlan, StabilityRatioTarget
+)
+from .services.dashboard_cache import DashboardCache
+from .services.ledger_rollup import LedgerRollupService
+from .services.ledger_state import LedgerStateService
+from .services.mode_jobs import ModeJobQueue
+from .services.mode_rules import ModeRuleRegistry
+
+# User-entered data that mode evaluation depends on. Planning rows created by
+# dashboards (StabilityRatioTarget, FreedomFundPlan) are derived, so they are left out.
+LEDGER_INPUT_MODELS = (
+    Transaction, CriticalSpending, EssentialBill, SurvivalExpenseSchedule,
+    CategorySpendingLimit, SavingsGoal, SavingsContribution, FreedomExpense,
+)
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def schedule_mode_evaluation(sender, instance, using=None, **kwargs):
+    # One evaluation per user after commit, however many rows were written
+    ModeJobQueue.schedule(instance.user_id, using=using)
+
+@receiver(pre_save, sender=Transaction)
+def capture_ledger_rollup_bucket(sender, instance, **kwargs):
+    # Remember where the transaction was counted before this save
+    instance._rollup_previous = LedgerRollupService.previous_state(instance)
 
 @receiver(post_save, sender=Transaction)
-def trigger_mode_unlock(sender, instance, created, **kwargs):
-    if created:
-        check_and_unlock_modes(instance.user)
+def update_ledger_rollup(sender, instance, **kwargs):
+    LedgerRollupService.record_save(instance, getattr(instance, '_rollup_previous', None))
+    instance._rollup_previous = None
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_ledger_rollup(sender, instance, **kwargs):
+    LedgerRollupService.record_delete(instance)
+
+@receiver(pre_delete, sender=Category)
+def fold_category_rollups(sender, instance, **kwargs):
+    LedgerRollupService.fold_category(instance)
+
+def bump_ledger_version(sender, instance, **kwargs):
+    LedgerStateService.bump(instance.user_id)
+
+for model in LEDGER_INPUT_MODELS:
+    post_save.connect(bump_ledger_version, sender=model, dispatch_uid=f'bump_ledger_version_{model.__name__}')
+    post_delete.connect(bump_ledger_version, sender=model, dispatch_uid=f'bump_ledger_version_delete_{model.__name__}')
+
+# Deleting mode rows (e.g. from the admin) must force the next evaluation to recreate them
+post_delete.connect(bump_ledger_version, sender=ModeUnlock, dispatch_uid='bump_ledger_version_delete_ModeUnlock')
+
+# Models shown on the mode dashboards, and the dashboards (rule keys) each one feeds.
+# Ledger totals appear on every dashboard.
+DASHBOARD_INPUTS = {
+    Transaction: tuple(ModeRuleRegistry.keys()),
+    Category: ('lockdown_mode', 'stability_mode'),
+    CriticalSpending: ('lockdown_mode',),
+    EssentialBill: ('lockdown_mode',),
+    SurvivalExpenseSchedule: ('survival_mode',),
+    CategorySpendingLimit: ('stability_mode',),
+    StabilityRatioTarget: ('stability_mode',),
+    SavingsGoal: ('saver_mode',),
+    SavingsContribution: ('saver_mode',),
+    FreedomFundPlan: ('vacay_mode',),
+    FreedomExpense: ('vacay_mode',),
+}
+
+def invalidate_dashboards(sender, instance, using=None, **kwargs):
+    # After commit, so a view running meanwhile cannot cache the old rows under the new version
+    user_id, mode_keys = instance.user_id, DASHBOARD_INPUTS[sender]
+    db_transaction.on_commit(lambda: DashboardCache.invalidate(user_id, mode_keys), using=using)
+
+for model in DASHBOARD_INPUTS:
+    post_save.connect(invalidate_dashboards, sender=model, dispatch_uid=f'invalidate_dashboards_{model.__name__}')
+    post_delete.connect(invalidate_dashboards, sender=model, dispatch_uid=f'invalidate_dashboards_delete_{model.__name__}')
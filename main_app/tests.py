@@ -1,3 +1,732 @@
-from django.test import TestCase
+import importlib
+import random
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.apps import apps
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from main_app.models import (
+    Transaction, Category, LedgerMonthlyRollup, StabilityRatioTarget, FreedomFundPlan, ModeHistory, FreedomExpense,
+    ModeEvaluationJob
+)
+from main_app.services.dashboard_cache import DashboardCache
+from main_app.services.financial_snapshot import FinancialSnapshot
+from main_app.services.ledger_state import LedgerStateService
+from main_app.services.mode_jobs import ModeJobQueue
+from main_app.services.mode_catalog import ModeCatalog
+from main_app.services.mode_history import ModeHistoryService
+from main_app.services.mode_service import ModeService
+from main_app.services.mode_shadow import ModeShadow
+from main_app.services.mode_replay import ModeReplayService
+from main_app.services.mode_rules import MODE_DEFINITIONS, ModeRule, ModeRuleRegistry, AggregatePlan, TrailingMonths
+from main_app.services.money import to_cents
+from main_app.services.cohort_evaluator import CohortEvaluator
+from main_app.services.month_rollover import MonthRolloverService
+from main_app.services.single_flight import SingleFlight
 
-# Create your tests here.
+
+def add_transaction(user, amount, transaction_type, when, **fields):
+    return Transaction.objects.create(
+        user=user,
+        amount=Decimal(amount),
+        description=fields.pop('description', transaction_type.lower()),
+        transaction_type=transaction_type,
+        date=timezone.make_aware(when) if timezone.is_naive(when) else when,
+        **fields
+    )
+
+
+def add_random_ledger(user, rng, count, now, categories=()):
+    """
+    ``count`` transactions spread over the last 400 days (and a few days ahead)
+    """
+    for _ in range(count):
+        add_transaction(
+            user,
+            Decimal(rng.randint(1, 500000)) / 100,
+            rng.choice(['INCOME', 'EXPENSE', 'EXPENSE']),
+            now - timedelta(days=rng.randint(-5, 400), seconds=rng.randint(0, 86400)),
+            category=rng.choice([None, *categories])
+        )
+
+
+def raw_rollup():
+    """
+    {(user, year, month, type, category): (total, count)} summed from Transaction rows, UTC months
+    """
+    buckets = defaultdict(lambda: [Decimal('0'), 0])
+    for transaction in Transaction.objects.all():
+        when = transaction.date.astimezone(dt_timezone.utc)
+        bucket = buckets[(transaction.user_id, when.year, when.month, transaction.transaction_type, transaction.category_id)]
+        bucket[0] += transaction.amount
+        bucket[1] += 1
+    return {key: (total, count) for key, (total, count) in buckets.items()}
+
+
+def stored_rollup():
+    return {
+        (row.user_id, row.year, row.month, row.transaction_type, row.category_id): (row.total, row.count)
+        for row in LedgerMonthlyRollup.objects.all()
+    }
+
+
+class MonthRolloverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='x')
+        # $5,000 in and $3,000 out in each of the five months before November
+        for month in range(6, 11):
+            add_transaction(self.user, '5000', 'INCOME', datetime(2025, month, 3, 12))
+            add_transaction(self.user, '3000', 'EXPENSE', datetime(2025, month, 20, 12))
+
+    def test_prepares_next_month_from_history(self):
+        call_command('rollover_month', month='2025-11', stdout=StringIO())
+
+        target = StabilityRatioTarget.objects.get(user=self.user, month=date(2025, 11, 1))
+        self.assertEqual(target.income_target, Decimal('5000.00'))
+        self.assertEqual(target.expense_target, Decimal('3000.00'))
+        self.assertEqual(target.ratio_target, Decimal('0.6000'))
+
+        plan = FreedomFundPlan.objects.get(user=self.user, month=date(2025, 11, 1))
+        self.assertEqual(plan.discretionary_amount, Decimal('2000.00'))
+        self.assertEqual(plan.freedom_allocation, Decimal('600.00'))
+        self.assertEqual(plan.savings_allocation, Decimal('1400.00'))
+
+    def test_history_comes_from_the_rollup(self):
+        with CaptureQueriesContext(connection) as queries:
+            totals = MonthRolloverService.monthly_totals([self.user.pk], date(2025, 6, 1), date(2025, 10, 1))
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ledgermonthlyrollup', queries[0]['sql'].lower())
+        self.assertEqual(totals[self.user.pk][date(2025, 8, 1)], {'income': Decimal('5000'), 'expenses': Decimal('3000')})
+        self.assertEqual(len(totals[self.user.pk]), 5)
+        self.assertEqual(list(MonthRolloverService.active_user_ids(date(2025, 11, 1))), [self.user.pk])
+
+    def test_target_month_transactions_do_not_change_the_rows(self):
+        # A view creating the rows mid-month must agree with the job run ahead
+        add_transaction(self.user, '9000', 'EXPENSE', datetime(2025, 11, 2, 12))
+        MonthRolloverService.rollover(date(2025, 11, 1), [self.user.pk])
+
+        target = StabilityRatioTarget.objects.get(user=self.user, month=date(2025, 11, 1))
+        self.assertEqual(target.income_target, Decimal('5000.00'))
+        self.assertEqual(target.ratio_target, Decimal('0.6000'))
+
+    def test_keeps_existing_rows_and_defaults_without_history(self):
+        newcomer = User.objects.create_user(username='newcomer', password='x')
+        FreedomFundPlan.objects.create(
+            user=self.user, month=date(2025, 11, 1), discretionary_amount=Decimal('10'),
+            freedom_allocation=Decimal('10'), savings_allocation=Decimal('0')
+        )
+
+        targets, plans = MonthRolloverService.rollover(date(2025, 11, 1), [self.user.pk, newcomer.pk])
+
+        self.assertEqual((targets, plans), (2, 1))
+        self.assertEqual(FreedomFundPlan.objects.get(user=self.user).freedom_allocation, Decimal('10.00'))
+        target = StabilityRatioTarget.objects.get(user=newcomer)
+        self.assertEqual(target.income_target, MonthRolloverService.DEFAULT_INCOME_TARGET)
+        self.assertEqual(target.expense_target, MonthRolloverService.DEFAULT_EXPENSE_TARGET)
+        self.assertEqual(target.ratio_target, MonthRolloverService.DEFAULT_RATIO)
+        self.assertEqual(FreedomFundPlan.objects.get(user=newcomer).discretionary_amount, Decimal('0'))
+
+
+class LedgerMonthTests(TestCase):
+    """
+    Ledger months are UTC calendar months everywhere, whatever TIME_ZONE says
+    """
+
+    def test_evening_of_the_last_day_counts_in_the_next_utc_month(self):
+        user = User.objects.create_user(username='owl', password='x')
+        # 21:00 in New York on October 31st is 01:00 UTC on November 1st
+        add_transaction(user, '40', 'EXPENSE', datetime(2026, 10, 31, 21))
+        now = datetime(2026, 11, 15, 12, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(Transaction.get_monthly_totals(user, 2026, 10)['expenses'], 0)
+        self.assertEqual(Transaction.get_monthly_totals(user, 2026, 11)['expenses'], Decimal('40'))
+        self.assertEqual(FinancialSnapshot.build(user, now).month_totals(2026, 11)['expenses'], 4000)
+        totals = MonthRolloverService.monthly_totals([user.pk], date(2026, 10, 1), date(2026, 11, 1))[user.pk]
+        self.assertEqual(list(totals), [date(2026, 11, 1)])
+
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            stability = ModeService.get_stability_balance_maintainer_data(user)
+            vacay = ModeService.get_vacay_freedom_fund_data(user)
+        self.assertEqual(stability['current_month']['expenses'], 40.0)
+        self.assertEqual(stability['monthly_ratios'][1]['expenses'], 0.0)
+        self.assertEqual([month['expenses'] for month in vacay['savings_trend'][:2]], [40.0, 0.0])
+
+
+class ModeReplayTests(TestCase):
+    def test_rules_are_due_on_their_replay_day(self):
+        days = list(ModeReplayService.evaluation_days(date(2025, 1, 20), date(2025, 3, 1), ModeRuleRegistry.rules()))
+
+        self.assertEqual([day for day, _ in days], [date(2025, 1, 10), date(2025, 1, 31), date(2025, 2, 10), date(2025, 2, 28)])
+        self.assertEqual(days[0][1], ['survival_mode'])
+        self.assertNotIn('survival_mode', days[1][1])
+        self.assertIn('lockdown_mode', days[1][1])
+
+    def test_replays_survival_mode(self):
+        user = User.objects.create_user(username='spender', password='x')
+        add_transaction(user, '3000', 'INCOME', datetime(2025, 2, 15, 12))
+        # Two thirds of February's income gone by March 5th
+        add_transaction(user, '2000', 'EXPENSE', datetime(2025, 3, 5, 12))
+
+        ModeReplayService.replay([user.pk])
+
+        survival = ModeHistory.objects.filter(user=user, mode__key='survival_mode').order_by('timestamp')
+        changes = [(event.timestamp.date(), event.status_change) for event in survival]
+        self.assertIn((date(2025, 3, 10), 'unlocked'), changes)
+        # No February income to compare April against
+        self.assertIn((date(2025, 4, 10), 'locked'), changes)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='x')
+        self.builds = []
+
+    def view(self, mode_key):
+        def build():
+            self.builds.append(mode_key)
+            return {'mode_data': {}}
+
+        return DashboardCache.get_or_build(self.user.pk, mode_key, build)
+
+    def test_writes_invalidate_the_dashboards_they_feed(self):
+        for mode_key in ('vacay_mode', 'lockdown_mode', 'vacay_mode', 'lockdown_mode'):
+            self.view(mode_key)
+        self.assertEqual(self.builds, ['vacay_mode', 'lockdown_mode'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FreedomExpense.objects.create(
+                user=self.user, category='travel', amount=Decimal('20'), date=date(2025, 3, 1), description='trip'
+            )
+        self.view('vacay_mode')
+        self.view('lockdown_mode')
+        self.assertEqual(self.builds, ['vacay_mode', 'lockdown_mode', 'vacay_mode'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            add_transaction(self.user, '10', 'EXPENSE', datetime(2025, 3, 2, 12))
+        self.view('vacay_mode')
+        self.view('lockdown_mode')
+        self.assertEqual(self.builds[3:], ['vacay_mode', 'lockdown_mode'])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'dashboards': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_process_local_cache_is_bypassed(self):
+        self.view('saver_mode')
+        self.view('saver_mode')
+        self.assertEqual(self.builds, ['saver_mode', 'saver_mode'])
+
+
+class BatchEvaluationTests(TestCase):
+    def test_write_during_batch_stays_pending(self):
+        user = User.objects.create_user(username='busy', password='x')
+        add_transaction(user, '100', 'INCOME', datetime(2025, 3, 1, 12))
+        ModeService.update_user_modes(user, force=True)
+        load = AggregatePlan.load
+
+        def load_then_write(plan, user_ids, *args, **kwargs):
+            inputs = load(plan, user_ids, *args, **kwargs)
+            add_transaction(user, '50', 'EXPENSE', datetime(2025, 3, 2, 12))
+            return inputs
+
+        with mock.patch.object(AggregatePlan, 'load', load_then_write):
+            updated, failures = ModeService.update_modes_for_users([user.pk])
+
+        self.assertEqual((updated, failures), (1, []))
+        self.assertFalse(LedgerStateService.modes_are_current(user))
+
+
+class LedgerStateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='versioned', password='x')
+        add_transaction(self.user, '100.00', 'INCOME', timezone.now() - timedelta(days=3))
+
+    def evaluations(self):
+        return mock.patch.object(ModeService, 'check_all_modes', wraps=ModeService.check_all_modes)
+
+    def test_unchanged_ledger_returns_early(self):
+        with self.evaluations() as check_all_modes:
+            ModeService.update_user_modes(self.user)
+            self.assertTrue(LedgerStateService.modes_are_current(self.user))
+            self.assertEqual(ModeService.update_user_modes(self.user), [])
+        self.assertEqual(check_all_modes.call_count, 1)
+
+    def test_write_bumps_the_version_and_forces_evaluation(self):
+        ModeService.update_user_modes(self.user)
+        version = LedgerStateService.get(self.user).version
+
+        add_transaction(self.user, '250.00', 'EXPENSE', timezone.now() - timedelta(days=1))
+        self.assertEqual(LedgerStateService.get(self.user).version, version + 1)
+        self.assertFalse(LedgerStateService.modes_are_current(self.user))
+
+        with self.evaluations() as check_all_modes:
+            newly_unlocked = ModeService.update_user_modes(self.user)
+        self.assertEqual(check_all_modes.call_count, 1)
+        self.assertIn('Lockdown Mode', [mode.name for mode in newly_unlocked])
+        state = LedgerStateService.get(self.user)
+        self.assertEqual(state.modes_version, version + 1)
+        self.assertTrue(state.modes_are_current())
+
+    def test_results_expire_at_utc_midnight(self):
+        # 23:30 UTC is still the same evening in New York
+        evening = datetime(2025, 3, 4, 23, 30, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=evening):
+            ModeService.update_user_modes(self.user)
+            self.assertTrue(LedgerStateService.modes_are_current(self.user))
+
+        with mock.patch('django.utils.timezone.now', return_value=evening + timedelta(hours=1)):
+            self.assertEqual(timezone.localtime(evening + timedelta(hours=1)).date(), date(2025, 3, 4))
+            self.assertFalse(LedgerStateService.modes_are_current(self.user))
+            with self.evaluations() as check_all_modes:
+                ModeService.update_user_modes(self.user)
+            self.assertEqual(check_all_modes.call_count, 1)
+            self.assertTrue(LedgerStateService.modes_are_current(self.user))
+
+
+class ModeStreakTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='streaky', password='x')
+
+    def save_on(self, day, is_unlocked):
+        """
+        Save a lockdown result as evaluated at noon UTC on ``day`` and return its ModeUnlock
+        """
+        result = {'lockdown_mode': {'is_unlocked': is_unlocked, 'progress': 100 if is_unlocked else 50}}
+        noon = datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=noon):
+            ModeService.save_mode_results(self.user, result)
+        return self.user.modeunlock_set.get(mode__key='lockdown_mode')
+
+    def streak(self, mode):
+        return mode.streak_days, mode.longest_streak_days, mode.streak_started_on
+
+    def test_streak_starts_extends_resets_and_relocks(self):
+        first = date(2025, 3, 1)
+
+        self.assertEqual(self.streak(self.save_on(first, True)), (1, 1, first))
+        self.assertEqual(self.streak(self.save_on(first, True)), (1, 1, first))
+        self.assertEqual(self.streak(self.save_on(first + timedelta(days=1), True)), (2, 2, first))
+        # No evaluation on the 3rd (nothing changed): the mode stayed unlocked, so the day counts
+        self.assertEqual(self.streak(self.save_on(first + timedelta(days=3), True)), (4, 4, first))
+
+        # Locking resets the current streak and keeps the longest
+        self.assertEqual(self.streak(self.save_on(first + timedelta(days=4), False)), (0, 4, None))
+        self.assertEqual(self.streak(self.save_on(first + timedelta(days=5), False)), (0, 4, None))
+
+        restart = first + timedelta(days=6)
+        mode = self.save_on(restart, True)
+        self.assertEqual(self.streak(mode), (1, 4, restart))
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2025, 3, 9, 1, tzinfo=dt_timezone.utc)):
+            self.assertEqual((mode.current_streak_days, mode.best_streak_days), (3, 4))
+
+        # A longer second run replaces the longest streak
+        mode = self.save_on(restart + timedelta(days=5), True)
+        self.assertEqual(self.streak(mode), (6, 6, restart))
+
+    def test_mode_locked_from_the_start_has_no_streak(self):
+        mode = self.save_on(date(2025, 3, 1), False)
+
+        self.assertEqual(self.streak(mode), (0, 0, None))
+        self.assertEqual((mode.current_streak_days, mode.best_streak_days), (0, 0))
+
+
+@override_settings(MODE_EVALUATION_ASYNC=True)
+class ModeJobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='queued', password='x')
+
+    def pending_jobs(self):
+        return ModeEvaluationJob.objects.filter(user=self.user, status='pending').count()
+
+    def enqueue_spy(self):
+        return mock.patch.object(ModeJobQueue, 'enqueue_many', wraps=ModeJobQueue.enqueue_many)
+
+    def test_saves_in_one_transaction_schedule_one_job(self):
+        with self.enqueue_spy() as enqueue_many, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for day in range(1, 4):
+                    add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, day, 12))
+
+        enqueue_many.assert_called_once_with({self.user.pk})
+        self.assertEqual(self.pending_jobs(), 1)
+
+    def test_coalesce_enqueues_each_user_once(self):
+        with self.enqueue_spy() as enqueue_many, self.captureOnCommitCallbacks(execute=True):
+            with ModeJobQueue.coalesce():
+                for day in range(1, 4):
+                    with transaction.atomic():
+                        add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, day, 12))
+
+        enqueue_many.assert_called_once_with({self.user.pk})
+        self.assertEqual(self.pending_jobs(), 1)
+
+    def test_rolled_back_transaction_schedules_nothing(self):
+        with self.enqueue_spy() as enqueue_many, self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, 1, 12))
+                    raise RuntimeError('abort')
+        enqueue_many.assert_not_called()
+        self.assertEqual(self.pending_jobs(), 0)
+
+        # The next transaction registers a fresh callback instead of the discarded one
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, 2, 12))
+        self.assertEqual(self.pending_jobs(), 1)
+
+    def test_processed_job_is_deleted(self):
+        ModeEvaluationJob.objects.create(user=self.user)
+
+        jobs = ModeJobQueue.claim()
+        self.assertEqual([(job.user_id, job.status, job.attempts) for job in jobs], [(self.user.pk, 'running', 1)])
+        self.assertEqual(ModeJobQueue.claim(), [])
+        self.assertTrue(ModeJobQueue.process(jobs[0]))
+        self.assertFalse(ModeEvaluationJob.objects.exists())
+
+    def test_failed_job_backs_off_then_fails(self):
+        ModeEvaluationJob.objects.create(user=self.user)
+
+        with mock.patch.object(ModeService, 'update_user_modes', side_effect=RuntimeError('boom')):
+            job, = ModeJobQueue.claim()
+            before = timezone.now()
+            self.assertFalse(ModeJobQueue.process(job))
+
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('pending', 1))
+            self.assertIn('boom', job.last_error)
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=60))
+            # Not due again until the backoff passes
+            self.assertEqual(ModeJobQueue.claim(), [])
+
+            ModeEvaluationJob.objects.filter(pk=job.pk).update(attempts=ModeJobQueue.MAX_ATTEMPTS - 1, run_after=before)
+            job, = ModeJobQueue.claim()
+            self.assertFalse(ModeJobQueue.process(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+
+class SingleFlightTests(TestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight('test')
+        started, release = threading.Event(), threading.Event()
+        runs, results = [], []
+
+        def slow():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return 'done'
+
+        leader = threading.Thread(target=lambda: results.append(flight.do(7, slow)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(flight.do(7, lambda: 'follower ran')))
+        follower.start()
+        # Let the follower reach the in-flight call before the leader finishes
+        time.sleep(0.2)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(flight.do(7, lambda: 'again'), 'again')
+        # Nothing is kept per key once the calls finish
+        self.assertEqual(flight._calls, {})
+
+
+    def test_error_in_func_propagates_and_releases_the_key(self):
+        flight = SingleFlight('test')
+
+        def broken():
+            User.objects.create_user(username='dup', password='x')
+            User.objects.create_user(username='dup', password='x')
+
+        with transaction.atomic():
+            with self.assertRaises(IntegrityError):
+                flight.do(3, broken)
+            # The flight's own atomic block rolled back to its savepoint
+            self.assertFalse(User.objects.filter(username='dup').exists())
+        self.assertEqual(flight.do(3, lambda: User.objects.count()), 0)
+        self.assertEqual(flight._calls, {})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'advisory locks need Postgres')
+class SingleFlightLockTests(TransactionTestCase):
+    def test_lock_is_released_after_a_database_error(self):
+        flight = SingleFlight('test')
+
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                flight.do(5, lambda: connection.cursor().execute('SELECT missing_column FROM auth_user'))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class LedgerRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', password='x')
+        self.groceries = Category.objects.create(user=self.user, category_type='groceries')
+        self.gas = Category.objects.create(user=self.user, category_type='gas')
+
+    def test_create_update_move_and_delete(self):
+        transaction = add_transaction(self.user, '10.00', 'EXPENSE', datetime(2025, 1, 15, 12), category=self.groceries)
+        add_transaction(self.user, '4.00', 'EXPENSE', datetime(2025, 1, 16, 12), category=self.groceries)
+        self.assertEqual(stored_rollup(), raw_rollup())
+
+        transaction.amount = Decimal('12.50')
+        transaction.save()
+        self.assertEqual(stored_rollup()[(self.user.pk, 2025, 1, 'EXPENSE', self.groceries.pk)], (Decimal('16.50'), 2))
+
+        # 10pm in New York on January 31st is already February in UTC
+        transaction.date = timezone.make_aware(datetime(2025, 1, 31, 22))
+        transaction.save()
+        self.assertEqual(stored_rollup()[(self.user.pk, 2025, 2, 'EXPENSE', self.groceries.pk)], (Decimal('12.50'), 1))
+        self.assertEqual(stored_rollup(), raw_rollup())
+
+        transaction.transaction_type = 'INCOME'
+        transaction.category = self.gas
+        transaction.save()
+        self.assertEqual(stored_rollup(), raw_rollup())
+
+        transaction.delete()
+        self.assertEqual(stored_rollup(), raw_rollup())
+        self.assertEqual(len(stored_rollup()), 1)
+
+    def test_category_delete_folds_into_uncategorized(self):
+        # Merged into an existing uncategorized bucket...
+        add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, 3, 12), category=self.groceries)
+        add_transaction(self.user, '7.00', 'EXPENSE', datetime(2025, 3, 4, 12))
+        # ...or re-pointed when there is none
+        add_transaction(self.user, '9.00', 'EXPENSE', datetime(2025, 4, 3, 12), category=self.groceries)
+
+        self.groceries.delete()
+
+        self.assertEqual(stored_rollup(), raw_rollup())
+        self.assertEqual(stored_rollup()[(self.user.pk, 2025, 3, 'EXPENSE', None)], (Decimal('12.00'), 2))
+
+    def test_user_delete_removes_rollups(self):
+        add_transaction(self.user, '5.00', 'EXPENSE', datetime(2025, 3, 3, 12), category=self.gas)
+
+        self.user.delete()
+
+        self.assertFalse(LedgerMonthlyRollup.objects.exists())
+
+    def test_random_edits_match_rebuild_and_backfill(self):
+        rng = random.Random(2)
+        now = timezone.now()
+        add_random_ledger(self.user, rng, 40, now, [self.groceries, self.gas])
+        transactions = list(Transaction.objects.filter(user=self.user))
+        for transaction in rng.sample(transactions, 15):
+            transaction.amount = Decimal(rng.randint(1, 500000)) / 100
+            transaction.date -= timedelta(days=rng.randint(-40, 40))
+            transaction.category = rng.choice([None, self.groceries, self.gas])
+            transaction.save()
+        for transaction in rng.sample(transactions, 5):
+            transaction.delete()
+        self.gas.delete()
+
+        incremental = stored_rollup()
+        self.assertEqual(incremental, raw_rollup())
+
+        call_command('rebuild_ledger_rollup', stdout=StringIO())
+        self.assertEqual(stored_rollup(), incremental)
+
+        LedgerMonthlyRollup.objects.all().delete()
+        migration = importlib.import_module('main_app.migrations.0002_ledger_monthly_rollup')
+        migration.backfill_ledger_rollup(apps, None)
+        self.assertEqual(stored_rollup(), incremental)
+
+
+class RandomLedgerTestCase(TestCase):
+    """
+    A few users with random ledgers reaching back past the rollup cut-off
+    """
+
+    def setUp(self):
+        rng = random.Random(1)
+        self.now = timezone.now()
+        self.users = []
+        for n in range(4):
+            user = User.objects.create_user(username=f'user{n}', password='x')
+            category = Category.objects.create(user=user, category_type='groceries')
+            add_random_ledger(user, rng, 15 + 20 * n, self.now, [category])
+            self.users.append(user)
+
+
+class FinancialSnapshotTests(RandomLedgerTestCase):
+    def raw_snapshot(self, user):
+        """
+        (lifetime totals, {(year, month): bucket}) summed from the raw rows
+        """
+        now = self.now.astimezone(dt_timezone.utc)
+        months = defaultdict(FinancialSnapshot.empty_bucket)
+        totals = {'income': 0, 'expenses': 0}
+        for transaction in Transaction.objects.filter(user=user):
+            when = transaction.date.astimezone(dt_timezone.utc)
+            side = 'income' if transaction.transaction_type == 'INCOME' else 'expenses'
+            cents = to_cents(transaction.amount)
+            bucket = months[(when.year, when.month)]
+            totals[side] += cents
+            bucket[side] += cents
+            if when <= now:
+                bucket[f'{side}_to_date'] += cents
+            for days, window in bucket['windows'].items():
+                if when >= now - timedelta(days=days):
+                    window[side] += cents
+                    window['income_count' if side == 'income' else 'expense_count'] += 1
+        return totals, dict(months)
+
+    def test_snapshot_matches_raw_sums(self):
+        for user in self.users:
+            snapshot = FinancialSnapshot.build(user, self.now)
+            totals, months = self.raw_snapshot(user)
+
+            self.assertEqual((snapshot.total_income, snapshot.total_expenses), (totals['income'], totals['expenses']))
+            for (year, month), bucket in months.items():
+                self.assertEqual(snapshot.month_totals(year, month), {'income': bucket['income'], 'expenses': bucket['expenses']})
+            for days in FinancialSnapshot.windows():
+                expected = [
+                    (month_key, bucket['windows'][days]) for month_key, bucket in sorted(months.items(), reverse=True)
+                    if bucket['windows'][days]['income_count'] or bucket['windows'][days]['expense_count']
+                ]
+                self.assertEqual(snapshot.trailing_months(days), expected)
+            current = months.get((snapshot.now.year, snapshot.now.month))
+            self.assertEqual(snapshot.month_to_date_expenses(), current['expenses_to_date'] if current else 0)
+
+    def test_build_many_matches_build(self):
+        snapshots = FinancialSnapshot.build_many([user.pk for user in self.users], self.now)
+
+        for user in self.users:
+            single = FinancialSnapshot.build(user, self.now)
+            self.assertEqual(snapshots[user.pk].months, single.months)
+            self.assertEqual(
+                (snapshots[user.pk].total_income, snapshots[user.pk].total_expenses),
+                (single.total_income, single.total_expenses)
+            )
+
+
+class EvaluationPathTests(RandomLedgerTestCase):
+    def test_batch_and_scalar_paths_agree(self):
+        batch = ModeRuleRegistry.plan().load([user.pk for user in self.users])
+
+        for user in self.users:
+            results = ModeService.check_all_modes(user)
+            self.assertEqual(ModeService.check_all_modes(user, inputs=batch[user.pk]), results)
+            for key, result in results.items():
+                self.assertEqual(ModeService.check_mode(key, user), result)
+
+    def test_snapshots_carry_the_registered_windows(self):
+        self.assertEqual(FinancialSnapshot.windows(), ModeRuleRegistry.plan().windows)
+
+        class MonthRule(ModeRule):
+            key = 'month_mode'
+            requires = (TrailingMonths(30),)
+
+            @classmethod
+            def check(cls, user, inputs):
+                months = inputs.snapshot.trailing_months(30)
+                return {'is_unlocked': bool(months), 'progress': len(months)}
+
+        with mock.patch.dict(ModeRuleRegistry._rules), mock.patch.dict(MODE_DEFINITIONS), \
+                mock.patch.object(ModeRuleRegistry, '_plan', None):
+            ModeRuleRegistry.register(MonthRule)
+            self.assertIn(30, FinancialSnapshot.windows())
+            user = self.users[-1]
+            raw = Transaction.objects.filter(user=user, date__gte=self.now - timedelta(days=30)).count()
+            window_counts = sum(
+                window['income_count'] + window['expense_count']
+                for month_key, window in FinancialSnapshot.build(user, self.now).trailing_months(30)
+            )
+            self.assertEqual(window_counts, raw)
+            self.assertIn('month_mode', ModeService.check_all_modes(user))
+
+        self.assertNotIn(30, FinancialSnapshot.windows())
+
+
+class CohortEvaluatorTests(RandomLedgerTestCase):
+    def test_exact_results_match_scalar_evaluation(self):
+        cohort = CohortEvaluator([user.pk for user in self.users])
+        cohort_results = cohort.evaluate()
+
+        for user in self.users:
+            position = cohort.user_ids.index(user.pk)
+            for key, result in ModeService.check_all_modes(user).items():
+                if not cohort_results[key]['exact'][position]:
+                    continue
+                self.assertEqual(
+                    (bool(cohort_results[key]['is_unlocked'][position]), int(cohort_results[key]['progress'][position])),
+                    (result['is_unlocked'], result['progress']),
+                    key
+                )
+
+
+class ModeShadowTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='shadowed', password='x')
+        add_transaction(self.user, '100.00', 'INCOME', timezone.now() - timedelta(days=3))
+
+    def engine(self, user_ids, now):
+        """
+        The rule results, with lockdown flipped but marked inexact and saver's progress off by one
+        """
+        inputs = ModeRuleRegistry.plan().load(user_ids, now=now)
+        results = {}
+        for user_id in user_ids:
+            results[user_id] = {
+                key: {'is_unlocked': result['is_unlocked'], 'progress': result['progress'], 'exact': True}
+                for key, result in ModeService.check_all_modes(User(pk=user_id), inputs=inputs[user_id]).items()
+            }
+            results[user_id]['lockdown_mode'].update(is_unlocked=True, exact=False)
+            results[user_id]['saver_mode']['progress'] += 1
+        return results
+
+    def test_inexact_results_are_reported_apart_from_mismatches(self):
+        with mock.patch.dict(ModeShadow.ENGINES, {'fake': self.engine}):
+            legacy_ms, candidate_ms, mismatches, inexact, inputs = ModeShadow.compare_batch([self.user], 'fake')
+
+            self.assertEqual([difference['mode'] for difference in mismatches[self.user.pk]], ['saver_mode'])
+            self.assertEqual(inexact, {self.user.pk: ['lockdown_mode']})
+
+            out = StringIO()
+            call_command('shadow_modes', engine='fake', no_record=True, stdout=out)
+        self.assertIn('saver_mode: 1 mismatched users', out.getvalue())
+        self.assertIn('lockdown_mode: 1 inexact users', out.getvalue())
+        self.assertNotIn('lockdown_mode: 1 mismatched', out.getvalue())
+        self.assertIn('1 mismatched, 1 with inexact results', out.getvalue())
+
+
+class ModeHistoryCompactionTests(TestCase):
+    def test_events_are_grouped_by_utc_day(self):
+        user = User.objects.create_user(username='compacted', password='x')
+        mode_id = ModeCatalog.ids(['saver_mode'])['saver_mode']
+        # All three fall on the evening of Jan 10 in New York; the last two share Jan 11 in UTC
+        for hour, progress in ((23, 10), (24, 20), (27, 30)):
+            ModeHistory.objects.create(
+                user=user, mode_id=mode_id, status_change='progress', progress_percentage=progress,
+                timestamp=datetime(2025, 1, 10, tzinfo=dt_timezone.utc) + timedelta(hours=hour, minutes=30),
+                metrics={}
+            )
+
+        self.assertEqual(ModeHistoryService.compact(older_than_days=1), (2, 1))
+        rows = list(ModeHistory.objects.order_by('timestamp').values_list('progress_percentage', 'event_count', 'metrics'))
+        self.assertEqual(rows, [
+            (10, 1, {}),
+            (30, 2, {'progress_range': [20, 30], 'day': '2025-01-11'}),
+        ])
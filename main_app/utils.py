@@ -1,33 +1,10 @@
-from django.utils import timezone
 from datetime import datetime
 import calendar
-from .models import ModeUnlock, Transaction
 from django.contrib import messages
 import re
 from django.core.exceptions import ValidationError
 import isoweek
 
-def check_and_unlock_modes(user):
-    transactions = Transaction.objects.filter(user=user)
-    total_expenses = sum(t.amount for t in transactions if t.transaction_type == 'EXPENSE')
-    total_income = sum(t.amount for t in transactions if t.transaction_type == 'INCOME')
-
-    # Example: Unlock Lockdown Mode if expenses > income
-    if total_expenses > total_income:
-        mode, created = ModeUnlock.objects.get_or_create(
-            user=user,
-            name="Lockdown Mode",
-            defaults={
-                "description": "Triggered when expenses exceed income.",
-                "is_unlocked": True,
-                "triggered_on": timezone.now()
-            }
-        )
-        if not mode.is_unlocked:
-            mode.is_unlocked = True
-            mode.triggered_on = timezone.now()
-            mode.save()
-
 # ANSI Shadow Text Templates
 # Each letter is represented as a list of strings, with each string being a line
 ANSI_SHADOW_LETTERS = {
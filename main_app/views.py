@@ -11,6 +11,9 @@ from django.contrib.auth import login
 from .forms import UserRegistrationForm, CategoryForm, TransactionForm, BudgetForm, BudgetItemForm, IncomeForm, CalendarForm
 from django.contrib import messages
 from .services.mode_service import ModeService
+from .services.mode_jobs import ModeJobQueue
+from .services.onboarding import OnboardingService
+from .services.mode_catalog import ModeCatalog
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.db import models
@@ -25,6 +28,8 @@ def register(request):
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             user = form.save()
+            # Start with the standard (locked) mode rows and, if enabled, default categories
+            OnboardingService.provision([user.pk])
             login(request, user)
             return redirect('home')
     else:
@@ -33,12 +38,8 @@ def register(request):
 
 @login_required
 def home(request):
-    # Check for any newly unlocked modes
-    newly_unlocked = ModeService.update_user_modes(request.user)
-    
-    # Show notifications for newly unlocked modes
-    for mode in newly_unlocked:
-        messages.success(request, f"Alert! You've unlocked {mode.name}: {mode.description}")
+    # Re-evaluate modes in the background; unlocks show up on the next page view
+    ModeJobQueue.enqueue(request.user)
     
     return render(request, 'home.html')
 
@@ -48,24 +49,19 @@ def about(request):
 
 @login_required
 def unlocked_modes_view(request):
-    # Force a refresh of all mode conditions
-    ModeService.update_user_modes(request.user)
+    all_modes = ModeUnlock.objects.filter(user=request.user).order_by('-is_unlocked', 'mode__name')
+    
+    if all_modes:
+        # Refresh mode conditions in the background
+        ModeJobQueue.enqueue(request.user)
+    else:
+        # Accounts created before registration provisioned their modes
+        ModeJobQueue.evaluate(request.user)
+        all_modes = ModeUnlock.objects.filter(user=request.user).order_by('-is_unlocked', 'mode__name')
     
-    # Get all modes (both locked and unlocked)
-    all_modes = ModeUnlock.objects.filter(user=request.user).order_by('-is_unlocked', 'name')
     unlocked_modes = [mode for mode in all_modes if mode.is_unlocked]
     locked_modes = [mode for mode in all_modes if not mode.is_unlocked]
     
-    # Check if we have any modes yet
-    if not all_modes:
-        # Initialize all possible modes for this user if none exist
-        ModeService.check_all_modes(request.user)
-        ModeService.update_user_modes(request.user)
-        # Refresh the modes lists
-        all_modes = ModeUnlock.objects.filter(user=request.user).order_by('-is_unlocked', 'name')
-        unlocked_modes = [mode for mode in all_modes if mode.is_unlocked]
-        locked_modes = [mode for mode in all_modes if not mode.is_unlocked]
-    
     context = {
         'modes': unlocked_modes,
         'locked_modes': locked_modes,
@@ -87,35 +83,8 @@ class TransactionList(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Calculate monthly totals directly
-        now = timezone.now()
-        first_day = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        if now.month == 12:
-            last_day = now.replace(year=now.year + 1, month=1, day=1) - timezone.timedelta(days=1)
-        else:
-            last_day = now.replace(month=now.month + 1, day=1) - timezone.timedelta(days=1)
-            
-        # Get transactions for the current month
-        monthly_transactions = Transaction.objects.filter(
-            user=self.request.user,
-            date__gte=first_day,
-            date__lte=last_day
-        )
-        
-        # Calculate totals
-        income = monthly_transactions.filter(transaction_type='INCOME').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        
-        expenses = monthly_transactions.filter(transaction_type='EXPENSE').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        
-        context['monthly_totals'] = {
-            'income': income,
-            'expenses': expenses,
-            'net': income - expenses
-        }
+        # Monthly totals come from the ledger rollup
+        context['monthly_totals'] = Transaction.get_monthly_totals(self.request.user)
         
         return context
 
@@ -135,16 +104,7 @@ class TransactionCreate(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.user = self.request.user
 
-        response = super().form_valid(form)
-        
-        # Check for mode unlocks after transaction is created
-        newly_unlocked = ModeService.update_user_modes(self.request.user)
-        
-        # Add notifications for newly unlocked modes
-        for mode in newly_unlocked:
-            messages.success(self.request, f"Alert! You've unlocked {mode.name}: {mode.description}")
-        
-        return response
+        return super().form_valid(form)
 
 class TransactionUpdate(LoginRequiredMixin, UpdateView):
     model = Transaction
@@ -161,18 +121,6 @@ class TransactionUpdate(LoginRequiredMixin, UpdateView):
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
-    
-    def form_valid(self, form):
-        response = super().form_valid(form)
-        
-        # Check for mode unlocks after transaction is updated
-        newly_unlocked = ModeService.update_user_modes(self.request.user)
-        
-        # Add notifications for newly unlocked modes
-        for mode in newly_unlocked:
-            messages.success(self.request, f"Alert! You've unlocked {mode.name}: {mode.description}")
-        
-        return response
 
 class TransactionDelete(LoginRequiredMixin, DeleteView):
     model = Transaction
@@ -181,18 +129,6 @@ class TransactionDelete(LoginRequiredMixin, DeleteView):
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
-    
-    def delete(self, request, *args, **kwargs):
-        response = super().delete(request, *args, **kwargs)
-        
-        # Check for mode unlocks after transaction is deleted
-        newly_unlocked = ModeService.update_user_modes(self.request.user)
-        
-        # Add notifications for newly unlocked modes
-        for mode in newly_unlocked:
-            messages.success(self.request, f"Alert! You've unlocked {mode.name}: {mode.description}")
-        
-        return response
 
 @login_required
 def journey_map(request):
@@ -205,6 +141,23 @@ def journey_map(request):
     # Get historical data
     mode_history = ModeService.get_user_mode_history(request.user)
     
+    # Streaks are kept on the ModeUnlock rows at evaluation time
+    modes_by_id = {mode.mode_id: mode for mode in ModeUnlock.objects.filter(user=request.user)}
+    for key, mode_data in modes_data.items():
+        mode = modes_by_id.get(ModeCatalog.by_key(key).id)
+        if mode:
+            mode_data['current_streak'] = mode.current_streak_days
+            mode_data['longest_streak'] = mode.best_streak_days
+    
+    # Numeric progress per mode (oldest first) for charting the journey
+    history_chart = {
+        mode_name: [
+            {'timestamp': event.timestamp.isoformat(), 'progress': event.progress_percentage, 'metrics': event.metrics}
+            for event in reversed(events)
+        ]
+        for mode_name, events in mode_history.items()
+    }
+    
     # Organize modes in their progression order
     modes = [
         modes_data.get('lockdown_mode', {}),
@@ -217,6 +170,7 @@ def journey_map(request):
     context = {
         'modes': modes,
         'mode_history': mode_history,
+        'history_chart': history_chart,
         'current_tab': 'journey'
     }
     